@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+"""
+Description:
+    Measure the performances of lazyparser: cold import time, parser \
+    construction, parse latency, help and message rendering with the \
+    rich and plain backends and peak memory, with plain click and \
+    argparse as baselines.
+
+    The results are written in a JSON file that can be given back with \
+    --baseline to flag the regressions of a later run.
+
+Example:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --baseline before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+import lazyparser as lp
+
+# types and default values of the parameters of the synthetic functions
+KINDS = [
+    ("int", "0"),
+    ("float", "0.5"),
+    ("str", "'a'"),
+    ("bool", "False"),
+    ("tuple[int, ...]", "()"),
+]
+# values given to the parameters of the synthetic functions in argv
+VALUES = {"int": ["1"], "float": ["1.5"], "str": ["x"], "bool": []}
+SEQUENCE = ["1", "2"]
+
+
+def synthetic(size):
+    """
+    Create a function with ``size`` parameters and a docstring \
+    describing each of them. The first parameter is required.
+
+    :param size: (int) the number of parameters
+    :return: (function) the synthetic function
+    """
+    params, doc = [], ["Synthetic function.", ""]
+    for i in range(size):
+        atype, default = KINDS[i % len(KINDS)]
+        params.append(f"p{i}: {atype}" + (f" = {default}" if i else ""))
+        doc.append(f"    :param p{i}: parameter number {i}")
+    source = (
+        f"def synthetic_{size}({', '.join(params)}):\n"
+        f'    """{chr(10).join(doc)}\n    """\n'
+        "    return None\n"
+    )
+    namespace = {}
+    exec(source, namespace)
+    return namespace[f"synthetic_{size}"]
+
+
+def typical_argv(size):
+    """
+    :param size: (int) the number of parameters of the function
+    :return: (list of str) a command line giving three values
+    """
+    argv = ["--p0", "1"]
+    for i in range(1, min(size, 3)):
+        atype, _ = KINDS[i % len(KINDS)]
+        argv += [f"--p{i}"] + VALUES.get(atype, SEQUENCE[:1])
+    return argv
+
+
+def worst_argv(size):
+    """
+    :param size: (int) the number of parameters of the function
+    :return: (list of str) a command line giving every parameter, \
+    sequences being repeated
+    """
+    argv = []
+    for i in range(size):
+        atype, _ = KINDS[i % len(KINDS)]
+        if atype in VALUES:
+            argv += [f"--p{i}"] + VALUES[atype]
+        else:
+            for value in SEQUENCE:
+                argv += [f"--p{i}", value]
+    return argv
+
+
+def measure(func, repeat):
+    """
+    Measure the time of one call of func.
+
+    :param func: (function) the function to time
+    :param repeat: (int) the number of measures
+    :return: (float) the best time in seconds
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def peak_memory(func):
+    """
+    :param func: (function) the function to call
+    :return: (int) the peak of memory allocated during the call in bytes
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_import(repeat):
+    """
+    :param repeat: (int) the number of measures
+    :return: (dict) the cold import time of lazyparser
+    """
+    times = []
+    for _ in range(repeat):
+        res = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import lazyparser"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        for line in res.stderr.splitlines():
+            if line.rstrip().endswith("| lazyparser"):
+                times.append(int(line.split("|")[1]) * 1e-6)
+    return {"import.cold": min(times)}
+
+
+def click_baseline(size):
+    """
+    :param size: (int) the number of parameters
+    :return: a plain click command equivalent to the synthetic function
+    """
+    import click
+
+    def command(**kwargs):
+        return None
+
+    for i in range(size):
+        atype, default = KINDS[i % len(KINDS)]
+        kwargs = {"required": i == 0, "help": f"parameter number {i}"}
+        if atype == "bool":
+            kwargs["is_flag"] = True
+        elif atype.startswith("tuple"):
+            kwargs.update(type=int, multiple=True)
+        else:
+            kwargs.update(type=eval(atype), default=eval(default))
+        command = click.option(f"--p{i}", f"-p{i}", **kwargs)(command)
+    return click.command()(command)
+
+
+def argparse_baseline(size):
+    """
+    :param size: (int) the number of parameters
+    :return: an argparse parser equivalent to the synthetic function
+    """
+    parser = argparse.ArgumentParser(description="Synthetic function.")
+    for i in range(size):
+        atype, default = KINDS[i % len(KINDS)]
+        kwargs = {"required": i == 0, "help": f"parameter number {i}"}
+        if atype == "bool":
+            kwargs["action"] = "store_true"
+        elif atype.startswith("tuple"):
+            kwargs.update(type=int, action="append")
+        else:
+            kwargs.update(type=eval(atype), default=eval(default))
+        parser.add_argument(f"--p{i}", f"-p{i}", **kwargs)
+    return parser
+
+
+def bench_size(size, repeat, max_help):
+    """
+    Measure the construction, the parsing and the help of the parser of a \
+    synthetic function.
+
+    :param size: (int) the number of parameters of the function
+    :param repeat: (int) the number of measures
+    :param max_help: (int) the largest size whose help is rendered
+    :return: (dict) the results
+    """
+    func = synthetic(size)
+    parser = lp.Lazyparser(func, {})
+    fast = lp.FastParser(parser)
+    cmd = lp.build_command(parser, func)
+    plain = lp.build_command(parser, func, "plain")
+    click_cmd = click_baseline(size)
+    argparser = argparse_baseline(size)
+    res = {
+        f"build.{size}.lazyparser": measure(
+            lambda: lp.Lazyparser(func, {}), repeat
+        ),
+        f"build.{size}.command": measure(
+            lambda: lp.build_command(parser, func), repeat
+        ),
+        f"build.{size}.click": measure(lambda: click_baseline(size), repeat),
+        f"build.{size}.argparse": measure(
+            lambda: argparse_baseline(size), repeat
+        ),
+        f"memory.{size}.lazyparser": peak_memory(
+            lambda: lp.build_command(lp.Lazyparser(func, {}), func)
+        ),
+        f"memory.{size}.click": peak_memory(lambda: click_baseline(size)),
+        f"memory.{size}.argparse": peak_memory(
+            lambda: argparse_baseline(size)
+        ),
+    }
+    for name, argv in [
+        ("typical", typical_argv(size)),
+        ("worst", worst_argv(size)),
+    ]:
+        res |= {
+            f"parse.{size}.{name}.fast": measure(
+                lambda: fast.parse(argv), repeat
+            ),
+            f"parse.{size}.{name}.lazyparser": measure(
+                lambda: cmd.main(argv, "bench", standalone_mode=False),
+                repeat,
+            ),
+            f"parse.{size}.{name}.click": measure(
+                lambda: click_cmd.main(argv, "bench", standalone_mode=False),
+                repeat,
+            ),
+            f"parse.{size}.{name}.argparse": measure(
+                lambda: argparser.parse_args(argv), repeat
+            ),
+        }
+
+    def render(command):
+        with contextlib.redirect_stdout(io.StringIO()):
+            command.main(["-h"], "bench", standalone_mode=False)
+
+    if size <= max_help:
+        res[f"help.{size}.lazyparser"] = measure(lambda: render(cmd), repeat)
+        res[f"help.{size}.plain"] = measure(lambda: render(plain), repeat)
+    return res
+
+
+def bench_short_names(sizes, repeat):
+    """
+    Measure the allocation of the short names of parameters sharing a \
+    long prefix.
+
+    :param sizes: (list of int) the numbers of parameters
+    :param repeat: (int) the number of measures
+    :return: (dict) the results
+    """
+    res = {}
+    for size in sizes:
+        names = [f"parameter_{i}" for i in range(size)]
+        res[f"short_names.{size}"] = measure(
+            lambda: lp.allocate_short_names(names), repeat
+        )
+    return res
+
+
+def bench_messages(repeat):
+    """
+    Measure the rendering of a warning by each backend.
+
+    :param repeat: (int) the number of measures
+    :return: (dict) the results
+    """
+    res = {}
+    arg = lp.Argument("threads", 1, int)
+    arg.short_name = "t"
+
+    def warn():
+        with contextlib.redirect_stdout(io.StringIO()):
+            with contextlib.redirect_stderr(io.StringIO()):
+                lp.message("Default value set to False", arg, "w")
+
+    for backend in lp.RENDERERS:
+        os.environ["LAZYPARSER_RENDERER"] = backend
+        try:
+            res[f"message.{backend}"] = measure(warn, repeat)
+        finally:
+            del os.environ["LAZYPARSER_RENDERER"]
+    return res
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results to a baseline.
+
+    :param results: (dict) the current results
+    :param baseline: (dict) the results of a previous run
+    :param tolerance: (float) the accepted relative slowdown
+    :return: (list of str) the names of the regressed measures
+    """
+    regressions = []
+    print(f"{'measure':<40} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name in sorted(set(results) & set(baseline)):
+        ratio = results[name] / baseline[name] if baseline[name] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<40} {baseline[name]:>12.4g} {results[name]:>12.4g} "
+            f"{ratio:>7.2f}{flag}"
+        )
+    return regressions
+
+
+@lp.standalone(False)
+@lp.parse
+def main(
+    output: str = "benchmark.json",
+    baseline: str = "",
+    tolerance: float = 0.25,
+    sizes: tuple[int, ...] = (5, 50, 500, 5000),
+    repeat: int = 3,
+    max_help: int = 500,
+    short_sizes: tuple[int, ...] = (10, 100, 1000, 10000),
+):
+    """
+    Run the benchmarks of lazyparser.
+
+    :param output: the JSON file where the results are written
+    :param baseline: a JSON file of previous results to compare with
+    :param tolerance: the relative slowdown accepted before a measure \
+    is flagged as a regression
+    :param sizes: the numbers of parameters of the synthetic functions
+    :param repeat: the number of measures of each benchmark
+    :param max_help: the largest number of parameters for which the \
+    rendering of the help is measured
+    :param short_sizes: the numbers of parameters whose short names are \
+    allocated
+    """
+    results = bench_import(repeat)
+    results |= bench_short_names(short_sizes, repeat)
+    results |= bench_messages(repeat)
+    for size in sizes:
+        print(f"benchmarking functions with {size} parameters", flush=True)
+        results |= bench_size(size, repeat, max_help)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "meta": {
+                    "lazyparser": lp.__version__,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    if not baseline:
+        for name, value in results.items():
+            print(f"{name:<40} {value:>12.4g}")
+        return 0
+    with open(baseline) as f:
+        regressions = compare(results, json.load(f)["results"], tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,26 +23,46 @@ limitations under the License.
 This script define the lazyparser.
 """
 
+import contextlib
+import contextvars
+import dataclasses
 import functools
+import hashlib
+import importlib
 import inspect
-import itertools
+import json
+import os
 import re
 import sys
+import time
 import types
-from collections.abc import Callable
+from collections.abc import Callable, Iterable, Mapping
 from typing import Any
 
-import rich_click as click
-from rich import print as rprint
-from rich.columns import Columns
-from rich.padding import Padding
-from rich.panel import Panel
-from rich.text import Text
-from rich_click.rich_help_formatter import RichHelpFormatter
-from rich_click.rich_help_rendering import _make_rich_rext
 
 __version__ = "0.4.1"
-__all__ = ("parse", "docstrings", "standalone", "version", "groups")
+__all__ = (
+    "parse",
+    "docstrings",
+    "standalone",
+    "version",
+    "groups",
+    "short_names",
+    "cache",
+    "event_loop",
+    "Subcommands",
+    "parse_args",
+    "batch",
+    "sweep",
+    "config_file",
+    "stream",
+    "LazyType",
+    "Array",
+    "MappedFile",
+    "File",
+    "check_paths",
+    "Glob",
+)
 
 
 #####################################
@@ -54,12 +74,74 @@ HEADER = ""  # header of arguments
 TAB = 4  # number of spaces composing tabulations
 EPI = None  # epilog for the parser
 GROUPS = {}  # the groups of arguments
-LPG_NAME = {}  # the name of the parser used
 PROG_VERSION = None  # The version of program where lazyparser is used
-FORBIDDEN = ["help", "h"]
+CACHE_DIR = None  # directory of the on-disk parser cache (disabled if None)
+CACHE_SIZE = 256  # maximal number of parsers kept in the on-disk cache
+SHORT_NAMES = {}  # short names pinned to some parameters
+TRACER = None  # the Tracer recording the phases of lazyparser, if any
+FORBIDDEN = ("help", "h")
 OPTIONAL_TITLE = "Optional arguments"
 REQUIRED_TITLE = "Required arguments"
 ######################################
+# The variables above are the defaults of the parsers. The decorators
+# never change them: they give their settings to the parser of the
+# function they decorate, in a Config.
+# the command line given to parse_args, None outside of parse_args
+PARSE_ARGV = contextvars.ContextVar("lazyparser_parse_argv", default=None)
+# options injected in the command line of every parsed function
+BATCH_OPTION = "--lazyparser-batch"
+WORKERS_OPTION = "--lazyparser-workers"
+# the function and the fixed values of a sweep, in the processes running it
+SWEEP = None
+# the values read in the files of defaults, by file, table and version
+DEFAULTS = {}
+STREAM_CHUNK = 1 << 16  # size in characters of the chunks of the streams
+BATCH_CHUNK = 32  # number of lines of a batch sent at once to a process
+RENDERERS = ("rich", "plain")  # the backends rendering the help
+# the click based classes of lazyparser, by name, created on first use
+CLICK_CLASSES = {}
+# the values of the LazyType arguments converted by the fast path before
+# it gives the command line to click, by name and string of the argument
+LAZY_VALUES = contextvars.ContextVar("lazyparser_lazy_values", default=None)
+# magic bytes, extension and module of the compressions of lp.File
+COMPRESSIONS = (
+    (b"\x1f\x8b", ".gz", "gzip"),
+    (b"BZh", ".bz2", "bz2"),
+    (b"\xfd7zXZ\x00", ".xz", "lzma"),
+)
+
+
+class LazyparserError(Exception):
+    """
+    Base class of the errors raised by ``parse_args`` instead of exiting.
+    """
+
+    def __init__(self, message: str, param: str | None = None):
+        """
+        :param message: (str) the description of the error
+        :param param: (str) the name of the parameter at fault, if any
+        """
+        super().__init__(message)
+        self.message = message
+        self.param = param
+
+
+class DefinitionError(LazyparserError):
+    """
+    The decorated function or the environment of lazyparser is invalid.
+    """
+
+
+class UsageError(LazyparserError):
+    """
+    The command line is invalid.
+    """
+
+
+class HelpRequested(LazyparserError):
+    """
+    The command line asks for the help or the version of the program.
+    """
 
 
 def handled_type(atype, htype="m"):
@@ -89,29 +171,156 @@ def is_click_type(atype):
     :param atype: (type) a type
     :return: (bool) True if the type is a click type, False otherwise
     """
+    if "click" not in sys.modules:
+        # no click type can exist before click is imported
+        return False
+    from click import ParamType
+
     try:
-        res = issubclass(atype, click.Path.__mro__[1])
+        res = issubclass(atype, ParamType)
         if res:
             return True
     except TypeError:
-        res = issubclass(type(atype), click.Path.__mro__[1])
+        res = issubclass(type(atype), ParamType)
         if res:
             return True
     return False
 
 
+@dataclasses.dataclass(frozen=True)
+class Config(object):
+    """
+    The settings of a parser. A Config is immutable and checked when it \
+    is created: ``replace`` gives a modified copy.
+    """
+
+    delim1: str = ":param"  # param delimiter 1
+    delim2: str = ":"  # param delimiter 2
+    header: str = ""  # header of arguments
+    tab: int = 4  # number of spaces composing tabulations
+    epilog: str | None = None  # epilog for the parser
+    groups: tuple[tuple[str, tuple[str, ...]], ...] = ()
+    version: str | None = None  # version of the program
+    standalone: bool = True  # True if the standalone mode is enabled
+    short_names: tuple[tuple[str, str], ...] = ()  # pinned short names
+    cache_dir: str | None = None  # directory of the on-disk parser cache
+    cache_size: int = 256  # maximal number of parsers kept in the cache
+    uvloop: bool = False  # True to run coroutines with uvloop if installed
+    loop_policy: Any = None  # event loop policy creating the loops
+    sweep: tuple[str, ...] = ()  # parameters run with each of their values
+    sweep_workers: int = 1  # number of processes running a sweep
+    sweep_output: str | None = None  # CSV or JSON lines file of a sweep
+    config_option: str | None = None  # option giving a file of defaults
+    pyproject: str | None = None  # tool whose pyproject.toml table is read
+    streams: tuple[str, ...] = ()  # parameters given as lazy iterators
+    stream_errors: str = "strict"  # strict or lenient value conversion
+    path_workers: int = 16  # number of threads checking the paths
+    defer_paths: bool = False  # True to check the paths on access
+
+    def __post_init__(self):
+        """
+        Check the settings.
+        """
+        for name, types_ in [
+            ("delim1", str),
+            ("delim2", str),
+            ("header", str),
+            ("tab", int),
+            ("epilog", (str, type(None))),
+            ("version", (str, type(None))),
+            ("standalone", bool),
+            ("cache_dir", (str, type(None))),
+            ("cache_size", int),
+            ("uvloop", bool),
+            ("sweep", tuple),
+            ("sweep_workers", int),
+            ("sweep_output", (str, type(None))),
+            ("config_option", (str, type(None))),
+            ("pyproject", (str, type(None))),
+            ("streams", tuple),
+            ("stream_errors", str),
+            ("path_workers", int),
+            ("defer_paths", bool),
+        ]:
+            if not isinstance(getattr(self, name), types_):
+                message(f"{name} has an invalid type", None, "e")
+        if self.delim2.strip() == "":
+            message("delim2 cannot be empty", None, "e")
+        if self.cache_size < 1:
+            message("size must be a positive integer", None, "e")
+        if self.loop_policy is not None and not callable(
+            getattr(self.loop_policy, "new_event_loop", None)
+        ):
+            message("policy must be an event loop policy", None, "e")
+        if not all(isinstance(name, str) for name in self.sweep):
+            message("the sweep dimensions must be names", None, "e")
+        if self.sweep_workers < 1:
+            message("workers must be a positive integer", None, "e")
+        if not all(isinstance(name, str) for name in self.streams):
+            message("the streamed parameters must be names", None, "e")
+        if self.stream_errors not in ("strict", "lenient"):
+            message("errors must be strict or lenient", None, "e")
+        if self.path_workers < 1:
+            message("workers must be a positive integer", None, "e")
+        check_groups(dict(self.groups))
+        check_short_names(dict(self.short_names))
+
+    def replace(self, **changes) -> "Config":
+        """
+        :param changes: the new value of some settings
+        :return: a copy of the config with the settings changed
+        """
+        return dataclasses.replace(self, **changes) if changes else self
+
+    @property
+    def forbidden(self) -> tuple[str, ...]:
+        """
+        :return: the names that the parameters cannot have
+        """
+        return (
+            FORBIDDEN
+            + (("version",) if self.version else ())
+            + ((self.config_option,) if self.config_option else ())
+        )
+
+    @property
+    def optional_title(self) -> str:
+        """
+        :return: the title of the group of the help option
+        """
+        return next(
+            (k for k, v in self.groups if "help" in v), OPTIONAL_TITLE
+        )
+
+
 class Argument(object):
     """
     Represent a Lazyparser Argument.
     """
 
-    def __init__(self, name_arg, default, arg_type):
+    # no __dict__: generated parsers can have thousands of arguments
+    __slots__ = (
+        "name",
+        "default",
+        "help",
+        "short_name",
+        "value",
+        "is_flag",
+        "const",
+        "type",
+        "pgroup",
+        "multiple",
+    )
+
+    def __init__(self, name_arg, default, arg_type, config=None):
         """
         Initiate the creation of an argument.
 
         :param name_arg: (string) the name of the argument
         :param default: the default value of the argument
         :param arg_type: (type) the type of the argument
+        :param config: (Config) the settings of the parser, the defaults \
+        if None
         """
         self.name = name_arg
         self.default = default
@@ -121,26 +330,78 @@ class Argument(object):
         self.is_flag = False
         self.const = "$$void$$"
         self.type = self.set_type(arg_type)
-        self.pgroup = self.get_parser_group()
+        self.pgroup = self.get_parser_group(config)
         self.multiple = False
 
+    def key(self) -> tuple:
+        """
+        :return: (tuple) the attributes compared by ``__eq__``
+        """
+        return (
+            self.name,
+            self.default,
+            self.help,
+            self.short_name,
+            self.value,
+            self.is_flag,
+            self.const,
+            self.type,
+            self.pgroup,
+        )
+
     def __eq__(self, arg):
         """
         Compare to Argument object and say if they are equal.
 
         :param arg: (Argument object)
         """
-        return (
-            self.name == arg.name
-            and self.default == arg.default
-            and self.help == arg.help
-            and self.short_name == arg.short_name
-            and self.value == arg.value
-            and self.is_flag == arg.is_flag
-            and self.const == arg.const
-            and self.type == arg.type
-            and self.pgroup == arg.pgroup
-        )
+        if not isinstance(arg, Argument):
+            return NotImplemented
+        return self.key() == arg.key()
+
+    def __hash__(self):
+        """
+        :return: (int) a hash of the attributes that cannot be unhashable
+        """
+        return hash((self.name, self.short_name, self.is_flag))
+
+    def to_spec(self) -> dict[str, Any]:
+        """
+        Get a JSON serializable view of the argument.
+
+        :return: the resolved attributes of the argument
+        """
+        return {
+            "name": self.name,
+            "default": encode_value(self.default),
+            "help": self.help,
+            "short_name": self.short_name,
+            "is_flag": self.is_flag,
+            "type": encode_type(self.type),
+            "pgroup": self.pgroup,
+        }
+
+    @classmethod
+    def from_spec(cls, spec: dict[str, Any]) -> "Argument":
+        """
+        Rebuild an argument from the output of ``to_spec`` without \
+        checking its type again.
+
+        :param spec: the resolved attributes of the argument
+        :return: the argument
+        """
+        arg = cls.__new__(cls)
+        arg.name = spec["name"]
+        arg.default = decode_value(spec["default"])
+        arg.help = spec["help"]
+        arg.short_name = spec["short_name"]
+        arg.value = None
+        arg.is_flag = spec["is_flag"]
+        arg.const = "$$void$$"
+        arg.type = decode_type(spec["type"])
+        arg.pgroup = spec["pgroup"]
+        arg.multiple = False
+        return arg
 
     def get_type(self):
         """
@@ -162,7 +423,7 @@ class Argument(object):
         if arg_type == inspect._empty:
             return inspect._empty
         if handled_type(arg_type):
-            if arg_type is bool or arg_type is click.BOOL:
+            if arg_type is bool:
                 if self.default == inspect._empty:
                     self.default = False
                 elif self.default:
@@ -178,12 +439,17 @@ class Argument(object):
         message(msg, self, "e")
         exit(1)
 
-    def gfn(self):
+    def gfn(self, plain: bool = False):
         """
         Get the full name of the argument.
 
+        :param plain: (bool) True to get the name without rich markup
         :return: (string) the full name of the argument
         """
+        if plain:
+            if self.short_name:
+                return f"'--{self.name}' / '-{self.short_name}'"
+            return f"'--{self.name}'"
         if self.short_name:
             n = (
                 "'[bold cyan]--%s[/bold cyan]' "
@@ -201,6 +467,10 @@ class Argument(object):
         """
         :return: (type)
         """
+        import click
+
+        if isinstance(self.type, LazyType):
+            return self.type.click_type()
         if self.type is bool:
             return click.BOOL
         elif isinstance(self.type, types.GenericAlias):
@@ -230,22 +500,21 @@ class Argument(object):
         else:
             return 1
 
-    def get_parser_group(self) -> str:
+    def get_parser_group(self, config: Config | None = None) -> str:
         """
         Get the group name of the wanted argument.
 
+        :param config: the settings of the parser, the defaults if None
         :return: the name of the group
         """
-        for key in GROUPS.keys():
-            if self.name in GROUPS[key]:
-                if "help" in GROUPS[key]:
-                    return key
-                else:
-                    return key
+        config = current_config() if config is None else config
+        for key, names in config.groups:
+            if self.name in names:
+                return key
         if self.default == inspect._empty:
             return REQUIRED_TITLE
         else:
-            return OPTIONAL_TITLE
+            return config.optional_title
 
 
 class Lazyparser(object):
@@ -253,17 +522,20 @@ class Lazyparser(object):
     Lazyparser class.
     """
 
-    def __init__(self, function, click_type):
+    def __init__(self, function, click_type, config=None):
         """
         Initialization with a function.
 
         :param function: (function) a function
         :param click_type: (dictionary) the click dtype
+        :param config: (Config) the settings of the parser, the defaults \
+        if None
         """
         self.func = function
+        self.config = current_config() if config is None else config
         self.args = self.init_args()
-        self.help = self.description()
-        self.update_param()
+        self.help, params = parse_docstring(self.func.__doc__, self.config)
+        self.update_param(params)
         self.get_short_name()
         self.set_constrain(click_type)
 
@@ -279,13 +551,52 @@ class Lazyparser(object):
         """
         return self.args == parser.args and self.help == parser.help
 
+    def to_spec(self) -> dict[str, Any]:
+        """
+        Get a JSON serializable view of the parser. A TypeError is raised \
+        if a type or a default value cannot be serialized.
+
+        :return: the description and the arguments of the parser
+        """
+        return {
+            "help": self.help,
+            "args": [arg.to_spec() for arg in self.args.values()],
+        }
+
+    @classmethod
+    def from_spec(
+        cls,
+        function: Callable,
+        spec: dict[str, Any],
+        click_type,
+        config: Config | None = None,
+    ) -> "Lazyparser":
+        """
+        Rebuild a parser from the output of ``to_spec`` without reading \
+        the signature and the docstring of function.
+
+        :param function: (function) a function
+        :param spec: the description and the arguments of the parser
+        :param click_type: (dictionary) the click dtype
+        :param config: the settings of the parser, the defaults if None
+        :return: the parser of function
+        """
+        lp = cls.__new__(cls)
+        lp.func = function
+        lp.config = current_config() if config is None else config
+        lp.args = {a["name"]: Argument.from_spec(a) for a in spec["args"]}
+        lp.help = spec["help"]
+        lp.set_constrain(click_type)
+        return lp
+
     def init_args(self):
         """
         Initiate the creation the argument of interest.
         """
-        sign = inspect.signature(self.func).parameters
-        if any([x in sign.keys() for x in FORBIDDEN]):
-            bad = [x for x in FORBIDDEN if x in sign.keys()]
+        sign = get_signature(self.func)
+        forbidden = self.config.forbidden
+        if any([x in sign.keys() for x in forbidden]):
+            bad = [x for x in forbidden if x in sign.keys()]
             msg = (
                 f"argument conflict, {bad} argument(s) cannot be set in"
                 + " the parsed function"
@@ -293,19 +604,43 @@ class Lazyparser(object):
             message(msg, None, "e")
             exit(1)
         else:
+            for name in self.config.sweep:
+                if name not in sign:
+                    message(f"unknown sweep dimension {name}", None, "e")
+            for name in self.config.streams:
+                if name not in sign:
+                    message(f"unknown streamed parameter {name}", None, "e")
+                if not is_multiple(sign[name].annotation):
+                    message(
+                        f"{name} must be typed tuple[type, ...] to be "
+                        "streamed",
+                        None,
+                        "e",
+                    )
             dic_args = {
                 k: Argument(
                     k,
-                    sign[k].default,
-                    sign[k].annotation
-                    if sign[k].annotation != inspect._empty
-                    else str,
+                    *(
+                        sweep_param(sign[k])
+                        if k in self.config.sweep
+                        else (sign[k].default, tuple[str, ...])
+                        if k in self.config.streams
+                        else (
+                            sign[k].default,
+                            sign[k].annotation
+                            if sign[k].annotation != inspect._empty
+                            else str,
+                        )
+                    ),
+                    self.config,
                 )
                 for k in sign.keys()
             }
-            tmp = {"help": Argument("help", "help", str)}
-            if PROG_VERSION:
-                tmp["version"] = Argument("version", "version", str)
+            tmp = {"help": Argument("help", "help", str, self.config)}
+            if self.config.version:
+                tmp["version"] = Argument(
+                    "version", "version", str, self.config
+                )
             return tmp | dic_args
 
     def description(self):
@@ -314,48 +649,17 @@ class Lazyparser(object):
 
         :return: (string) description of self.func
         """
-        if not self.func.__doc__:
-            return ""
-        else:
-            description = ""
-            doc = iter(re.split("[\n\r]", self.func.__doc__))
-            doc = itertools.dropwhile(lambda x: x == "", doc)
-            if PD1 == "":
-                delim = PD2
-            else:
-                delim = PD1
-            if not HEADER:
-                doc = itertools.takewhile(lambda x: delim not in x, doc)
-            else:
-                doc = itertools.takewhile(
-                    lambda x: delim not in x and HEADER not in x, doc
-                )
-            for line in doc:
-                if line[0:TAB].strip() == "":
-                    line = line[TAB:]
-                else:
-                    line = line.lstrip()
-                if description:
-                    description += "\n" + line
-                else:
-                    description = line
-            return description
+        return parse_docstring(self.func.__doc__, self.config)[0]
 
     def get_short_name(self):
         """
         Get the short param name of self.args
         """
-        param_names = sorted(list(self.args.keys()))
-        if "help" in param_names:
-            self.args["help"].short_name = "h"
-            selected_param = ["h"]
-            del param_names[param_names.index("help")]
-        else:
-            selected_param = []
-        for param in param_names:
-            sn = get_name(param, selected_param)
+        names = allocate_short_names(
+            self.args.keys(), dict(self.config.short_names)
+        )
+        for param, sn in names.items():
             self.args[param].short_name = sn
-            selected_param.append(sn)
 
     def set_constrain(self, click_type: dict[str, Any]):
         """
@@ -363,9 +667,28 @@ class Lazyparser(object):
 
         :param click_type: (dictionary of values) the constrains as click type
         """
+        # click.Path of the tuple[str, ...] parameters, checked in bulk
+        self.paths = {}
         for marg in click_type.keys():
             if marg in self.args.keys():
-                if is_click_type(click_type[marg]):
+                if isinstance(click_type[marg], LazyType):
+                    if self.args[marg].type is not str:
+                        message(
+                            f"{click_type[marg]} given to a parameter "
+                            + f"typed {self.args[marg].type}, "
+                            + "it will be applied",
+                            self.args[marg],
+                            "w",
+                        )
+                    self.args[marg].type = click_type[marg]
+                elif is_click_type(click_type[marg]):
+                    import click
+
+                    if isinstance(click_type[marg], click.Path) and (
+                        self.args[marg].type == tuple[str, ...]
+                    ):
+                        self.paths[marg] = click_type[marg]
+                        continue
                     if (
                         (
                             isinstance(click_type[marg], click.IntRange)
@@ -396,144 +719,370 @@ class Lazyparser(object):
                     )
                     exit(1)
 
-    def create_click_group(self):
+    def create_click_group(self) -> dict[str, list[dict[str, Any]]]:
         """
         Create a click group for the parser.
+
+        :return: the rich-click option groups of the parser
         """
-        if GROUPS:
-            dic_grp = {k: [] for k in GROUPS}
-        else:
-            dic_grp = {}
+        dic_grp = {k: [] for k, _ in self.config.groups}
         for _, arg in self.args.items():
             if arg.pgroup in dic_grp:
                 dic_grp[arg.pgroup].append(f"--{arg.name}")
             else:
                 dic_grp[arg.pgroup] = [f"--{arg.name}"]
-        click.rich_click.OPTION_GROUPS = {
-            sys.argv[0]: [
-                {"name": key, "options": dic_grp[key]} for key in dic_grp
-            ]
+        if self.config.config_option:
+            dic_grp.setdefault(self.config.optional_title, []).append(
+                f"--{self.config.config_option}"
+            )
+        return {
+            "*": [{"name": key, "options": dic_grp[key]} for key in dic_grp]
         }
 
-    def update_param(self):
+    def update_param(self, params: dict[str, str] | None = None):
         """
         Update if needed the help of every args.
+
+        :param params: the help of the parameters, read from the \
+        docstring of self.func if not given
         """
-        if self.func.__doc__:
-            doc = filter(
-                lambda x: PD1 in x and PD2 in x,
-                re.split("[\n\r]", self.func.__doc__),
-            )
-            for line in doc:
-                if PD1 != "":
-                    flt = list(filter(None, line.split(PD1)[1].split(PD2)))
+        if params is None:
+            params = parse_docstring(self.func.__doc__, self.config)[1]
+        for name, help in params.items():
+            if name in self.args:
+                self.args[name].help = help
+
+
+# headers of the parameter sections of Google style docstrings
+GOOGLE_SECTIONS = (
+    "Args:",
+    "Arguments:",
+    "Parameters:",
+    "Params:",
+    "Keyword Args:",
+    "Keyword Arguments:",
+)
+# headers of the parameter sections of NumPy style docstrings
+NUMPY_SECTIONS = ("Parameters", "Other Parameters")
+NEWLINE = re.compile("[\n\r]")
+SPACES = re.compile(" +")
+UNDERLINE = re.compile(r"\s*-{3,}\s*")
+GOOGLE_PARAM = re.compile(r"\s*\**(\w+)\s*(?:\([^)]*\))?\s*:(.*)")
+NUMPY_PARAM = re.compile(r"\s*(\w+(?:\s*,\s*\w+)*)\s*(?::.*)?")
+
+
+@functools.lru_cache(maxsize=32)
+def docstring_patterns(
+    pd1: str, pd2: str, header: str
+) -> tuple[re.Pattern, re.Pattern]:
+    """
+    Compile the regular expressions reading docstrings written with the \
+    given delimiters.
+
+    :param pd1: (str) the first delimiter of a parameter
+    :param pd2: (str) the second delimiter of a parameter
+    :param header: (str) the parameters header
+    :return: the pattern ending the description and the pattern of a \
+    parameter line
+    """
+    stop = re.escape(pd2 if pd1 == "" else pd1)
+    if header:
+        stop += "|" + re.escape(header)
+    param = f"{re.escape(pd1)}(.*?){re.escape(pd2)}(.*)"
+    return re.compile(stop), re.compile(param)
+
+
+def parse_docstring(
+    doc: str | None, config: Config | None = None
+) -> tuple[str, dict[str, str]]:
+    """
+    Read a docstring in a single pass. The parameters are documented \
+    with the delimiters of the environment (``:param x: help`` by \
+    default), in a Google style section (``Args:`` followed by indented \
+    ``x (int): help`` lines) or in a NumPy style section (``Parameters`` \
+    underlined by dashes, followed by ``x : int`` lines and their \
+    indented help).
+
+    :param doc: (str) a docstring
+    :param config: the settings giving the delimiters, the defaults if None
+    :return: the description and the help of each parameter
+    """
+    if not doc:
+        return "", {}
+    config = current_config() if config is None else config
+    tab = config.tab
+    stop, param = docstring_patterns(
+        config.delim1, config.delim2, config.header
+    )
+    lines = NEWLINE.split(doc)
+    description, params = [], {}
+    in_description = True
+    section = None  # style and indentation of the current section
+    current = []  # the parameters whose help is being read
+    skip = False
+    for i, line in enumerate(lines):
+        if skip:
+            skip = False
+            continue
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        numpy_header = (
+            stripped in NUMPY_SECTIONS
+            and i + 1 < len(lines)
+            and UNDERLINE.fullmatch(lines[i + 1]) is not None
+        )
+        if section is not None:
+            style, level = section[:2]
+            if not stripped:
+                continue
+            if style == "google" and indent > level:
+                m = GOOGLE_PARAM.fullmatch(line)
+                if section[2:] in [(), (indent,)] and m:
+                    section = (style, level, indent)
+                    current = [m[1]]
+                    params[m[1]] = [m[2]]
                 else:
-                    flt = list(filter(None, line.split(PD2)))
-                flt = [word for word in flt]
-                flt[0] = flt[0].strip()
-                if flt[0] in self.args.keys():
-                    if len(flt[1:]) > 1:
-                        flt_desc = PD2.join(flt[1:])
-                    else:
-                        flt_desc = flt[1]
-                    self.args[flt[0]].help = re.sub(
-                        " +", " ", flt_desc.strip()
-                    )
+                    for name in current:
+                        params[name].append(stripped)
+                continue
+            if style == "numpy" and indent >= level and not numpy_header:
+                m = NUMPY_PARAM.fullmatch(line)
+                if indent == level and m:
+                    current = [n.strip() for n in m[1].split(",")]
+                    params |= {name: [] for name in current}
+                else:
+                    for name in current:
+                        params[name].append(stripped)
+                continue
+            section, current = None, []
+        if in_description:
+            if not description and line == "":
+                continue
+            if (
+                stop.search(line) is None
+                and stripped not in GOOGLE_SECTIONS
+                and not numpy_header
+            ):
+                if line[0:tab].strip() == "":
+                    description.append(line[tab:])
+                else:
+                    description.append(line.lstrip())
+                continue
+            in_description = False
+        if stripped in GOOGLE_SECTIONS:
+            section = ("google", indent)
+        elif numpy_header:
+            section, skip = ("numpy", indent), True
+        else:
+            m = param.search(line)
+            if m and m[1].strip():
+                params[m[1].strip()] = [m[2]]
+    helps = {
+        name: SPACES.sub(" ", " ".join(help).strip())
+        for name, help in params.items()
+    }
+    return "\n".join(description), {k: v for k, v in helps.items() if v}
+
+
+def sweep_param(param: inspect.Parameter) -> tuple[Any, Any]:
+    """
+    :param param: a parameter of a function, dimension of a sweep
+    :return: the default value and the type of its argument, taking \
+    every value of the dimension
+    """
+    atype = str if param.annotation is inspect._empty else param.annotation
+    if atype is bool or isinstance(atype, types.GenericAlias):
+        message(f"{param.name} cannot be a sweep dimension", None, "e")
+    if param.default is inspect._empty:
+        return inspect._empty, tuple[atype, ...]
+    return (param.default,), tuple[atype, ...]
+
 
+def get_signature(func: Callable) -> types.MappingProxyType:
+    """
+    :param func: (function) a function
+    :return: the parameters of the signature of func
+    """
+    return inspect.signature(func).parameters
 
-def set_env(env: dict | None):
+
+def env_settings(env: dict[str, Any]) -> dict[str, Any]:
     """
-    Change the param delimiters.
+    Check a docstring environment.
 
     :param env: A dictionnary that may contain the following keys:
         - tab: (int) the number of spaces or tabs before the docstring
         - delim1: (str) the first delimiter of a parameter
         - delim2: (str) the second delimiter of a parameter
         - header: (str) the parameters header
+    :return: the settings of the environment
     """
-    if not env:
-        return None
     for v, t in zip(
         ["tab", "delim1", "delim2", "header", "epilog"],
         [int, str, str, str, str],
     ):
         if v in env and not isinstance(env[v], t):
             message(f"{v} must be of type {t.__name__}", None, "e")
-    if "tab" in env and isinstance(env["tab"], int):
-        global TAB
-        TAB = env["tab"]
-    if "delim1" in env and isinstance(env["delim1"], str):
-        global PD1
-        PD1 = env["delim1"].strip()
-    if "delim2" in env and isinstance(env["delim2"], str):
-        if env["delim2"].strip() == "":
-            message("delim2 cannot be empty", None, "e")
-        global PD2
-        PD2 = env["delim2"].strip()
-    if "header" in env and isinstance(env["header"], str):
-        global HEADER
-        HEADER = env["header"].strip()
+    settings = {
+        k: env[k].strip() for k in ["delim1", "delim2", "header"] if k in env
+    }
+    if "tab" in env:
+        settings["tab"] = env["tab"]
+    return settings
 
 
-def set_groups(arg_groups=None):
+def set_env(env: dict[str, Any]):
     """
-    Change the name of the argument groups.
+    Change the default param delimiters of every parser.
+
+    :param env: A dictionnary that may contain the following keys:
+        - tab: (int) the number of spaces or tabs before the docstring
+        - delim1: (str) the first delimiter of a parameter
+        - delim2: (str) the second delimiter of a parameter
+        - header: (str) the parameters header
+    """
+    if not env:
+        return None
+    config = current_config().replace(**env_settings(env))
+    global TAB, PD1, PD2, HEADER
+    TAB, PD1, PD2, HEADER = (
+        config.tab,
+        config.delim1,
+        config.delim2,
+        config.header,
+    )
+
+
+def check_groups(arg_groups: dict[str, list[str]]):
+    """
+    Check the names of the argument groups.
 
     :param arg_groups: (dictionary of list of string) links each arguments to \
     its groups.
     """
-    pname = {}
     tmp = []
-    help_name = "Optional arguments"
-    if arg_groups:
-        for key in arg_groups.keys():
-            if "help" in arg_groups[key]:
-                help_name = key
-                n = "__parser__"
-            else:
-                n = "".join(re.findall(r"[A-Za-z0-9_]", key))
-                n = re.sub(r"^[0-9]*", "", n)
-                if len(n) == 0:
-                    msg = (
-                        "The name '%s' must have at least one of the"
-                        + "following symbols [A-Za-z]"
-                    ) % key
-                    message(msg, None, "e")
-                    exit(1)
-            pname[key] = n
-            if n not in tmp:
-                tmp.append(n)
-            else:
+    for key in arg_groups.keys():
+        if "help" in arg_groups[key]:
+            n = "__parser__"
+        else:
+            n = "".join(re.findall(r"[A-Za-z0-9_]", key))
+            n = re.sub(r"^[0-9]*", "", n)
+            if len(n) == 0:
                 msg = (
-                    "%s after removing symbols not in [A-Za-z0-9]"
-                    + "is already defined"
+                    "The name '%s' must have at least one of the"
+                    + "following symbols [A-Za-z]"
                 ) % key
                 message(msg, None, "e")
                 exit(1)
+        if n not in tmp:
+            tmp.append(n)
+        else:
+            msg = (
+                "%s after removing symbols not in [A-Za-z0-9]"
+                + "is already defined"
+            ) % key
+            message(msg, None, "e")
+            exit(1)
+
+
+def set_groups(arg_groups=None):
+    """
+    Change the default argument groups of every parser.
+
+    :param arg_groups: (dictionary of list of string) links each arguments to \
+    its groups.
+    """
+    check_groups(arg_groups or {})
     global GROUPS
     GROUPS = arg_groups if arg_groups is not None else {}
-    global LPG_NAME
-    LPG_NAME = pname
-    global OPTIONAL_TITLE
-    OPTIONAL_TITLE = help_name
+
+
+def short_name_settings(names: dict[str, str]) -> dict[str, str]:
+    """
+    :param names: (dictionary of string) links parameters to their short \
+    name
+    :return: the short names without their dashes
+    """
+    return {k: v.strip().lstrip("-") for k, v in names.items()}
+
+
+def check_short_names(names: dict[str, str]):
+    """
+    Check the pinned short names.
+
+    :param names: (dictionary of string) links parameters to their short \
+    name
+    """
+    seen = {"h": "help"}
+    for param, sn in names.items():
+        if not sn or any(c.isspace() for c in sn):
+            message(f"invalid short name {sn!r} for {param}", None, "e")
+        if sn in seen:
+            message(
+                f"the short name -{sn} of {param} is already used by "
+                f"{seen[sn]}",
+                None,
+                "e",
+            )
+        seen[sn] = param
+
+
+def set_short_names(names: dict[str, str] | None = None):
+    """
+    Pin the short name of some parameters of every parser.
+
+    :param names: (dictionary of string) links parameters to their short \
+    name
+    """
+    names = short_name_settings(names or {})
+    check_short_names(names)
+    global SHORT_NAMES
+    SHORT_NAMES = names
 
 
 def get_name(name, list_of_name, size=1):
     """
+    Get the shortest free prefix of a name, tried in lower case then in \
+    upper case.
 
     :param name: (string) the param name
-    :param list_of_name: (string) the list of param name
+    :param list_of_name: (set of string) the short names already taken
     :param size: (int) the size of the name used
     :return: (string) the param name selected
     """
-    if size == len(name):
-        return name
-    elif name[0:size] not in list_of_name:
-        return name[0:size]
-    elif name[0:size].upper() not in list_of_name:
-        return name[0:size].upper()
-    else:
-        return get_name(name, list_of_name, size=size + 1)
+    for size in range(size, len(name)):
+        prefix = name[0:size]
+        if prefix not in list_of_name:
+            return prefix
+        if prefix.upper() not in list_of_name:
+            return prefix.upper()
+    return name
+
+
+def allocate_short_names(
+    names: Iterable[str], pinned: dict[str, str] | None = None
+) -> dict[str, str]:
+    """
+    Give a unique short name to every parameter. ``help`` is pinned to \
+    ``h``, the pinned names are kept and the other parameters get, in \
+    alphabetical order, the shortest free prefix of their name. The cost \
+    is linear in the total length of the names.
+
+    :param names: the names of the parameters
+    :param pinned: (dictionary of string) short names given explicitly
+    :return: (dictionary of string) the short name of each parameter
+    """
+    names = set(names)
+    pinned = {"help": "h"} | (pinned or {})
+    res = {k: v for k, v in pinned.items() if k in names}
+    taken = set(res.values())
+    for name in sorted(names - res.keys()):
+        sn = get_name(name, taken)
+        if sn in taken:
+            message(f"no short name is left for {name}", None, "e")
+        res[name] = sn
+        taken.add(sn)
+    return res
 
 
 def check_subtype(argtype: type | types.GenericAlias, arg: Argument):
@@ -561,134 +1110,3345 @@ def check_subtype(argtype: type | types.GenericAlias, arg: Argument):
                 )
 
 
-def get_rich_usage(
-    formatter: Any,
-    prog: str,
-    args: str = "",
-    prefix: str | None = None,
-) -> None:
-    """Richly render usage text."""
-    if prefix is None:
-        prefix = "Usage:"
+def encode_type(atype) -> str | list:
+    """
+    Encode a type handled by lazyparser.
 
-    config = formatter.config
+    :param atype: (type) a type
+    :return: the name of the type or, for tuples, the names of their subtypes
+    """
+    if isinstance(atype, types.GenericAlias):
+        return [encode_type(t) for t in atype.__args__]
+    if atype is Ellipsis:
+        return "..."
+    if atype in (int, float, bool, str):
+        return atype.__name__
+    raise TypeError(f"type {atype} cannot be encoded")
 
-    # Header text if we have it
-    if config.header_text:
-        formatter.write(
-            Padding(
-                _make_rich_rext(
-                    config.header_text, config.style_header_text, formatter
-                ),
-                (1, 1, 0, 1),
-            ),
-        )
 
-    # Print usage
-    formatter.write(
-        Padding(
-            Columns(
-                (
-                    Text(prefix, style=config.style_usage),
-                    Text(prog, style=config.style_usage_command),
-                    args,
-                )
-            ),
-            1,
-        ),
-    )
+def decode_type(code: str | list):
+    """
+    Decode a type encoded with ``encode_type``.
 
+    :param code: the encoded type
+    :return: (type) the type
+    """
+    if isinstance(code, list):
+        return tuple[tuple(decode_type(c) for c in code)]
+    if code == "...":
+        return Ellipsis
+    return {"int": int, "float": float, "bool": bool, "str": str}[code]
 
-class MyRichHelpFormatter(RichHelpFormatter):
-    def write_usage(
-        self, prog: str, args: str = "", prefix: str | None = None
-    ) -> None:
-        get_rich_usage(formatter=self, prog=prog, args=args, prefix=prefix)
 
+def encode_value(value) -> Any:
+    """
+    Encode a default value into JSON serializable objects.
 
-click.RichContext.formatter_class = MyRichHelpFormatter
+    :param value: a default value
+    :return: the encoded value
+    """
+    if value is inspect._empty:
+        return {"empty": None}
+    if isinstance(value, tuple):
+        return {"tuple": [encode_value(v) for v in value]}
+    if value is None or type(value) in (bool, int, float, str):
+        return value
+    raise TypeError(f"value {value!r} cannot be encoded")
 
 
-class HelpfulCmd(click.RichCommand):
-    def collect_usage_pieces(self, ctx):
-        """Returns all the pieces that go into the usage line and returns
-        it as a list of strings.
-        """
-        rv = []
-        nt = ""
-        for p in self.params:
-            if p.required:
-                rv.append(f"[bold cyan]--{p.name}[/bold cyan]")
-                rv.append(f"[bold yellow]{p.make_metavar()}[/bold yellow]")
-            elif p.name not in FORBIDDEN:
-                if p.is_flag:  # type: ignore
-                    nt += f"[--[bold cyan]{p.name}[/bold cyan]] "
-                else:
-                    nt += f"[--[bold cyan]{p.name}[/bold cyan] [bold yellow]{str(p.make_metavar())}[/bold yellow]] "
-        rv.append(nt.strip())
-        return rv
+def decode_value(code: Any) -> Any:
+    """
+    Decode a value encoded with ``encode_value``.
+
+    :param code: the encoded value
+    :return: the value
+    """
+    if isinstance(code, dict):
+        if "empty" in code:
+            return inspect._empty
+        return tuple(decode_value(c) for c in code["tuple"])
+    return code
 
-    def format_options(
-        self, ctx: click.Context, formatter: click.HelpFormatter
-    ) -> None:
-        from rich_click.rich_help_rendering import get_rich_options
 
-        get_rich_options(self, ctx, formatter)  # type: ignore[arg-type]
+def user_cache_dir() -> str:
+    """
+    :return: the default directory of the on-disk parser cache
+    """
+    if os.name == "nt":
+        root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        root = os.environ.get(
+            "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+        )
+    return os.path.join(root, "lazyparser")
 
 
-def add_option(option: Argument, func: Callable) -> Callable:
+def spec_key(func: Callable, config: Config | None = None) -> str:
     """
-    Add an option to the function used to create the CLI.
+    Get the key identifying the parser of func in the on-disk cache. \
+    It changes with the signature, the docstring, the settings and \
+    the version of lazyparser.
 
-    :param option: a lazyparser argument
-    :param func: the function used to create a CLI
-    :return: The function func decorated with click.option()
+    :param func: (function) a function
+    :param config: the settings of the parser, the defaults if None
+    :return: (string) the key of func
     """
-    args = (f"--{option.name}", f"-{option.short_name}")
-    kwargs = dict(
-        nargs=option.click_narg(),
-        type=option.click_type(),
-        is_flag=option.is_flag,
-        show_default=False,
-        required=True,
-        help=option.help,
-        multiple=option.multiple,
+    config = current_config() if config is None else config
+    code = func.__code__
+    source = repr(
+        (
+            code.co_varnames[: code.co_argcount + code.co_kwonlyargcount],
+            func.__defaults__,
+            func.__kwdefaults__,
+            func.__annotations__,
+            func.__doc__,
+            config.replace(
+                cache_dir=None,
+                cache_size=Config.cache_size,
+                uvloop=False,
+                loop_policy=None,
+                sweep_workers=1,
+                sweep_output=None,
+                path_workers=Config.path_workers,
+            ),
+            __version__,
+        )
     )
-    if option.default != inspect._empty:
-        kwargs["default"] = option.default
-        kwargs["required"] = False
-        kwargs["show_default"] = True
-    func = click.option(
-        *args,
-        **kwargs,  # type: ignore
-    )(func)
+    digest = hashlib.sha1(source.encode()).hexdigest()[:16]
+    # <locals> and the like are not valid in the file names of windows
+    name = re.sub(r"[^\w.-]", "_", f"{func.__module__}.{func.__qualname__}")
+    return f"{name}-{digest}"
 
-    return func
+
+def type_key(atype: Any) -> str:
+    """
+    Describe a type without the memory addresses of the default reprs, \
+    so that the description is the same in every process.
+
+    :param atype: a type, a click type, a LazyType or one of their \
+    attributes
+    :return: (string) the description of atype
+    """
+    if isinstance(atype, (list, tuple)):
+        return repr([type_key(v) for v in atype])
+    if isinstance(atype, (type, types.GenericAlias)):
+        return repr(atype)
+    if callable(atype) and hasattr(atype, "__qualname__"):
+        return f"{atype.__module__}.{atype.__qualname__}"
+    if not hasattr(atype, "__dict__"):
+        return repr(atype)
+    attrs = sorted(
+        (k, type_key(v)) for k, v in vars(atype).items() if k[0] != "_"
+    )
+    cls = type(atype)
+    return f"{cls.__module__}.{cls.__qualname__}{attrs}"
+
+
+def spec_path(directory: str, key: str) -> str:
+    """
+    :param directory: the directory of the cache
+    :param key: the key of a parser
+    :return: the file of the spec of the parser in the on-disk cache
+    """
+    return os.path.join(directory, f"{key}.lpspec.json")
+
+
+def evict(directory: str, suffix: str, size: int) -> None:
+    """
+    Remove the least recently used entries of the on-disk cache ending \
+    with suffix to keep at most size of them. The other files of the \
+    directory are left untouched.
+
+    :param directory: the directory of the cache
+    :param suffix: the suffix of the entries of one kind
+    :param size: the maximal number of entries kept
+    """
+    entries = [e for e in os.scandir(directory) if e.name.endswith(suffix)]
+    if len(entries) > size:
+        entries.sort(key=lambda e: e.stat().st_mtime_ns)
+        for entry in entries[: len(entries) - size]:
+            os.remove(entry.path)
+
+
+def load_spec(path: str, key: str) -> dict[str, Any] | None:
+    """
+    Load a parser spec from the on-disk cache.
+
+    :param path: the file of the spec
+    :param key: the key the spec must have
+    :return: the spec or None if it is missing, stale or corrupt
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        if spec["key"] != key or spec["version"] != __version__:
+            return None
+        for arg in spec["args"]:
+            decode_type(arg["type"])
+            decode_value(arg["default"])
+        os.utime(path)
+        return spec
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def dump_spec(lp: Lazyparser, directory: str, key: str) -> None:
+    """
+    Write the spec of a parser in the on-disk cache and evict the least \
+    recently used specs to keep at most ``lp.config.cache_size`` entries.
+
+    :param lp: the parser to store
+    :param directory: the directory of the cache
+    :param key: the key of the parser
+    """
+    try:
+        spec = lp.to_spec() | {"key": key, "version": __version__}
+    except TypeError:
+        return None
+    import tempfile
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        os.replace(tmp, spec_path(directory, key))
+        evict(directory, ".lpspec.json", lp.config.cache_size)
+    except OSError:
+        return None
+
+
+def cached_parser(
+    function: Callable, click_type, config: Config | None = None
+) -> Lazyparser:
+    """
+    Create the parser of function, using the on-disk cache if it is enabled.
+
+    :param function: (function) a function
+    :param click_type: (dictionary) the click dtype
+    :param config: the settings of the parser, the defaults if None
+    :return: the parser of function
+    """
+    config = current_config() if config is None else config
+    if config.cache_dir is None:
+        return Lazyparser(function, click_type, config)
+    key = spec_key(function, config)
+    spec = load_spec(spec_path(config.cache_dir, key), key)
+    if spec is not None:
+        return Lazyparser.from_spec(function, spec, click_type, config)
+    lp = Lazyparser(function, {}, config)
+    dump_spec(lp, config.cache_dir, key)
+    lp.set_constrain(click_type)
+    return lp
+
+
+def load_defaults(
+    path: str, config: Config, section: tuple[str, ...] = ()
+) -> dict[str, Any]:
+    """
+    Read the default values of the parameters in a TOML or JSON file. \
+    The values are kept in memory and, when the on-disk cache is \
+    enabled, on disk: a file is only read again when it changes.
+
+    :param path: (string) the file, read as TOML if it ends with .toml \
+    and as JSON otherwise
+    :param config: the settings of the parser
+    :param section: (tuple of string) the keys of the table of the \
+    values in the file, the whole file if empty
+    :return: (dictionary) the values of the parameters
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        return message(f"cannot read the defaults {path}: {e}", None, "e")
+    path = os.path.abspath(path)
+    key = [path, list(section), stat.st_mtime_ns, stat.st_size]
+    values = DEFAULTS.get(repr(key))
+    if values is not None:
+        return values
+    stored = None
+    if config.cache_dir is not None:
+        digest = hashlib.sha1(repr(key[:2]).encode()).hexdigest()[:16]
+        stored = os.path.join(config.cache_dir, f"{digest}.defaults")
+        try:
+            with open(stored, encoding="utf-8") as f:
+                data = json.load(f)
+            if data["key"] == key:
+                values = data["values"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    if values is None:
+        try:
+            if path.endswith(".toml"):
+                import tomllib
+
+                with open(path, "rb") as f:
+                    values = tomllib.load(f)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    values = json.load(f)
+        except (OSError, ValueError) as e:
+            return message(f"invalid defaults {path}: {e}", None, "e")
+        for name in section:
+            values = values.get(name, {}) if isinstance(values, dict) else {}
+        if not isinstance(values, dict):
+            return message(f"{path} must give a table of values", None, "e")
+        if stored is not None:
+            import tempfile
+
+            try:
+                os.makedirs(config.cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=config.cache_dir)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"key": key, "values": values}, f)
+                os.replace(tmp, stored)
+            except (OSError, TypeError):
+                pass
+    DEFAULTS[repr(key)] = values
+    return values
+
+
+def values_argv(values: Mapping[str, Any], lp: Lazyparser) -> list[str]:
+    """
+    :param values: the values of some parameters: True and False for \
+    the flags, lists for the tuples
+    :param lp: the parser of the parameters
+    :return: (list of string) a command line giving these values
+    """
+    argv = []
+    for name, value in values.items():
+        arg = lp.args.get(name)
+        if value is True:
+            argv.append(f"--{name}")
+        elif value is False or value is None:
+            continue
+        elif not isinstance(value, list):
+            argv += [f"--{name}", str(value)]
+        elif arg is not None and is_multiple(arg.type):
+            for v in value:
+                argv += [f"--{name}", str(v)]
+        else:
+            argv += [f"--{name}"] + [str(v) for v in value]
+    return argv
+
+
+def option_nargs(lp: Lazyparser) -> dict[str, int]:
+    """
+    :param lp: a parser
+    :return: (dictionary) the number of values taken by each option of \
+    the parser, by its long and its short name
+    """
+    nargs = {}
+    for arg in lp.args.values():
+        if arg.name not in lp.config.forbidden:
+            n = 0 if arg.is_flag else len(fast_converters(arg) or (1,))
+            nargs[f"--{arg.name}"] = nargs[f"-{arg.short_name}"] = n
+    return nargs
+
+
+def option_tokens(
+    argv: list[str], nargs: Mapping[str, int]
+) -> Iterable[tuple[int, str]]:
+    """
+    Find the options of a command line as click reads them, skipping \
+    the values of the options, until ``--``.
+
+    :param argv: the arguments of the command line
+    :param nargs: (dictionary) the number of values of the options
+    :return: (iterator) the position of each option in argv and its \
+    name, without the value given after ``=``; the short options bundled \
+    in one argument (``-vx3``) are given one by one
+    """
+    i = 0
+    while i < len(argv):
+        token = argv[i]
+        if token == "--":
+            return
+        i += 1
+        if token[:1] != "-" or token == "-":
+            continue
+        if token[:2] == "--" or token in nargs:
+            option, eq, _ = token.partition("=")
+            yield i - 1, option
+            if not eq:
+                i += nargs.get(option, 0)
+            continue
+        for k, char in enumerate(token[1:], 2):
+            yield i - 1, f"-{char}"
+            n = nargs.get(f"-{char}")
+            if n is None:
+                break
+            if n:
+                # the value is the rest of the argument or the next ones
+                i += n - (k < len(token))
+                break
+
+
+def defaults_argv(lp: Lazyparser, argv: list[str]) -> list[str]:
+    """
+    Give the defaults of the ``pyproject.toml`` section and of the file \
+    of the config option of a parser to a command line. The values of \
+    the command line take precedence over those of the config option, \
+    which take precedence over those of ``pyproject.toml``.
+
+    :param lp: the parser
+    :param argv: the arguments of the command line
+    :return: (list of string) the command line with the defaults \
+    first and without the config option
+    """
+    config = lp.config
+    values = {}
+    if config.pyproject and os.path.isfile("pyproject.toml"):
+        section = ("tool", config.pyproject)
+        values |= load_defaults("pyproject.toml", config, section)
+    option = f"--{config.config_option}" if config.config_option else None
+    nargs = option_nargs(lp) | ({option: 1} if option else {})
+    options = {}
+    for name, arg in lp.args.items():
+        options[f"--{arg.name}"] = options[f"-{arg.short_name}"] = name
+    given, removed = set(), set()
+    for i, name in option_tokens(argv, nargs):
+        if name != option:
+            given.add(options.get(name))
+        elif argv[i] != option:
+            values |= load_defaults(argv[i][len(option) + 1 :], config)
+            removed.add(i)
+        elif i + 1 < len(argv):
+            values |= load_defaults(argv[i + 1], config)
+            removed |= {i, i + 1}
+    rest = [token for i, token in enumerate(argv) if i not in removed]
+    if not values:
+        return rest
+    return (
+        values_argv({k: v for k, v in values.items() if k not in given}, lp)
+        + rest
+    )
+
+
+def get_rich_usage(
+    formatter: Any,
+    prog: str,
+    args: str = "",
+    prefix: str | None = None,
+) -> None:
+    """Richly render usage text."""
+    from rich.columns import Columns
+    from rich.padding import Padding
+    from rich.text import Text
+    from rich_click.rich_help_rendering import _make_rich_rext
+
+    if prefix is None:
+        prefix = "Usage:"
+
+    config = formatter.config
+
+    # Header text if we have it
+    if config.header_text:
+        formatter.write(
+            Padding(
+                _make_rich_rext(
+                    config.header_text, config.style_header_text, formatter
+                ),
+                (1, 1, 0, 1),
+            ),
+        )
+
+    # Print usage
+    formatter.write(
+        Padding(
+            Columns(
+                (
+                    Text(prefix, style=config.style_usage),
+                    Text(prog, style=config.style_usage_command),
+                    args,
+                )
+            ),
+            1,
+        ),
+    )
+
+
+def load_click():
+    """
+    Import rich_click and create the click based classes of lazyparser \
+    (``MyRichHelpFormatter``, ``HelpfulContext`` and ``HelpfulCmd``). \
+    Click is only imported when a parser has to be built with it.
+
+    :return: the rich_click module and the ``HelpfulCmd`` class
+    """
+    import rich_click as click
+
+    if "HelpfulCmd" in CLICK_CLASSES:
+        return click, CLICK_CLASSES["HelpfulCmd"]
+    from rich_click.rich_help_configuration import RichHelpConfiguration
+    from rich_click.rich_help_formatter import RichHelpFormatter
+
+    class MyRichHelpFormatter(RichHelpFormatter):
+        def write_usage(
+            self, prog: str, args: str = "", prefix: str | None = None
+        ) -> None:
+            get_rich_usage(
+                formatter=self, prog=prog, args=args, prefix=prefix
+            )
+
+    class HelpfulContext(click.RichContext):
+        """
+        Rich context that only builds its help configuration when a help \
+        or an error message has to be rendered.
+        """
+
+        formatter_class = MyRichHelpFormatter
+
+        def __init__(
+            self,
+            *args: Any,
+            rich_console: Any = None,
+            rich_help_config: Any = None,
+            **kwargs: Any,
+        ) -> None:
+            click.Context.__init__(self, *args, **kwargs)
+            if rich_console is not None:
+                self.console = rich_console
+            self._help_config = rich_help_config
+
+        @property
+        def help_config(self) -> RichHelpConfiguration:
+            """
+            :return: the rich help configuration of the context
+            """
+            if not isinstance(self._help_config, RichHelpConfiguration):
+                self._help_config = RichHelpConfiguration.load_from_globals(
+                    **(self._help_config or {})
+                )
+            return self._help_config
+
+        @help_config.setter
+        def help_config(self, config: RichHelpConfiguration) -> None:
+            self._help_config = config
+
+    class HelpfulCmd(click.RichCommand):
+        context_class = HelpfulContext
+        forbidden = FORBIDDEN  # the options hidden from the usage
+
+        def collect_usage_pieces(self, ctx):
+            """Returns all the pieces that go into the usage line and returns
+            it as a list of strings.
+            """
+            rv = []
+            nt = ""
+            for p in self.params:
+                if p.required:
+                    rv.append(f"[bold cyan]--{p.name}[/bold cyan]")
+                    rv.append(
+                        f"[bold yellow]{p.make_metavar()}[/bold yellow]"
+                    )
+                elif p.name not in self.forbidden:
+                    if p.is_flag:  # type: ignore
+                        nt += f"[--[bold cyan]{p.name}[/bold cyan]] "
+                    else:
+                        nt += f"[--[bold cyan]{p.name}[/bold cyan] [bold yellow]{str(p.make_metavar())}[/bold yellow]] "
+            rv.append(nt.strip())
+            return rv
+
+        def format_options(
+            self, ctx: click.Context, formatter: click.HelpFormatter
+        ) -> None:
+            from rich_click.rich_help_rendering import get_rich_options
+
+            get_rich_options(self, ctx, formatter)  # type: ignore[arg-type]
+
+    # setdefault keeps the classes of the first thread loading click
+    for name, cls in [
+        ("MyRichHelpFormatter", MyRichHelpFormatter),
+        ("HelpfulContext", HelpfulContext),
+        ("HelpfulCmd", HelpfulCmd),
+    ]:
+        CLICK_CLASSES.setdefault(name, cls)
+    if TRACER is not None:
+        TRACER.install()
+    return click, CLICK_CLASSES["HelpfulCmd"]
+
+
+def renderer() -> str:
+    """
+    Choose the backend rendering the help and the messages.
+
+    :return: (string) the value of the environment variable \
+    LAZYPARSER_RENDERER if it is rich or plain, else rich if the \
+    standard output is a terminal and plain otherwise
+    """
+    name = os.environ.get("LAZYPARSER_RENDERER", "").lower()
+    if name in RENDERERS:
+        return name
+    isatty = getattr(sys.stdout, "isatty", None)
+    return "rich" if isatty is not None and isatty() else "plain"
+
+
+def load_plain_click():
+    """
+    Import click and create ``PlainCmd``, the click command rendering \
+    its help and its errors as plain text, without rich.
+
+    :return: the click module and the ``PlainCmd`` class
+    """
+    import click
+
+    if "PlainCmd" in CLICK_CLASSES:
+        return click, CLICK_CLASSES["PlainCmd"]
+
+    class PlainCmd(click.Command):
+        forbidden = FORBIDDEN  # the options hidden from the usage
+        option_groups = ()  # the option groups of create_click_group
+
+        def collect_usage_pieces(self, ctx):
+            """
+            :return: the pieces of the usage line
+            """
+            rv = []
+            nt = []
+            for p in self.params:
+                if p.required:
+                    rv.append(f"--{p.name} {p.make_metavar()}")
+                elif p.name not in self.forbidden:
+                    if p.is_flag:  # type: ignore
+                        nt.append(f"[--{p.name}]")
+                    else:
+                        nt.append(f"[--{p.name} {p.make_metavar()}]")
+            rv.append(" ".join(nt))
+            return rv
+
+        def format_options(
+            self, ctx: click.Context, formatter: click.HelpFormatter
+        ) -> None:
+            """
+            Write the options, group by group.
+            """
+            params = self.get_params(ctx)
+            by_opt = {opt: p for p in params for opt in p.opts}
+            sections = []
+            shown = set()
+            for group in self.option_groups:
+                found = [by_opt[o] for o in group["options"] if o in by_opt]
+                shown.update(map(id, found))
+                sections.append((group["name"], found))
+            rest = [p for p in params if id(p) not in shown]
+            sections.append(("Options", rest))
+            for name, found in sections:
+                rows = [p.get_help_record(ctx) for p in found]
+                rows = [r for r in rows if r is not None]
+                if rows:
+                    with formatter.section(name):
+                        formatter.write_dl(rows)
+
+    CLICK_CLASSES.setdefault("PlainCmd", PlainCmd)
+    if TRACER is not None:
+        TRACER.install()
+    return click, CLICK_CLASSES["PlainCmd"]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Give access to click and to the click based classes of lazyparser, \
+    which are only loaded on first use.
+
+    :param name: the name of the attribute
+    :return: the attribute
+    """
+    if name == "click":
+        return load_click()[0]
+    if name in ("MyRichHelpFormatter", "HelpfulContext", "HelpfulCmd"):
+        load_click()
+        return CLICK_CLASSES[name]
+    if name == "PlainCmd":
+        load_plain_click()
+        return CLICK_CLASSES[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def add_option(option: Argument, func: Callable) -> Callable:
+    """
+    Add an option to the function used to create the CLI.
+
+    :param option: a lazyparser argument
+    :param func: the function used to create a CLI
+    :return: The function func decorated with click.option()
+    """
+    args = (f"--{option.name}", f"-{option.short_name}")
+    kwargs = dict(
+        nargs=option.click_narg(),
+        type=option.click_type(),
+        is_flag=option.is_flag,
+        show_default=False,
+        required=True,
+        help=option.help,
+        multiple=option.multiple,
+    )
+    if option.default != inspect._empty:
+        kwargs["default"] = option.default
+        kwargs["required"] = False
+        kwargs["show_default"] = True
+    import click
+
+    func = click.option(
+        *args,
+        **kwargs,  # type: ignore
+    )(func)
+
+    return func
+
+
+def build_command(
+    lp: Lazyparser, func: Callable, backend: str = "rich"
+) -> Any:
+    """
+    Create the click command of the parser. The options are added to a \
+    wrapper of func so func itself is left untouched.
+
+    :param lp: the parsed arguments
+    :param func: the function used to create a CLI
+    :param backend: (string) rich or plain, the rendering of the help \
+    and of the errors of the command
+    :return: The click command calling func
+    """
+    load = load_click if backend == "rich" else load_plain_click
+    click, cls = load()
+
+    @functools.wraps(func, updated=())
+    def command(**kwargs):
+        return func(**kwargs)
+
+    command.__doc__ = lp.help
+    for arg in lp.args:
+        if arg not in lp.config.forbidden:
+            command = add_option(lp.args[arg], command)
+    if lp.config.version:
+        command = click.version_option(lp.config.version)(command)
+    if lp.config.config_option:
+        command = click.option(
+            f"--{lp.config.config_option}",
+            metavar="FILE",
+            expose_value=False,
+            help="TOML or JSON file giving default values to the options.",
+        )(command)
+    command = click.help_option("-h", "--help")(command)
+    if backend == "plain":
+        cmd = click.command(cls=cls, epilog=lp.config.epilog)(command)
+        cmd.option_groups = lp.create_click_group()["*"]
+        cmd.forbidden = lp.config.forbidden
+        return cmd
+    cmd = click.command(
+        cls=cls,
+        epilog=lp.config.epilog,
+        context_settings={
+            "rich_help_config": {"option_groups": lp.create_click_group()}
+        },
+    )(command)
+    cmd.forbidden = lp.config.forbidden
+    return cmd
 
 
 def init_parser(lp: Lazyparser, func: Callable):
     """
-    Create the parser using click.
+    Create the parser using click.
+
+    :param lp: the parsed arguments
+    :param func: the function used to create a CLI
+    :return: The click command, or its result if the standalone mode \
+    is disabled
+    """
+    cmd = build_command(lp, func)
+    if lp.config.standalone:
+        return cmd
+    return cmd.main(standalone_mode=False)
+
+
+def env_key() -> tuple:
+    """
+    Get a snapshot of the default settings of the parsers.
+
+    :return: (tuple) the fields of the default Config
+    """
+    return (
+        PD1,
+        PD2,
+        HEADER,
+        TAB,
+        EPI,
+        tuple((k, tuple(v)) for k, v in GROUPS.items()),
+        PROG_VERSION,
+        STD_MODE,
+        tuple(SHORT_NAMES.items()),
+        CACHE_DIR,
+        CACHE_SIZE,
+    )
+
+
+def current_config() -> Config:
+    """
+    :return: (Config) the default settings of the parsers
+    """
+    return Config(*env_key())
+
+
+class FastParser(object):
+    """
+    Pure python parser handling the ordinary invocations of a Lazyparser \
+    without click. It only understands ``--name value``, ``-n value``, \
+    ``--name=value`` and flags of arguments typed int, float, str, bool, \
+    fixed size tuples or tuples with an ellipsis. Anything else (help, \
+    version, unknown options, missing or invalid values...) is left to \
+    the click command, which gives the same results on valid command lines.
+    """
+
+    def __init__(self, lp: Lazyparser):
+        """
+        Precompute the lookup tables of the parser.
+
+        :param lp: a parser whose arguments are all supported \
+        (see ``FastParser.supports``)
+        """
+        self.options = {}  # option -> name of the argument
+        self.long_options = {}  # options accepting --name=value syntax
+        self.converters = {}  # name -> tuple of converters of the values
+        self.flags = set()
+        self.multiple = set()
+        self.required = []
+        self.defaults = {}
+        self.lazy = set()  # arguments typed with a LazyType
+        self.lazy_defaults = {}  # defaults converted on each call
+        for name, arg in lp.args.items():
+            if name in lp.config.forbidden:
+                continue
+            for opt in (f"--{arg.name}", f"-{arg.short_name}"):
+                self.options[opt] = name
+                if arg.is_flag or len(fast_converters(arg)) != 1:
+                    continue
+                if opt.startswith("--") or len(opt) > 2:
+                    self.long_options[opt] = name
+            self.converters[name] = fast_converters(arg)
+            if arg.is_flag:
+                self.flags.add(name)
+            elif is_multiple(arg.type):
+                self.multiple.add(name)
+            elif isinstance(arg.type, LazyType):
+                self.lazy.add(name)
+            if arg.default is inspect._empty:
+                self.required.append(name)
+            elif isinstance(arg.type, LazyType) and arg.default is not None:
+                self.lazy_defaults[name] = arg.default
+            else:
+                self.defaults[name] = fast_default(arg)
+
+    @staticmethod
+    def supports(lp: Lazyparser) -> bool:
+        """
+        Say if the arguments of a parser can be handled by a FastParser.
+
+        :param lp: a parser
+        :return: (bool) True if the fast path can be used
+        """
+        if os.name == "nt":
+            # click expands the wildcards of the command line on windows
+            return False
+        for name, arg in lp.args.items():
+            if name in lp.config.forbidden:
+                continue
+            if fast_converters(arg) is None:
+                return False
+            if arg.default is inspect._empty:
+                continue
+            if isinstance(arg.type, LazyType):
+                # converted on each call, see FastParser.parse
+                continue
+            try:
+                fast_default(arg)
+            except (TypeError, ValueError):
+                return False
+        return True
+
+    def parse(self, argv: list[str]) -> dict[str, Any] | None:
+        """
+        Parse a command line.
+
+        :param argv: the arguments of the command line
+        :return: the values of the arguments or None if the command line \
+        must be handled by click
+        """
+        values = {}
+        i, n = 0, len(argv)
+        while i < n:
+            token = argv[i]
+            i += 1
+            name = self.options.get(token)
+            if name is None:
+                opt, eq, raw = token.partition("=")
+                name = self.long_options.get(opt)
+                if name is None or not eq:
+                    return None
+                raws = (raw,)
+            elif name in self.flags:
+                values[name] = True
+                continue
+            else:
+                nargs = len(self.converters[name])
+                if i + nargs > n:
+                    return None
+                raws = argv[i : i + nargs]
+                i += nargs
+            if name in self.lazy:
+                # converted once the whole command line is accepted
+                values[name] = raws[0]
+                continue
+            try:
+                value = tuple(
+                    c(r) for c, r in zip(self.converters[name], raws)
+                )
+            except ValueError:
+                return None
+            if name in self.multiple:
+                values.setdefault(name, []).append(value[0])
+            elif len(value) == 1:
+                values[name] = value[0]
+            else:
+                values[name] = value
+        for name in self.required:
+            if name not in values:
+                return None
+        for name in self.multiple:
+            if name in values:
+                values[name] = tuple(values[name])
+        if self.lazy and not self.convert_lazy(values):
+            return None
+        return self.defaults | values
+
+    def convert_lazy(self, values: dict[str, Any]) -> bool:
+        """
+        Convert the values of the arguments typed with a LazyType. If a \
+        value is invalid, the converted values and the errors are given \
+        to click in LAZY_VALUES: a value read on the standard input \
+        cannot be read twice.
+
+        :param values: (dictionary) the values of the arguments, the \
+        strings of the command line for the LazyType arguments
+        :return: (bool) True if every value is valid
+        """
+        results = {}
+        for name in self.lazy:
+            raw = values.get(name, self.lazy_defaults.get(name))
+            if raw is None:
+                continue
+            try:
+                values[name] = self.converters[name][0](raw)
+                results[name, raw] = values[name]
+            except ValueError as e:
+                results[name, raw] = e
+        if any(isinstance(v, ValueError) for v in results.values()):
+            LAZY_VALUES.set(results)
+            return False
+        return True
+
+
+def is_multiple(atype) -> bool:
+    """
+    :param atype: (type) a type
+    :return: (bool) True if atype is a tuple with an ellipsis
+    """
+    return (
+        isinstance(atype, types.GenericAlias)
+        and len(atype.__args__) == 2
+        and atype.__args__[1] is Ellipsis
+    )
+
+
+def fast_converters(arg: Argument) -> tuple | None:
+    """
+    Get the functions converting the values of an argument in the fast \
+    path. They give the same results as the click types of the argument.
+
+    :param arg: an argument
+    :return: one converter by value or None if the fast path cannot \
+    handle the type of the argument
+    """
+    scalar = (int, float, str)
+    if arg.is_flag:
+        return ()
+    if arg.type in scalar:
+        return (arg.type,)
+    if isinstance(arg.type, LazyType):
+        return (arg.type.convert,)
+    if not isinstance(arg.type, types.GenericAlias):
+        return None
+    subtypes = arg.type.__args__
+    if is_multiple(arg.type) and subtypes[0] in scalar:
+        return (subtypes[0],)
+    # tuple[x] is converted by click from a single string
+    if len(subtypes) > 1 and all(t in scalar for t in subtypes):
+        return subtypes
+    return None
+
+
+def fast_default(arg: Argument) -> Any:
+    """
+    Convert the default value of an argument like click does.
+
+    :param arg: an argument handled by the fast path
+    :return: the converted default value
+    """
+    conv = fast_converters(arg)
+    if arg.is_flag:
+        if arg.default not in (True, False):
+            raise ValueError(f"flag default {arg.default!r}")
+        return bool(arg.default)
+    if arg.default is None:
+        return () if is_multiple(arg.type) else None
+    if is_multiple(arg.type):
+        return tuple(conv[0](v) for v in arg.default)
+    if len(conv) > 1:
+        if len(arg.default) != len(conv):
+            raise ValueError(f"{len(conv)} values are required")
+        return tuple(c(v) for c, v in zip(conv, arg.default))
+    return conv[0](arg.default)
+
+
+def run_coroutine(coro: Any, config: Config) -> Any:
+    """
+    Run a coroutine on a new event loop, closed afterwards. On Ctrl-C, \
+    the coroutine is cancelled, the pending tasks are cleaned up and \
+    KeyboardInterrupt is raised.
+
+    :param coro: the coroutine to run
+    :param config: the settings choosing the event loop: the loops of \
+    ``config.loop_policy`` if given, else uvloop if ``config.uvloop`` is \
+    True and uvloop is installed, else the loops of asyncio
+    :return: the result of the coroutine
+    """
+    import asyncio
+
+    loop_factory = None
+    if config.loop_policy is not None:
+        loop_factory = config.loop_policy.new_event_loop
+    elif config.uvloop:
+        try:
+            import uvloop
+
+            loop_factory = uvloop.new_event_loop
+        except ImportError:
+            pass
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(coro)
+
+
+def sync_entry(function: Callable, config: Config) -> Callable:
+    """
+    :param function: (function) a coroutine function
+    :param config: the settings choosing the event loop
+    :return: (function) a function running function on its own event loop
+    """
+
+    @functools.wraps(function)
+    def call_func(*args, **kw):
+        return run_coroutine(function(*args, **kw), config)
+
+    return call_func
+
+
+class Stream(object):
+    """
+    Iterator over the values of a streamed parameter. The values given \
+    as ``@path`` (a file, gzip compressed or not) or ``-`` (the standard \
+    input) are read one value per line, by chunks, and converted when \
+    they are needed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tokens: Iterable[str],
+        convert: Callable,
+        lenient: bool = False,
+    ):
+        """
+        :param name: (string) the name of the parameter
+        :param tokens: (iterable of string) the values given on the \
+        command line
+        :param convert: (function) the function converting a value
+        :param lenient: (bool) True to skip the values that cannot be \
+        converted, False to raise a ValueError
+        """
+        self.name = name
+        self.skipped = 0  # number of values skipped in lenient mode
+        self._values = self.read(tokens, convert, lenient)
+
+    def __iter__(self) -> "Stream":
+        return self
+
+    def __next__(self) -> Any:
+        return next(self._values)
+
+    def read(
+        self, tokens: Iterable[str], convert: Callable, lenient: bool
+    ) -> Iterable[Any]:
+        """
+        :param tokens: (iterable of string) the values given on the \
+        command line
+        :param convert: (function) the function converting a value
+        :param lenient: (bool) True to skip the invalid values
+        :return: (iterator) the converted values
+        """
+        for token in tokens:
+            if token != "-" and not token.startswith("@"):
+                yield from self.convert([token], convert, lenient, "argv")
+                continue
+            with open_stream(token) as f:
+                while True:
+                    chunk = f.readlines(STREAM_CHUNK)
+                    if not chunk:
+                        break
+                    lines = [v.strip() for v in chunk]
+                    lines = [v for v in lines if v]
+                    yield from self.convert(lines, convert, lenient, token)
+
+    def close(self) -> None:
+        """
+        Stop the stream and close the file being read, if any.
+        """
+        self._values.close()
+
+    def convert(
+        self, values: list[str], convert: Callable, lenient: bool, src: str
+    ) -> list[Any]:
+        """
+        :param values: (list of string) a chunk of values
+        :param convert: (function) the function converting a value
+        :param lenient: (bool) True to skip the invalid values
+        :param src: (string) where the values come from
+        :return: (list) the converted values
+        """
+        try:
+            return list(map(convert, values))
+        except ValueError:
+            pass
+        res = []
+        for value in values:
+            try:
+                res.append(convert(value))
+            except ValueError:
+                if not lenient:
+                    raise ValueError(
+                        f"{self.name}: invalid value {value!r} in {src}"
+                    ) from None
+                self.skipped += 1
+        return res
+
+
+@contextlib.contextmanager
+def open_stream(token: str) -> Iterable[Any]:
+    """
+    :param token: (string) ``-`` for the standard input or ``@path``
+    :return: a context manager giving the text file of the values, \
+    decompressed if it is gzip compressed, and closing every layer of \
+    the file but the standard input
+    """
+    files = []  # the layers of the file, closed in reverse order
+    try:
+        if token == "-":
+            raw = getattr(sys.stdin, "buffer", None)
+        else:
+            raw = open(token[1:], "rb")
+            files.append(raw)
+        if hasattr(raw, "peek") and raw.peek(2)[:2] == b"\x1f\x8b":
+            import gzip
+
+            files.append(gzip.open(raw, "rt", encoding="utf-8"))
+        elif token != "-":
+            import io
+
+            files.append(io.TextIOWrapper(raw, encoding="utf-8"))
+        yield files[-1] if files else sys.stdin
+    finally:
+        for f in reversed(files):
+            f.close()
+
+
+def stream_entry(
+    function: Callable, lp: Lazyparser, config: Config
+) -> Callable:
+    """
+    :param function: (function) a function
+    :param lp: the parser of function
+    :param config: the settings giving the streamed parameters
+    :return: (function) a function calling function with a Stream for \
+    each streamed parameter
+    """
+    converters = {}
+    for name in config.streams:
+        atype = get_signature(lp.func)[name].annotation
+        converters[name] = atype.__args__[0]
+
+    @functools.wraps(function)
+    def call_func(*args, **values):
+        for name, convert in converters.items():
+            for token in values[name]:
+                if token.startswith("@") and not os.path.isfile(token[1:]):
+                    message(f"cannot read {token[1:]}", lp.args[name], "e")
+            values[name] = Stream(
+                name, values[name], convert, config.stream_errors == "lenient"
+            )
+        return function(*args, **values)
+
+    return call_func
+
+
+class LazyType(object):
+    """
+    Base of the parameter types of lazyparser. They are given to \
+    ``parse`` like click types, to parameters annotated str, and are \
+    handled by the fast path: ``convert`` turns a string of the command \
+    line into the value given to the function and ``close`` releases \
+    this value once the function has returned.
+    """
+
+    name = "text"  # the metavar of the type
+    path = None  # file or dir if the values are paths, for the completion
+
+    def convert(self, value: str) -> Any:
+        """
+        :param value: (string) a value given on the command line
+        :return: the value given to the function, a ValueError is \
+        raised if value is invalid
+        """
+        return value
+
+    def close(self, value: Any) -> None:
+        """
+        Release a value given to the function, once it has returned.
+
+        :param value: a value returned by convert
+        """
+        return None
+
+    def click_type(self) -> Any:
+        """
+        :return: the click type converting the values with self
+        """
+        return lazy_param_class()(self)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __hash__(self) -> int:
+        return hash(repr(self))
+
+
+@functools.lru_cache(maxsize=1)
+def lazy_param_class() -> type:
+    """
+    :return: (type) the click type adapting a LazyType
+    """
+    import click
+
+    class LazyParam(click.ParamType):
+        def __init__(self, ltype: LazyType):
+            self.ltype = ltype
+            self.name = ltype.name
+
+        def convert(self, value, param, ctx):
+            if not isinstance(value, str):
+                return value
+            done = LAZY_VALUES.get()
+            key = (getattr(param, "name", None), value)
+            try:
+                if done is not None and key in done:
+                    value = done.pop(key)
+                    if isinstance(value, ValueError):
+                        raise value
+                    return value
+                return self.ltype.convert(value)
+            except ValueError as e:
+                self.fail(str(e), param, ctx)
+
+    return LazyParam
+
+
+class Array(LazyType):
+    """
+    Numbers stored in an ``array.array``, or a NumPy array. They are \
+    given as one string separated by commas or whitespace, as ``@path`` \
+    (a file, gzip compressed or not) or as ``-`` (the standard input), \
+    read by chunks and converted in bulk.
+    """
+
+    name = "numbers"
+
+    def __init__(
+        self,
+        typecode: str = "d",
+        low: float | None = None,
+        high: float | None = None,
+        numpy: bool = False,
+    ):
+        """
+        :param typecode: (string) the type code of the array, d for \
+        double by default
+        :param low: (number) the smallest value allowed, if any
+        :param high: (number) the greatest value allowed, if any
+        :param numpy: (bool) True to give a NumPy array sharing the \
+        memory of the array.array
+        """
+        import array
+
+        if typecode not in array.typecodes or typecode in "uw":
+            message(f"Unknown array type code {typecode!r}", None, "e")
+        import importlib.util
+
+        if numpy and importlib.util.find_spec("numpy") is None:
+            message("numpy is required by Array(numpy=True)", None, "e")
+        self.typecode = typecode
+        self.low = low
+        self.high = high
+        self.numpy = numpy
+
+    def convert(self, value: str) -> Any:
+        """
+        :param value: (string) the numbers, ``@path`` or ``-``
+        :return: the array of the numbers
+        """
+        import array
+
+        values = array.array(self.typecode)
+        number = float if self.typecode in "fd" else int
+        chunks = number_chunks(value)
+        try:
+            for chunk in chunks:
+                values.extend(map(number, chunk.replace(",", " ").split()))
+        except OSError as e:
+            msg = f"cannot read {value[1:]}: {e.strerror}"
+            raise ValueError(msg) from None
+        except OverflowError as e:
+            msg = f"{e} for type code {self.typecode!r}"
+            raise ValueError(msg) from None
+        except ValueError as e:
+            raise ValueError(f"invalid number: {e}") from None
+        finally:
+            chunks.close()
+        if self.low is not None and values and min(values) < self.low:
+            count = sum(1 for v in values if v < self.low)
+            raise ValueError(f"{count} values are lower than {self.low}")
+        if self.high is not None and values and max(values) > self.high:
+            count = sum(1 for v in values if v > self.high)
+            raise ValueError(f"{count} values are greater than {self.high}")
+        if self.numpy:
+            import numpy
+
+            return numpy.frombuffer(values, dtype=self.typecode)
+        return values
+
+
+def number_chunks(value: str) -> Iterable[str]:
+    """
+    :param value: (string) numbers separated by commas or whitespace, \
+    ``@path`` or ``-``
+    :return: (iterator of string) pieces of value or of the file, never \
+    cutting a number
+    """
+    if value != "-" and not value.startswith("@"):
+        yield value
+        return
+    with open_stream(value) as f:
+        rest = ""
+        while True:
+            chunk = f.read(STREAM_CHUNK)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            cut = max(chunk.rfind(c) for c in " \t\r\n,") + 1
+            rest = chunk[cut:]
+            yield chunk[:cut]
+        yield rest
+
+
+class MappedFile(LazyType):
+    """
+    Binary file mapped in memory, read only. The function receives a \
+    ``memoryview`` of the mapping, or a ``numpy.memmap``: nothing is \
+    read before the function accesses the values and the mapping is \
+    closed when the function returns.
+    """
+
+    name = "file"
+    path = "file"
+
+    def __init__(
+        self,
+        dtype: str = "B",
+        shape: tuple[int, ...] | None = None,
+        offset: int = 0,
+        numpy: bool = False,
+    ):
+        """
+        :param dtype: (string) the type of the values, a format of the \
+        struct module (B for bytes by default) or any NumPy dtype with \
+        numpy=True
+        :param shape: (tuple of int) the dimensions of the values, one \
+        dimension covering the whole file if None
+        :param offset: (int) the number of bytes skipped at the start of \
+        the file
+        :param numpy: (bool) True to give a ``numpy.memmap``
+        """
+        import importlib.util
+
+        if numpy and importlib.util.find_spec("numpy") is None:
+            message("numpy is required by MappedFile(numpy=True)", None, "e")
+        if not numpy and dtype not in tuple("bBhHiIlLqQnNfdec?"):
+            message(f"Unknown memoryview format {dtype!r}", None, "e")
+        self.dtype = dtype
+        self.shape = None if shape is None else tuple(shape)
+        self.offset = offset
+        self.numpy = numpy
+
+    def convert(self, value: str) -> Any:
+        """
+        :param value: (string) the path of the file
+        :return: the read-only view of the file
+        """
+        if not os.path.isfile(value):
+            raise ValueError(f"{value} is not a file")
+        if self.numpy:
+            import numpy
+
+            try:
+                return numpy.memmap(
+                    value,
+                    dtype=self.dtype,
+                    mode="r",
+                    offset=self.offset,
+                    shape=self.shape,
+                )
+            except OSError as e:
+                raise ValueError(f"cannot map {value}: {e}") from None
+        import mmap
+
+        try:
+            with open(value, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    mapped = b""
+                else:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as e:
+            raise ValueError(f"cannot map {value}: {e.strerror}") from None
+        shape = () if self.shape is None else (self.shape,)
+        with memoryview(mapped) as view, view[self.offset :] as data:
+            size = len(data)
+            try:
+                return data.cast(self.dtype, *shape)
+            except TypeError:
+                pass
+        if isinstance(mapped, mmap.mmap):
+            mapped.close()
+        raise ValueError(
+            f"{size} bytes of {value} do not fit format {self.dtype!r}"
+            + ("" if self.shape is None else f" and shape {self.shape}")
+        )
+
+    def close(self, value: Any) -> None:
+        """
+        Close the mapping of a file, unless the function kept a view of it.
+
+        :param value: a view returned by convert
+        """
+        mapped = getattr(value, "_mmap", None)  # numpy.memmap
+        if isinstance(value, memoryview):
+            mapped = value.obj
+            value.release()
+        try:
+            if hasattr(mapped, "close"):
+                mapped.close()
+        except BufferError:
+            # the views still in use keep the mapping open
+            pass
+
+
+class File(LazyType):
+    """
+    File given to the function as a LazyFile, opened on first access \
+    with a large buffer. The files read are decompressed when they are \
+    gzip, bz2 or xz compressed, the files written when their name ends \
+    with .gz, .bz2 or .xz. ``-`` is the standard input or output.
+    """
+
+    name = "file"
+    path = "file"
+
+    def __init__(
+        self,
+        mode: str = "r",
+        buffer_size: int = 1 << 20,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+    ):
+        """
+        :param mode: (string) r, w or a, followed by b for binary files
+        :param buffer_size: (int) the size of the buffer of the file in \
+        bytes
+        :param encoding: (string) the encoding of the text files
+        :param errors: (string) the handling of the encoding errors of \
+        the text files, as in ``open``
+        """
+        if mode not in ("r", "rb", "w", "wb", "a", "ab"):
+            message(f"Unknown file mode {mode!r}", None, "e")
+        if buffer_size < 1:
+            message("buffer_size must be positive", None, "e")
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.errors = errors
+
+    def convert(self, value: str) -> "LazyFile":
+        """
+        Check the path without opening the file.
+
+        :param value: (string) the path of the file or ``-``
+        :return: the file, not opened yet
+        """
+        if value != "-" and self.mode.startswith("r"):
+            if not os.path.isfile(value):
+                raise ValueError(f"{value} is not a file")
+        elif value != "-":
+            directory = os.path.dirname(os.path.abspath(value))
+            if not os.path.isdir(directory):
+                raise ValueError(f"directory {directory} does not exist")
+        return LazyFile(
+            value, self.mode, self.buffer_size, self.encoding, self.errors
+        )
+
+    def close(self, value: "LazyFile") -> None:
+        """
+        :param value: a file returned by convert
+        """
+        value.close()
+
+
+class LazyFile(object):
+    """
+    File opened on first access: the attributes and the methods of the \
+    opened file are available on the LazyFile. ``close`` closes every \
+    layer of the file (the standard streams are only flushed).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        mode: str = "r",
+        buffer_size: int = 1 << 20,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+    ):
+        """
+        :param name: (string) the path of the file or ``-``
+        :param mode: (string) r, w or a, followed by b for binary files
+        :param buffer_size: (int) the size of the buffer in bytes
+        :param encoding: (string) the encoding of the text files
+        :param errors: (string) the handling of the encoding errors
+        """
+        self.name = name
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.errors = errors
+        self.compression = None  # gzip, bz2 or lzma once opened
+        self._file = None
+        self._closers = []  # the functions closing the layers of the file
+
+    @property
+    def opened(self) -> bool:
+        """
+        :return: (bool) True if the file has been opened
+        """
+        return self._file is not None
+
+    def open(self) -> Any:
+        """
+        :return: the opened file
+        """
+        if self._file is None:
+            self._file = self.open_layers()
+        return self._file
+
+    def open_layers(self) -> Any:
+        """
+        Open the file, its decompression and its decoding.
+
+        :return: the opened file
+        """
+        reading = self.mode.startswith("r")
+        std = None
+        if self.name == "-":
+            std = sys.stdin if reading else sys.stdout
+            raw = getattr(std, "buffer", std)
+            if not reading:
+                self._closers.append(std.flush)
+        else:
+            raw = open(self.name, self.mode[0] + "b", self.buffer_size)
+            self._closers.append(raw.close)
+        if reading and hasattr(raw, "peek"):
+            magic = raw.peek(6)
+            for start, _, module in COMPRESSIONS:
+                if magic.startswith(start):
+                    self.compression = module
+        elif std is None:
+            for _, ext, module in COMPRESSIONS:
+                if self.name.endswith(ext):
+                    self.compression = module
+        stream = raw
+        if self.compression is not None:
+            module = importlib.import_module(self.compression)
+            stream = module.open(raw, self.mode[0] + "b")
+            self._closers.insert(0, stream.close)
+        if "b" in self.mode:
+            return stream
+        if std is not None and self.compression is None:
+            return std
+        import io
+
+        text = io.TextIOWrapper(
+            stream, encoding=self.encoding, errors=self.errors
+        )
+        self._closers.insert(0, text.close)
+        return text
+
+    def close(self) -> None:
+        """
+        Close the file if it has been opened.
+        """
+        closers, self._closers = self._closers, []
+        for close in closers:
+            close()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.open(), name)
+
+    def __iter__(self) -> Iterable[Any]:
+        return iter(self.open())
+
+    def __enter__(self) -> "LazyFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"LazyFile({self.name!r}, {self.mode!r})"
+
+
+class Glob(LazyType):
+    """
+    Files matching glob patterns (``**`` matching any number of \
+    directories) or found in directories, given as one string separated \
+    by commas. The function receives a Walk, whose iterators list the \
+    directories with ``os.scandir`` as the files are asked for.
+    """
+
+    name = "patterns"
+    path = "file"
+
+    def __init__(
+        self,
+        include: tuple[str, ...] = (),
+        exclude: tuple[str, ...] = (),
+        sort: bool = False,
+        workers: int = 1,
+        hidden: bool = False,
+    ):
+        """
+        :param include: (tuple of string) the patterns of the names of \
+        the files kept, all the files if empty
+        :param exclude: (tuple of string) the patterns of the names of \
+        the files and of the directories skipped
+        :param sort: (bool) True to list the entries of each directory \
+        by name, the files before the subdirectories
+        :param workers: (int) the number of threads listing the \
+        directories ahead of the iteration
+        :param hidden: (bool) True to let ``*`` and ``**`` match the \
+        names starting with a dot
+        """
+        if workers < 1:
+            message("workers must be a positive integer", None, "e")
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.sort = sort
+        self.workers = workers
+        self.hidden = hidden
+
+    def convert(self, value: str) -> "Walk":
+        """
+        Check the roots of the patterns without listing them.
+
+        :param value: (string) patterns and paths separated by commas
+        :return: the files matching the patterns, found lazily
+        """
+        patterns = [v.strip() for v in value.split(",") if v.strip()]
+        if not patterns:
+            raise ValueError("no pattern given")
+        for pattern in patterns:
+            root, parts = glob_root(pattern)
+            if not parts and not os.path.exists(root):
+                raise ValueError(f"{root} does not exist")
+            if parts and not os.path.isdir(root or "."):
+                raise ValueError(f"{root} is not a directory")
+        return Walk(patterns, self)
+
+    def close(self, value: "Walk") -> None:
+        """
+        :param value: a Walk returned by convert
+        """
+        value.close()
+
+    def walk(self, patterns: list[str]) -> Iterable[str]:
+        """
+        :param patterns: (list of string) glob patterns and paths
+        :return: (iterator of string) the paths of the matching files
+        """
+        pool = None
+        if self.workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            pool = ThreadPoolExecutor(self.workers)
+        try:
+            for pattern in patterns:
+                root, parts = glob_root(pattern)
+                if not parts and not os.path.isdir(root):
+                    if self.selected(os.path.basename(root)):
+                        yield root
+                    continue
+                parts = parts or ("**",)
+                states = glob_states(parts, [0])
+                yield from self.tree(root, parts, states, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def tree(
+        self,
+        root: str,
+        parts: tuple[str, ...],
+        states: frozenset[int],
+        pool: Any,
+    ) -> Iterable[str]:
+        """
+        Walk a directory depth first. Without a pool, the files are given \
+        as os.scandir finds them. With a pool, the threads list the next \
+        subdirectories of the walk ahead of the iteration, at most two \
+        per thread at a time.
+
+        :param root: (string) the directory, the current one if empty
+        :param parts: (tuple of string) the components of the pattern
+        :param states: (set of int) the components matched in root
+        :param pool: the pool of threads, None to list in this thread
+        :return: (iterator of string) the paths of the matching files
+        """
+        if pool is None:
+            stack = [(root, states)]
+            while stack:
+                children = []
+                for path, sub in self.entries(*stack.pop(), parts):
+                    if sub is None:
+                        yield path
+                    else:
+                        children.append((path, sub))
+                stack.extend(reversed(children))
+            return
+        limit = 2 * self.workers
+        stack = [[(root, states), None]]  # the directories and their scan
+        pending = 0  # the number of scans submitted and not yet used
+        while stack:
+            for item in reversed(stack):
+                if pending == limit:
+                    break
+                if item[1] is None:
+                    item[1] = pool.submit(self.scan, *item[0], parts)
+                    pending += 1
+            pending -= 1
+            files, children = stack.pop()[1].result()
+            stack.extend([child, None] for child in reversed(children))
+            yield from files
+
+    def scan(
+        self, directory: str, states: frozenset[int], parts: tuple[str, ...]
+    ) -> tuple[list[str], list[tuple[str, frozenset[int]]]]:
+        """
+        List a directory.
+
+        :param directory: (string) the directory, the current one if empty
+        :param states: (set of int) the components matched in directory
+        :param parts: (tuple of string) the components of the pattern
+        :return: the matching files of the directory and the \
+        subdirectories to walk, with their states
+        """
+        files, children = [], []
+        for path, sub in self.entries(directory, states, parts):
+            if sub is None:
+                files.append(path)
+            else:
+                children.append((path, sub))
+        return files, children
+
+    def entries(
+        self, directory: str, states: frozenset[int], parts: tuple[str, ...]
+    ) -> Iterable[tuple[str, frozenset[int] | None]]:
+        """
+        Read a directory with os.scandir, entry by entry unless the \
+        entries are sorted.
+
+        :param directory: (string) the directory, the current one if empty
+        :param states: (set of int) the components matched in directory
+        :param parts: (tuple of string) the components of the pattern
+        :return: (iterator) the matching files of the directory, with \
+        None, and the subdirectories to walk, with their states
+        """
+        try:
+            it = os.scandir(directory or ".")
+        except OSError:
+            return
+        with it:
+            try:
+                entries = sorted(it, key=lambda e: e.name) if self.sort else it
+                for entry in entries:
+                    matched, sub = self.match(entry, states, parts)
+                    if not matched and not sub:
+                        continue
+                    name = entry.name
+                    path = os.path.join(directory, name) if directory else name
+                    if matched and self.selected(name):
+                        yield path, None
+                    if sub:
+                        yield path, glob_states(parts, sub)
+            except OSError:
+                return
+
+    def match(
+        self, entry: Any, states: frozenset[int], parts: tuple[str, ...]
+    ) -> tuple[bool, set[int]]:
+        """
+        :param entry: (os.DirEntry) an entry of a directory
+        :param states: (set of int) the components matched in the directory
+        :param parts: (tuple of string) the components of the pattern
+        :return: True if the entry is a matching file, and the components \
+        matched in the entry if it is a directory to walk
+        """
+        from fnmatch import fnmatch
+
+        name = entry.name
+        if any(fnmatch(name, p) for p in self.exclude):
+            return False, set()
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            return False, set()
+        hidden = name.startswith(".") and not self.hidden
+        matched, sub = False, set()
+        for i in states:
+            if parts[i] == "**":
+                if hidden:
+                    continue
+                if is_dir:
+                    sub.add(i)
+                else:
+                    matched |= i + 1 == len(parts)
+            elif fnmatch(name, parts[i]) and not (
+                hidden and not parts[i].startswith(".")
+            ):
+                if i + 1 == len(parts):
+                    matched |= not is_dir
+                elif is_dir:
+                    sub.add(i + 1)
+        return matched, sub
+
+    def selected(self, name: str) -> bool:
+        """
+        :param name: (string) the name of a file
+        :return: (bool) True if the file passes the include filters
+        """
+        from fnmatch import fnmatch
+
+        return not self.include or any(fnmatch(name, p) for p in self.include)
+
+
+class Walk(object):
+    """
+    The files matching some patterns. Each iteration walks the \
+    directories again, lazily: the first files are given before the \
+    whole tree is listed and the memory used does not grow with the \
+    number of files.
+    """
+
+    def __init__(self, patterns: list[str], glob: Glob):
+        """
+        :param patterns: (list of string) glob patterns and paths
+        :param glob: the type giving the filters and the traversal
+        """
+        self.patterns = patterns
+        self.glob = glob
+        self._iterators = []
+
+    def __iter__(self) -> Iterable[str]:
+        iterator = self.glob.walk(self.patterns)
+        self._iterators.append(iterator)
+        return iterator
+
+    def close(self) -> None:
+        """
+        Stop the iterations in progress and their threads.
+        """
+        iterators, self._iterators = self._iterators, []
+        for iterator in iterators:
+            iterator.close()
+
+    def __repr__(self) -> str:
+        return f"Walk({self.patterns!r})"
+
+
+def glob_root(pattern: str) -> tuple[str, tuple[str, ...]]:
+    """
+    :param pattern: (string) a glob pattern or a path
+    :return: the directory where the pattern starts, the longest \
+    path without wildcards, and the components of the pattern after it
+    """
+    comps = pattern.replace(os.sep, "/").split("/")
+    k = next(
+        (i for i, c in enumerate(comps) if re.search(r"[*?[]", c)),
+        len(comps),
+    )
+    root = "/".join(comps[:k])
+    if not root and k and pattern.startswith("/"):
+        root = "/"
+    return root, tuple(c for c in comps[k:] if c)
+
+
+def glob_states(parts: tuple[str, ...], states: Iterable[int]) -> frozenset:
+    """
+    :param parts: (tuple of string) the components of a pattern
+    :param states: (iterable of int) the components to match next
+    :return: (set of int) states and the components after the ``**`` \
+    in states, which can match no directory
+    """
+    res = set()
+    for i in states:
+        while i < len(parts):
+            res.add(i)
+            if parts[i] != "**":
+                break
+            i += 1
+    return frozenset(res)
+
+
+def lazy_entry(function: Callable, lp: Lazyparser) -> Callable:
+    """
+    :param function: (function) a function
+    :param lp: the parser of function
+    :return: (function) a function calling function and closing the \
+    values of its parameters typed with a LazyType afterwards
+    """
+    ltypes = {
+        name: arg.type
+        for name, arg in lp.args.items()
+        if isinstance(arg.type, LazyType)
+    }
+
+    @functools.wraps(function)
+    def call_func(*args, **values):
+        try:
+            return function(*args, **values)
+        finally:
+            for name, ltype in ltypes.items():
+                if values.get(name) is not None:
+                    ltype.close(values[name])
+
+    return call_func
+
+
+def path_error(path: str, ptype: Any) -> str | None:
+    """
+    Check a path like a click.Path does.
+
+    :param path: (string) a path
+    :param ptype: (click.Path) the constraints of the path
+    :return: (string) the reason why the path is invalid, None if it is \
+    valid
+    """
+    import stat
+
+    if path == "-" and ptype.allow_dash:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return f"{path!r} does not exist" if ptype.exists else None
+    if not ptype.file_okay and stat.S_ISREG(st.st_mode):
+        return f"{path!r} is a file"
+    if not ptype.dir_okay and stat.S_ISDIR(st.st_mode):
+        return f"{path!r} is a directory"
+    for flag, mode in [("readable", os.R_OK), ("writable", os.W_OK)]:
+        if getattr(ptype, flag) and not os.access(path, mode):
+            return f"{path!r} is not {flag}"
+    if getattr(ptype, "executable", False) and not os.access(path, os.X_OK):
+        return f"{path!r} is not executable"
+    return None
+
+
+def stat_paths(paths: Iterable[str], ptype: Any, workers: int) -> list[str]:
+    """
+    Check many paths at once, on a pool of threads.
+
+    :param paths: (list of string) the paths
+    :param ptype: (click.Path) the constraints of the paths
+    :param workers: (int) the maximal number of threads
+    :return: (list of string) the errors of the invalid paths
+    """
+    check = functools.partial(path_error, ptype=ptype)
+    if workers == 1 or len(paths) < 2:
+        errors = list(map(check, paths))
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(min(workers, len(paths))) as pool:
+            errors = list(pool.map(check, paths))
+    return [e for e in errors if e is not None]
+
+
+def path_values(paths: Iterable[str], ptype: Any) -> tuple[Any, ...]:
+    """
+    :param paths: (list of string) valid paths
+    :param ptype: (click.Path) the constraints of the paths
+    :return: (tuple) the paths resolved and converted like click.Path does
+    """
+    if ptype.resolve_path:
+        paths = [p if p == "-" else os.path.realpath(p) for p in paths]
+    if ptype.type not in (None, str, bytes):
+        return tuple(map(ptype.type, paths))
+    return tuple(paths)
+
+
+class CheckedPaths(object):
+    """
+    Sequence of paths checked when they are accessed, given to the \
+    function when the validation of the paths is deferred.
+    """
+
+    def __init__(self, name: str, paths: tuple[str, ...], ptype: Any):
+        """
+        :param name: (string) the name of the parameter
+        :param paths: (tuple of string) the paths given on the command line
+        :param ptype: (click.Path) the constraints of the paths
+        """
+        self.name = name
+        self.paths = paths
+        self.ptype = ptype
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, index: int) -> Any:
+        path = self.paths[index]
+        error = path_error(path, self.ptype)
+        if error is not None:
+            raise ValueError(f"{self.name}: {error}")
+        return path_values([path], self.ptype)[0]
+
+    def __iter__(self) -> Iterable[Any]:
+        return (self[i] for i in range(len(self.paths)))
+
+
+def bulk_paths(
+    lp: Lazyparser, values: dict[str, Any]
+) -> tuple[str, str] | None:
+    """
+    Check the paths of the parameters constrained by a click.Path and \
+    replace them by their final values.
+
+    :param lp: a parser
+    :param values: (dictionary) the values of the parameters
+    :return: the name of the first parameter with invalid paths and an \
+    error listing all of them, None if every path is valid
+    """
+    config = lp.config
+    for name, ptype in lp.paths.items():
+        if values.get(name) is None:
+            continue
+        if config.defer_paths:
+            values[name] = CheckedPaths(name, values[name], ptype)
+            continue
+        errors = stat_paths(values[name], ptype, config.path_workers)
+        if errors:
+            count = f"{len(errors)} invalid path" + "s" * (len(errors) > 1)
+            return name, "\n".join([f"{count}:"] + errors)
+        values[name] = path_values(values[name], ptype)
+    return None
+
+
+def paths_entry(function: Callable, lp: Lazyparser) -> Callable:
+    """
+    :param function: (function) a function
+    :param lp: the parser of function
+    :return: (function) a function checking the paths of its parameters \
+    constrained by a click.Path before calling function
+    """
+
+    @functools.wraps(function)
+    def call_func(*args, **values):
+        error = bulk_paths(lp, values)
+        if error is not None:
+            message(error[1], lp.args[error[0]], "e")
+        return function(*args, **values)
+
+    return call_func
+
+
+def sweep_entry(function: Callable, config: Config) -> Callable:
+    """
+    :param function: (function) a function
+    :param config: the settings of the sweep
+    :return: (function) a function running function on every \
+    combination of the values of the sweep dimensions
+    """
+
+    @functools.wraps(function)
+    def call_func(**values):
+        return run_sweep(function, values, config)
+
+    return call_func
+
+
+def sweep_call(
+    function: Callable, combination: dict[str, Any], fixed: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Run a combination of a sweep.
+
+    :param function: (function) the function of the sweep
+    :param combination: the values of the sweep dimensions
+    :param fixed: the values of the other parameters
+    :return: (dictionary) the row of the combination in the table of the \
+    sweep, with the fixed values, the wall time of the run and its \
+    result or its error
+    """
+    row = combination | fixed
+    row |= {"wall_time": None, "result": None, "error": None}
+    start = time.perf_counter()
+    try:
+        row["result"] = function(**combination, **fixed)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["wall_time"] = time.perf_counter() - start
+    return row
+
+
+def sweep_init(module: str, qualname: str, config: Config, fixed: dict):
+    """
+    Prepare a process running a sweep: the function is imported by its \
+    name and kept with the fixed values for all the runs of the process.
+
+    :param module: (string) the module of the function of the sweep
+    :param qualname: (string) the qualified name of the function
+    :param config: the settings of the sweep
+    :param fixed: the values of the parameters that are not swept
+    """
+    global SWEEP
+    function = importlib.import_module(module)
+    for name in qualname.split("."):
+        function = getattr(function, name)
+    function = getattr(function, "lp_parsed", (function,))[0]
+    function = getattr(function, "lp_function", function)
+    if inspect.iscoroutinefunction(function):
+        function = sync_entry(function, config)
+    SWEEP = (function, fixed)
+
+
+def sweep_task(combination: dict[str, Any]) -> dict[str, Any]:
+    """
+    :param combination: the values of the sweep dimensions
+    :return: (dictionary) the row of the combination
+    """
+    function, fixed = SWEEP
+    return sweep_call(function, combination, fixed)
+
+
+def sweep_cell(value: Any, path: str | None) -> str:
+    """
+    :param value: a value of a row of the table of a sweep
+    :param path: (string) the table of the sweep, None for the standard \
+    output
+    :return: (string) the value as it is written in the table
+    """
+    if path is not None and path.endswith((".jsonl", ".json")):
+        return json.dumps(value, default=repr)
+    return "" if value is None else str(value)
+
+
+def sweep_done(path: str | None, columns: list[str]) -> set[tuple]:
+    """
+    :param path: (string) the table of a sweep, None for the standard \
+    output
+    :param columns: (list of string) the columns of the table
+    :return: (set) the values of the sweep dimensions and of the fixed \
+    parameters of the runs of the table that did not fail, as they are \
+    written in the table
+    """
+    if path is None or not os.path.isfile(path):
+        return set()
+    keys = columns[:-3]
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+            return {
+                tuple(sweep_cell(row.get(k), path) for k in keys)
+                for row in rows
+                if row.get("error") is None
+            }
+        import csv
+
+        reader = csv.DictReader(f)
+        if reader.fieldnames not in (None, columns):
+            message(f"{path} is the table of another sweep", None, "e")
+        return {
+            tuple(row[k] for k in keys) for row in reader if not row["error"]
+        }
+
+
+def sweep_writer(f: Any, path: str | None, columns: list[str]) -> Callable:
+    """
+    :param f: the file open in append mode where the table is written
+    :param path: (string) the table of a sweep, written as JSON lines if \
+    it ends with .jsonl or .json, as CSV otherwise (standard output)
+    :param columns: (list of string) the columns of the table
+    :return: (function) the function writing a row in the table
+    """
+    if path is not None and path.endswith((".jsonl", ".json")):
+
+        def write(row: dict[str, Any]):
+            f.write(json.dumps(row, default=repr) + "\n")
+            f.flush()
+
+        return write
+    import csv
+
+    writer = csv.DictWriter(f, columns)
+    if path is None or f.tell() == 0:
+        writer.writeheader()
+
+    def write(row: dict[str, Any]):
+        writer.writerow(row)
+        f.flush()
+
+    return write
+
+
+def run_sweep(
+    function: Callable, values: dict[str, Any], config: Config
+) -> list[dict[str, Any]]:
+    """
+    Run a function on every combination of the values of the sweep \
+    dimensions and write a row per run in the table of the sweep. The \
+    combinations run without error with the same fixed values are \
+    skipped, so an interrupted sweep is resumed by running it again.
+
+    :param function: (function) the function of the sweep
+    :param values: the values of the parameters, a tuple of values for \
+    the sweep dimensions
+    :param config: the settings of the sweep
+    :return: (list of dictionaries) the rows of the runs, in the order \
+    of the combinations
+    """
+    import itertools
+
+    dims = list(config.sweep)
+    fixed = {k: v for k, v in values.items() if k not in dims}
+    columns = dims + list(fixed) + ["wall_time", "result", "error"]
+    path = config.sweep_output
+    done = sweep_done(path, columns)
+    key = tuple(sweep_cell(v, path) for v in fixed.values())
+    todo = [
+        dict(zip(dims, combination))
+        for combination in itertools.product(*(values[d] for d in dims))
+        if tuple(sweep_cell(v, path) for v in combination) + key not in done
+    ]
+    f = sys.stdout if path is None else open(path, "a", newline="")
+    try:
+        write = sweep_writer(f, path, columns)
+        if config.sweep_workers == 1:
+            rows = []
+            for combination in todo:
+                rows.append(sweep_call(function, combination, fixed))
+                write(rows[-1])
+            return rows
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        raw = inspect.unwrap(function)
+        with ProcessPoolExecutor(
+            config.sweep_workers,
+            initializer=sweep_init,
+            initargs=(raw.__module__, raw.__qualname__, config, fixed),
+        ) as pool:
+            futures = {
+                pool.submit(sweep_task, c): i for i, c in enumerate(todo)
+            }
+            rows = [None] * len(todo)
+            try:
+                for future in as_completed(futures):
+                    rows[futures[future]] = future.result()
+                    write(rows[futures[future]])
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
+        return rows
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+class OutputRecorder(object):
+    """
+    Output stream writing to another stream and recording what it wrote.
+    """
+
+    def __init__(self, file: Any):
+        """
+        :param file: the stream where the output is written
+        """
+        self.file = file
+        self.parts = []
+
+    def write(self, text: str | bytes) -> int:
+        self.parts.append(text if isinstance(text, str) else text.decode())
+        return self.file.write(text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
+
+
+def terminal_key() -> tuple:
+    """
+    :return: (tuple) what the rendering of the help depends on in the \
+    terminal: its width, whether the output is a terminal and the \
+    environment variables choosing the colors
+    """
+    try:
+        width = os.get_terminal_size(sys.__stdout__.fileno()).columns
+    except (AttributeError, OSError, ValueError):
+        width = None
+    env = (
+        "COLUMNS",
+        "NO_COLOR",
+        "FORCE_COLOR",
+        "TERM",
+        "COLORTERM",
+        "LAZYPARSER_RENDERER",
+    )
+    return (
+        width,
+        sys.stdout.isatty(),
+        tuple(os.environ.get(v) for v in env),
+    )
+
+
+def dump_help(path: str, text: str, size: int) -> None:
+    """
+    Write a rendered help in the on-disk cache and evict the least \
+    recently used helps to keep at most size of them.
+
+    :param path: (string) the file of the help
+    :param text: (string) the help
+    :param size: (int) the maximal number of helps kept in the cache
+    """
+    import tempfile
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        evict(directory, ".lphelp", size)
+    except OSError:
+        return None
+
+
+def dump_manifest(path: str, entries: dict[str, Any]) -> None:
+    """
+    Write the short helps of the subcommands of a tool.
+
+    :param path: (string) the file of the manifest
+    :param entries: the short help of each ``"module:function"`` string, \
+    with the file of its module and the stamp of the file
+    """
+    import tempfile
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError:
+        return None
+
+
+class CompiledParser(object):
+    """
+    The parser of a decorated function, built once and reused. The fast \
+    path handles the ordinary invocations and the click command, created \
+    on first need, everything else.
+    """
+
+    def __init__(self, lp: Lazyparser, function: Callable):
+        """
+        :param lp: the parser of function
+        :param function: (function) the decorated function
+        """
+        self.lp = lp
+        self.func = function
+        if inspect.iscoroutinefunction(function):
+            self.func = sync_entry(function, lp.config)
+        if lp.config.streams:
+            self.func = stream_entry(self.func, lp, lp.config)
+        if lp.config.sweep:
+            self.func = sweep_entry(self.func, lp.config)
+        # the lazy values and the paths are converted and checked once for
+        # all the runs of a sweep, and closed after the last one
+        if any(isinstance(a.type, LazyType) for a in lp.args.values()):
+            self.func = lazy_entry(self.func, lp)
+        # the function called with the values of parse_args, already checked
+        self.checked_func = self.func
+        if lp.paths:
+            self.func = paths_entry(self.func, lp)
+        self.fast = FastParser(lp) if FastParser.supports(lp) else None
+        self._commands = {}  # the click command of each backend
+
+    @property
+    def command(self) -> Any:
+        """
+        :return: the click command of the parser
+        """
+        backend = renderer()
+        if backend not in self._commands:
+            self._commands[backend] = build_command(
+                self.lp, self.func, backend
+            )
+        return self._commands[backend]
+
+    def __call__(self, *args, **kw):
+        """
+        Parse the command line and call the function.
+
+        :return: the result of the function if the standalone mode is \
+        disabled
+        """
+        shell = os.environ.get("LAZYPARSER_COMPLETION")
+        if shell:
+            prog = os.path.basename(sys.argv[0])
+            print(write_completion(self.lp, shell, prog), end="")
+            if self.lp.config.standalone:
+                sys.exit(0)
+            return None
+        values = None
+        argv = sys.argv[1:]
+        defaults = self.lp.config.config_option or self.lp.config.pyproject
+        if defaults and not args and not kw:
+            argv = defaults_argv(self.lp, argv)
+        if self.fast is not None and not args and not kw:
+            if not any(
+                v.startswith("_") and v.endswith("_COMPLETE")
+                for v in os.environ
+            ):
+                values = self.fast.parse(argv)
+        standalone = self.lp.config.standalone
+        if values is None:
+            try:
+                return self.click_call(argv, args, kw)
+            finally:
+                LAZY_VALUES.set(None)
+        try:
+            rv = self.func(**values)
+        except (EOFError, KeyboardInterrupt):
+            if not standalone:
+                raise
+            print(file=sys.stderr)
+            print("Aborted!", file=sys.stderr)
+            sys.exit(1)
+        if standalone:
+            sys.exit(0)
+        return rv
+
+    def click_call(self, argv: list[str], args: tuple, kw: dict) -> Any:
+        """
+        Parse the command line with click, or print the cached help, and \
+        call the function.
+
+        :param argv: the arguments of the command line
+        :param args: the positional arguments given to the parsed function
+        :param kw: the keyword arguments given to the parsed function
+        :return: the result of the click command if the standalone mode \
+        is disabled
+        """
+        config = self.lp.config
+        standalone = config.standalone
+        if not args and not kw:
+            path = self.help_path(argv)
+            if path is not None:
+                return self.cached_help(argv, path)
+            if config.config_option or config.pyproject:
+                return self.command.main(argv, standalone_mode=standalone)
+        if standalone:
+            return self.command(*args, **kw)
+        return self.command.main(standalone_mode=False)
+
+    def help_path(self, argv: list[str]) -> str | None:
+        """
+        :param argv: the arguments of the command line
+        :return: (string) the file of the on-disk cache storing the help \
+        for this terminal, None if the command line does not ask for \
+        the help or if the cache is disabled
+        """
+        config = self.lp.config
+        if config.cache_dir is None:
+            return None
+        try:
+            self.check_help(argv)
+            return None
+        except HelpRequested as e:
+            if e.param != "help":
+                return None
+        source = repr(
+            (
+                spec_key(self.lp.func, config),
+                [(a.name, type_key(a.type)) for a in self.lp.args.values()],
+                os.path.basename(sys.argv[0]),
+                terminal_key(),
+            )
+        )
+        digest = hashlib.sha1(source.encode()).hexdigest()[:16]
+        return os.path.join(config.cache_dir, f"{digest}.lphelp")
+
+    def cached_help(self, argv: list[str], path: str) -> Any:
+        """
+        Print the help stored in the on-disk cache, without importing \
+        click or rich, or render it with click and store it.
+
+        :param argv: the arguments of the command line
+        :param path: (string) the file of the help in the cache
+        :return: the result of the click command if the standalone mode \
+        is disabled
+        """
+        standalone = self.lp.config.standalone
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            text = None
+        if text is not None:
+            os.utime(path)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            if standalone:
+                sys.exit(0)
+            # the exit code returned by click for the help
+            return 0
+        recorder = OutputRecorder(sys.stdout)
+        sys.stdout = recorder
+        done = False
+        try:
+            rv = self.command.main(argv, standalone_mode=standalone)
+            done = True
+        except SystemExit as e:
+            done = e.code in (0, None)
+            raise
+        finally:
+            sys.stdout = recorder.file
+            if done:
+                text = "".join(recorder.parts)
+                dump_help(path, text, self.lp.config.cache_size)
+        return rv
+
+    def parse_args(self, argv: list[str]) -> Mapping[str, Any]:
+        """
+        Parse a command line without calling the function, exiting or \
+        printing anything.
+
+        :param argv: the arguments of the command line
+        :return: the values of the arguments
+        """
+        if self.lp.config.config_option or self.lp.config.pyproject:
+            argv = defaults_argv(self.lp, argv)
+        values = None
+        if self.fast is not None:
+            values = self.fast.parse(argv)
+        if values is None:
+            try:
+                values = self.click_parse_args(argv)
+            finally:
+                LAZY_VALUES.set(None)
+        error = bulk_paths(self.lp, values)
+        if error is not None:
+            raise UsageError(error[1], error[0])
+        return values
+
+    def click_parse_args(self, argv: list[str]) -> dict[str, Any]:
+        """
+        :param argv: the arguments of the command line
+        :return: the values of the arguments parsed by click
+        """
+        self.check_help(argv)
+        import click
+
+        try:
+            ctx = self.command.make_context(
+                self.func.__name__, list(argv), resilient_parsing=False
+            )
+        except click.UsageError as e:
+            param = getattr(e, "param", None)
+            raise UsageError(
+                e.format_message(), None if param is None else param.name
+            ) from None
+        return ctx.params
+
+    def check_help(self, argv: list[str]):
+        """
+        Raise HelpRequested if the command line asks for the help or the \
+        version, that click would print before exiting.
+
+        :param argv: the arguments of the command line
+        """
+        config = self.lp.config
+        info = {"--help", "-h"} | ({"--version"} if config.version else set())
+        for _, option in option_tokens(argv, option_nargs(self.lp)):
+            if option in info:
+                raise HelpRequested(
+                    f"{option} requested",
+                    "version" if option == "--version" else "help",
+                )
+
+
+def load_target(target: str) -> Callable:
+    """
+    Import the function designated by a ``"module:function"`` string.
+
+    :param target: (str) the module and the qualified name of the function
+    :return: (function) the function
+    """
+    module, sep, qualname = target.partition(":")
+    if not sep or not module or not qualname:
+        message(f"{target!r} is not of the form 'module:function'", None, "e")
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def module_source(module: str) -> str | None:
+    """
+    Locate the file of a module without importing it nor its packages, \
+    whose ``__init__`` may be costly or have side effects.
+
+    :param module: (str) the name of the module
+    :return: (str) the file of the module, None if it is not found
+    """
+    from importlib.machinery import PathFinder
+
+    if module in sys.modules:
+        return getattr(sys.modules[module], "__file__", None)
+    name, path, spec = "", None, None
+    for part in module.split("."):
+        name = f"{name}.{part}" if name else part
+        try:
+            spec = PathFinder.find_spec(name, path)
+        except (ImportError, ValueError):
+            return None
+        if spec is None:
+            return None
+        path = spec.submodule_search_locations
+    return spec.origin
+
+
+def target_help(target: str, origin: str | None = None) -> str:
+    """
+    Read the first line of the description of the function designated by \
+    a ``"module:function"`` string, from the source of its module and \
+    without importing it.
+
+    :param target: (str) the module and the qualified name of the function
+    :param origin: (str) the file of the module, found if None
+    :return: (str) the first line of the description or an empty string
+    """
+    import ast
+
+    module, _, qualname = target.partition(":")
+    origin = module_source(module) if origin is None else origin
+    if origin is None or not origin.endswith(".py"):
+        return ""
+    with open(origin, encoding="utf-8") as f:
+        nodes = ast.parse(f.read()).body
+    node = None
+    for attr in qualname.split("."):
+        node = next(
+            (
+                n
+                for n in nodes
+                if isinstance(
+                    n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+                )
+                and n.name == attr
+            ),
+            None,
+        )
+        if node is None:
+            return ""
+        nodes = node.body
+    description = parse_docstring(ast.get_docstring(node, clean=False))[0]
+    return next((x.strip() for x in description.splitlines() if x), "")
+
+
+def source_stamp(origin: str | None) -> list[int] | None:
+    """
+    :param origin: (str) the file of a module, None if it is not found
+    :return: the modification time in nanoseconds and the size of the \
+    file, None if it cannot be read
+    """
+    try:
+        st = os.stat(origin)
+    except (OSError, TypeError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class Subcommands(object):
+    """
+    Registry of the subcommands of a tool. A subcommand is a function or \
+    a ``"module:function"`` string: the module is only imported, and the \
+    parser of the function only built, when the subcommand is selected. \
+    The help of the tool is built from the names and the short help of \
+    the subcommands alone.
+    """
+
+    def __init__(
+        self,
+        description: str = "",
+        commands: dict[str, Callable | str] | None = None,
+        standalone: bool = True,
+        cache_dir: str | None = None,
+    ):
+        """
+        :param description: (str) the description of the tool
+        :param commands: the function (or ``"module:function"`` string) \
+        of each subcommand
+        :param standalone: (bool) False to return the result of the \
+        subcommands instead of exiting, unless a subcommand sets its own \
+        standalone mode
+        :param cache_dir: (str) the directory where the short helps read \
+        in the modules are stored, the directory of the on-disk cache if \
+        None or, if it is disabled, the user cache directory
+        """
+        self.description = description
+        self.standalone = standalone
+        self.cache_dir = cache_dir
+        self.commands = {}  # name -> function or "module:function"
+        self.helps = {}  # name -> short help given explicitly
+        self.loaded = {}  # name -> parsed function, once selected
+        for name, target in (commands or {}).items():
+            self.add(name, target)
+
+    def add(self, name: str, target: Callable | str, help: str | None = None):
+        """
+        Register a subcommand.
+
+        :param name: (str) the name of the subcommand
+        :param target: the function of the subcommand or a \
+        ``"module:function"`` string
+        :param help: (str) the short help of the subcommand. If None, it is \
+        the first line of the description of the function.
+        """
+        self.commands[name] = target
+        self.loaded.pop(name, None)
+        if help is not None:
+            self.helps[name] = help
+
+    def command(
+        self, func: Callable | None = None, *, name: str | None = None
+    ) -> Callable:
+        """
+        Decorator registering a function as a subcommand.
+
+        :param func: (function) the function to register
+        :param name: (str) the name of the subcommand, the name of the \
+        function by default
+        :return: the function, unchanged
+        """
+
+        def wrap(function: Callable) -> Callable:
+            self.add(name or function.__name__, function)
+            return function
+
+        if func is None:
+            return wrap
+        return wrap(func)
+
+    def manifest_path(self) -> str:
+        """
+        :return: (str) the file storing the short helps of the subcommands \
+        given by a ``"module:function"`` string
+        """
+        directory = self.cache_dir or current_config().cache_dir
+        prog = os.path.basename(sys.argv[0]) if sys.argv else "tool"
+        name = re.sub(r"[^\w.-]", "_", prog)
+        directory = directory or user_cache_dir()
+        return os.path.join(directory, f"{name}.lpmanifest.json")
+
+    def manifest(self) -> dict[str, str]:
+        """
+        Get the short helps. Those of the ``"module:function"`` strings \
+        are read in the file of the manifest, written when one of them is \
+        read from the source of its module, until the module changes.
+
+        :return: the short help of each subcommand
+        """
+        path = self.manifest_path()
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        res, entries = {}, {}
+        for name, target in self.commands.items():
+            if name in self.helps:
+                res[name] = self.helps[name]
+            elif isinstance(target, str):
+                entry = stored.get(target)
+                if (
+                    not isinstance(entry, dict)
+                    or entry.get("stamp") is None
+                    or source_stamp(entry.get("source")) != entry["stamp"]
+                ):
+                    origin = module_source(target.partition(":")[0])
+                    entry = {
+                        "help": target_help(target, origin),
+                        "source": origin,
+                        "stamp": source_stamp(origin),
+                    }
+                entries[target] = entry
+                res[name] = entry["help"]
+            else:
+                doc = parse_docstring(inspect.getdoc(target))[0]
+                res[name] = next(
+                    (x.strip() for x in doc.splitlines() if x), ""
+                )
+        if entries != {k: stored.get(k) for k in entries}:
+            dump_manifest(path, entries)
+        return res
+
+    def load(self, name: str) -> Callable:
+        """
+        Import the function of a subcommand and decorate it with ``parse`` \
+        if it is not already.
+
+        :param name: (str) the name of the subcommand
+        :return: (function) the parsed function
+        """
+        target = self.commands[name]
+        if isinstance(target, str):
+            target = load_target(target)
+        func = target
+        while not hasattr(func, "compiled") and hasattr(func, "__wrapped__"):
+            func = func.__wrapped__
+        if not hasattr(func, "compiled"):
+            target = parse(target)
+        return configure(target, standalone=self.standalone)
+
+    def print_help(self, prog: str):
+        """
+        Print the help of the tool.
+
+        :param prog: (str) the name of the program
+        """
+        manifest = self.manifest()
+        width = max((len(n) for n in manifest), default=0)
+        lines = [f"Usage: {prog} COMMAND [ARGS]...", ""]
+        if self.description:
+            lines += [f"  {self.description}", ""]
+        lines.append("Commands:")
+        lines += [f"  {n:<{width}}  {h}".rstrip() for n, h in manifest.items()]
+        print("\n".join(lines))
+
+    def __call__(self, argv: list[str] | None = None) -> Any:
+        """
+        Run the subcommand selected by the command line.
+
+        :param argv: the arguments of the command line, sys.argv[1:] by \
+        default
+        :return: the result of the subcommand if the standalone mode is \
+        disabled
+        """
+        argv = sys.argv[1:] if argv is None else list(argv)
+        prog = os.path.basename(sys.argv[0]) if sys.argv else "tool"
+        if not argv or argv[0] in ("-h", "--help"):
+            self.print_help(prog)
+            if self.standalone:
+                sys.exit(0 if argv else 2)
+            return None
+        name, rest = argv[0], argv[1:]
+        if name not in self.commands:
+            message(f"No such command {name!r}.", None, "e")
+        if name not in self.loaded:
+            self.loaded[name] = self.load(name)
+        target = self.loaded[name]
+        old_argv = sys.argv
+        sys.argv = [f"{prog} {name}"] + rest
+        try:
+            return target()
+        finally:
+            sys.argv = old_argv
+
+
+# shell functions asking ``python -m lazyparser complete`` for the
+# completions of a program, by shell
+COMPLETION_SCRIPTS = {
+    "bash": """\
+_{name}_lazyparser_complete() {{
+    local IFS=$'\\n'
+    local response=($("{python}" -m lazyparser complete "{index}" \\
+        "$COMP_CWORD" "${{COMP_WORDS[@]}}"))
+    local cur="${{COMP_WORDS[COMP_CWORD]}}"
+    case "${{response[0]}}" in
+        file) COMPREPLY=($(compgen -f -- "$cur")) ;;
+        dir) COMPREPLY=($(compgen -d -- "$cur")) ;;
+        *) COMPREPLY=("${{response[@]:1}}") ;;
+    esac
+}}
+complete -o default -F _{name}_lazyparser_complete {prog}
+""",
+    "zsh": """\
+#compdef {prog}
+_{name}_lazyparser_complete() {{
+    local -a response
+    response=("${{(@f)$("{python}" -m lazyparser complete "{index}" \\
+        $((CURRENT - 1)) "${{words[@]}}")}}")
+    case $response[1] in
+        file) _files ;;
+        dir) _files -/ ;;
+        *) compadd -- "${{(@)response[2,-1]}}" ;;
+    esac
+}}
+compdef _{name}_lazyparser_complete {prog}
+""",
+    "fish": """\
+function _{name}_lazyparser_complete
+    set -l tokens (commandline -opc)
+    set -l current (commandline -ct)
+    set -l response ("{python}" -m lazyparser complete "{index}" \\
+        (count $tokens) $tokens "$current")
+    switch $response[1]
+        case file
+            __fish_complete_path "$current"
+        case dir
+            __fish_complete_directories "$current"
+        case '*'
+            printf '%s\\n' $response[2..-1]
+    end
+end
+complete -c {prog} -f -a '(_{name}_lazyparser_complete)'
+""",
+}
+
+
+def completion_index(lp: Lazyparser) -> dict[str, Any]:
+    """
+    Get the completion index of a parser: the names of every option, \
+    the number of values they take, their choices and whether they are \
+    paths.
+
+    :param lp: a parser
+    :return: the completion index of lp
+    """
+    options = [
+        {"names": ["--help", "-h"], "nargs": 0, "multiple": False},
+    ]
+    if lp.config.version:
+        options.append({"names": ["--version"], "nargs": 0, "multiple": False})
+    for arg in lp.args.values():
+        if arg.name in lp.config.forbidden:
+            continue
+        opt = {
+            "names": [f"--{arg.name}", f"-{arg.short_name}"],
+            "nargs": 0 if arg.is_flag else 1,
+            "multiple": is_multiple(arg.type),
+            "help": arg.help,
+        }
+        subtypes = getattr(arg.type, "__args__", ())
+        if isinstance(arg.type, types.GenericAlias) and not opt["multiple"]:
+            opt["nargs"] = len(subtypes)
+        atype = lp.paths.get(arg.name, arg.type)
+        if isinstance(atype, LazyType) and atype.path:
+            opt["path"] = atype.path
+        elif is_click_type(atype):
+            import click
+
+            if isinstance(atype, click.Choice):
+                opt["choices"] = [str(c) for c in atype.choices]
+            elif isinstance(atype, click.Path):
+                only_dir = atype.dir_okay and not atype.file_okay
+                opt["path"] = "dir" if only_dir else "file"
+            elif isinstance(atype, click.File):
+                opt["path"] = "file"
+        options.append(opt)
+    return {"version": __version__, "options": options}
+
+
+def completion_path(prog: str, config: Config | None = None) -> str:
+    """
+    Get the file of the completion index of a program: in the on-disk \
+    cache if it is enabled, next to the script otherwise, or in the user \
+    cache directory if the directory of the script is not writable.
+
+    :param prog: (str) the name of the program
+    :param config: the settings of its parser, the defaults if None
+    :return: (str) the path of the index
+    """
+    config = current_config() if config is None else config
+    name = re.sub(r"[^\w.-]", "_", prog)
+    if config.cache_dir is not None:
+        return os.path.join(config.cache_dir, f"{name}.completion")
+    script = os.path.abspath(sys.argv[0]) if sys.argv[0] else os.getcwd()
+    directory = os.path.dirname(script)
+    if os.access(directory, os.W_OK):
+        return os.path.join(directory, f".{name}.completion")
+    return os.path.join(user_cache_dir(), f"{name}.completion")
+
+
+def write_completion(lp: Lazyparser, shell: str, prog: str) -> str:
+    """
+    Write the completion index of a parser and get the script enabling \
+    the completion of the program in a shell.
+
+    :param lp: a parser
+    :param shell: (str) bash, zsh or fish
+    :param prog: (str) the name of the program
+    :return: (str) the completion script
+    """
+    if shell not in COMPLETION_SCRIPTS:
+        message(
+            f"unsupported shell {shell!r}, choose among "
+            + ", ".join(COMPLETION_SCRIPTS),
+            None,
+            "e",
+        )
+    import tempfile
+
+    index = completion_path(prog, lp.config)
+    try:
+        os.makedirs(os.path.dirname(index), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(completion_index(lp), f)
+        os.replace(tmp, index)
+    except OSError as e:
+        message(f"cannot write the completion index {index}: {e}", None, "e")
+    return COMPLETION_SCRIPTS[shell].format(
+        name=re.sub(r"\W", "_", prog),
+        prog=prog,
+        python=sys.executable,
+        index=index,
+    )
+
+
+def complete(index: dict[str, Any], words: list[str], cword: int) -> list[str]:
+    """
+    Complete a command line from a completion index.
+
+    :param index: a completion index
+    :param words: the words of the command line, the program included
+    :param cword: the position of the word being completed in words
+    :return: the kind of completion (plain, file or dir) followed by the \
+    candidates
+    """
+    options = {n: opt for opt in index["options"] for n in opt["names"]}
+    current = words[cword] if cword < len(words) else ""
+    used, opt, remaining = set(), None, 0
+    for token in words[1:cword]:
+        if remaining:
+            remaining -= 1
+        elif token in options:
+            opt = options[token]
+            used.add(id(opt))
+            remaining = opt["nargs"]
+    if remaining:
+        if "path" in opt:
+            return [opt["path"]]
+        choices = opt.get("choices", [])
+        return ["plain"] + [c for c in choices if c.startswith(current)]
+    names = [
+        n
+        for o in index["options"]
+        if o["multiple"] or id(o) not in used
+        for n in o["names"]
+        if n.startswith(current)
+        and (n.startswith("--") or current not in ("", "-"))
+    ]
+    return ["plain"] + names
+
+
+def main(argv: list[str]) -> int:
+    """
+    Entry point of ``python -m lazyparser complete INDEX CWORD WORDS...``, \
+    used by the completion scripts. Only the index is read: neither the \
+    program nor click are imported.
+
+    :param argv: the arguments of the command line
+    :return: (int) the exit code
+    """
+    if len(argv) < 3 or argv[0] != "complete" or not argv[2].isdigit():
+        print(
+            "usage: python -m lazyparser complete INDEX CWORD WORDS...",
+            file=sys.stderr,
+        )
+        return 2
+    try:
+        with open(argv[1], encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return 1
+    print("\n".join(complete(index, argv[3:], int(argv[2]))))
+    return 0
+
+
+class Tracer(object):
+    """
+    Record the wall time and the memory allocated by each phase of \
+    lazyparser. The phases are traced by replacing the functions running \
+    them with wrappers, restored when the tracer stops: a disabled tracer \
+    costs nothing.
+    """
 
-    :param lp: the parsed arguments
-    :param func: the function used to create a CLI
-    :return: The function func decorated with click.option()
+    def __init__(self, output: str | None = None, memory: bool = True):
+        """
+        :param output: the file where a Chrome trace is written when the \
+        tracer stops. If None, nothing is written.
+        :param memory: True to record the memory allocated by the \
+        phases with tracemalloc (which slows them down)
+        """
+        import threading
+
+        self.output = output
+        self.memory = memory
+        self.events = []  # (phase, thread, start, duration, allocated)
+        self.originals = {}  # (owner, attribute) -> original or None
+        self.tracing = False  # True if the tracer started tracemalloc
+        self.get_ident = threading.get_ident
+        self.origin = time.perf_counter_ns()
+
+    @staticmethod
+    def targets() -> list[tuple[Any, str, str]]:
+        """
+        :return: the owner, the attribute and the name of every phase \
+        that can be traced
+        """
+        module = sys.modules[__name__]
+        targets = [
+            (module, "get_signature", "signature"),
+            (Lazyparser, "init_args", "init_args"),
+            (module, "parse_docstring", "parse_docstring"),
+            (Lazyparser, "update_param", "update_param"),
+            (Lazyparser, "get_short_name", "get_short_name"),
+            (Lazyparser, "set_constrain", "set_constrain"),
+            (module, "load_spec", "load_spec"),
+            (module, "dump_spec", "dump_spec"),
+            (module, "load_target", "load_target"),
+            (module, "load_click", "load_click"),
+            (module, "build_command", "build_command"),
+            (FastParser, "parse", "fast.parse"),
+            (module, "message", "message"),
+        ]
+        if "HelpfulCmd" in CLICK_CLASSES:
+            cmd = CLICK_CLASSES["HelpfulCmd"]
+            targets += [
+                (cmd, "parse_args", "click.parse"),
+                (cmd, "format_help", "rich.help"),
+            ]
+        if "PlainCmd" in CLICK_CLASSES:
+            cmd = CLICK_CLASSES["PlainCmd"]
+            targets += [
+                (cmd, "parse_args", "click.parse"),
+                (cmd, "format_help", "plain.help"),
+            ]
+        return targets
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        """
+        :param phase: the name of the phase
+        :param func: (function) the function running the phase
+        :return: (function) func recording its calls in self
+        """
+        import tracemalloc
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            allocated = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                allocated = tracemalloc.get_traced_memory()[0] - allocated
+                self.events.append(
+                    (phase, self.get_ident(), start, duration, allocated)
+                )
+
+        return traced
+
+    def install(self) -> None:
+        """
+        Replace every phase not traced yet by its traced version.
+        """
+        if self.memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+        for owner, attr, phase in self.targets():
+            if (owner, attr) in self.originals:
+                continue
+            self.originals[(owner, attr)] = vars(owner).get(attr)
+            setattr(owner, attr, self.wrap(phase, getattr(owner, attr)))
+
+    def uninstall(self) -> None:
+        """
+        Restore the functions running the phases and stop tracemalloc if \
+        the tracer started it.
+        """
+        for (owner, attr), original in self.originals.items():
+            if original is None:
+                delattr(owner, attr)
+            else:
+                setattr(owner, attr, original)
+        self.originals = {}
+        if self.tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self.tracing = False
+
+    def stop(self) -> "Tracer":
+        """
+        Stop the tracer and write its Chrome trace if an output was given.
+
+        :return: the tracer
+        """
+        global TRACER
+        if TRACER is self:
+            TRACER = None
+        self.uninstall()
+        if self.output is not None:
+            with open(self.output, "w", encoding="utf-8") as f:
+                json.dump(self.chrome_trace(), f)
+        return self
+
+    def __enter__(self) -> "Tracer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """
+        :return: the recorded phases in the Chrome trace event format
+        """
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": phase,
+                    "cat": "lazyparser",
+                    "ph": "X",
+                    "ts": (start - self.origin) / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"allocated": allocated},
+                }
+                for phase, tid, start, duration, allocated in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def summary(self) -> str:
+        """
+        :return: a table giving the number of calls, the time and the \
+        memory allocated by each phase
+        """
+        rows = {}
+        for phase, _, _, duration, allocated in self.events:
+            calls, total, memory = rows.get(phase, (0, 0, 0))
+            rows[phase] = (calls + 1, total + duration, memory + allocated)
+        lines = [
+            f"{'phase':<16} {'calls':>6} {'total (ms)':>11} "
+            f"{'mean (ms)':>10} {'allocated (KiB)':>16}"
+        ]
+        for phase, (calls, total, memory) in sorted(
+            rows.items(), key=lambda r: -r[1][1]
+        ):
+            lines.append(
+                f"{phase:<16} {calls:>6} {total / 1e6:>11.3f} "
+                f"{total / calls / 1e6:>10.3f} {memory / 1024:>16.1f}"
+            )
+        return "\n".join(lines)
+
+
+def trace(output: str | None = None, memory: bool = True) -> Tracer:
     """
-    func.__doc__ = lp.description()
-    for arg in lp.args:
-        if arg not in FORBIDDEN:
-            func = add_option(lp.args[arg], func)
-    lp.create_click_group()
-    if PROG_VERSION:
-        func = click.version_option(PROG_VERSION)(func)
-    func = click.help_option("-h", "--help")(func)
-    if STD_MODE:
-        func = click.command(cls=HelpfulCmd, epilog=EPI)(func)
-    else:
-        func = click.command(cls=HelpfulCmd, epilog=EPI)(func).main(
-            standalone_mode=False
-        )
-    return func
+    Start recording the phases of lazyparser. The tracer is stopped with \
+    its ``stop`` method or at the end of a ``with`` block.
+
+    :param output: the file where a Chrome trace is written when the \
+    tracer stops. If None, nothing is written.
+    :param memory: True to record the memory allocated by the phases
+    :return: the tracer
+    """
+    global TRACER
+    if TRACER is not None:
+        TRACER.stop()
+    TRACER = Tracer(output, memory)
+    TRACER.install()
+    return TRACER
+
+
+def trace_from_env() -> None:
+    """
+    Start a tracer if the environment variable LAZYPARSER_TRACE is set. \
+    A Chrome trace is written at exit if its value is a .json file, a \
+    summary is displayed on stderr otherwise. Set LAZYPARSER_TRACE_MEMORY \
+    to 0 to only record times.
+    """
+    output = os.environ.get("LAZYPARSER_TRACE")
+    if not output:
+        return None
+    import atexit
+
+    tracer = trace(
+        output if output.endswith(".json") else None,
+        os.environ.get("LAZYPARSER_TRACE_MEMORY", "1") != "0",
+    )
+
+    def report():
+        tracer.stop()
+        if tracer.output is None:
+            print(tracer.summary(), file=sys.stderr)
+
+    atexit.register(report)
 
 
 def message(
@@ -703,6 +4463,28 @@ def message(
     :return: (string) the message in a correct format.
     """
     sentence = re.sub(r"\s+", " ", sentence)
+    if PARSE_ARGV.get() is not None and type_m in ["w", "e"]:
+        name = None if argument is None else argument.name
+        if type_m == "e":
+            raise DefinitionError(sentence, name)
+        import warnings
+
+        warnings.warn(f"{name}: {sentence}" if name else sentence)
+        return None
+    if renderer() == "plain":
+        if argument is not None:
+            sentence = argument.gfn(plain=True) + " " + sentence
+        if type_m == "w":
+            print(f"Warning: {sentence}", file=sys.stderr)
+        elif type_m == "e":
+            print(f"Error: {sentence}", file=sys.stderr)
+            exit(1)
+        else:
+            print(sentence)
+        return None
+    from rich import print as rprint
+    from rich.panel import Panel
+
     if argument is not None:
         sentence = argument.gfn() + " " + sentence
     if type_m not in ["w", "e"]:
@@ -744,31 +4526,290 @@ def parse(
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
-
-        @functools.wraps(function)
-        def call_func(*args, **kw):
-            """
-            Call the function ``self.func`` and return it's result.
-
-            :return: the result of the function ``self.func``
-            """
-            lazyparser = Lazyparser(function, click_types)
-            func = init_parser(lazyparser, function)
-            if STD_MODE:
-                return func(*args, **kw)
-            else:
-                return func
-
-        return call_func
+        return parsed(
+            getattr(function, "lp_function", function),
+            click_types,
+            getattr(function, "lp_settings", {}),
+        )
 
     if func is None:
         return wrap
     return wrap(func)
 
 
+def parsed(
+    function: Callable, click_types: dict[str, Any], settings: dict[str, Any]
+) -> Callable[[], Any]:
+    """
+    Decorate a function with its parser.
+
+    :param function: (function) the function to wrap
+    :param click_types: (dictionary) the click types
+    :param settings: the fields of Config changed by the decorators
+    :return: (function) the method calling `` function``.
+    """
+
+    @functools.wraps(function)
+    def call_func(*args, **kw):
+        """
+        Call the function ``self.func`` and return it's result.
+
+        :return: the result of the function ``self.func``
+        """
+        parser = compiled_parser(call_func)
+        argv = PARSE_ARGV.get()
+        if argv is not None:
+            return parser.parse_args(argv)
+        if not args and not kw and sys.argv[1:2] == [BATCH_OPTION]:
+            return run_batch(call_func, sys.argv[2:])
+        return parser(*args, **kw)
+
+    # parsers already built for function, by default settings
+    call_func.compiled = {}
+    call_func.lp_parsed = (function, click_types)
+    call_func.lp_settings = settings
+    return call_func
+
+
+def compiled_parser(func: Callable) -> CompiledParser:
+    """
+    :param func: (function) a function decorated with ``parse``
+    :return: the parser of func for the current defaults, built on \
+    first use
+    """
+    key = env_key()
+    if key not in func.compiled:
+        function, click_types = func.lp_parsed
+        config = Config(*key).replace(**func.lp_settings)
+        func.compiled[key] = CompiledParser(
+            cached_parser(function, click_types, config), function
+        )
+    return func.compiled[key]
+
+
+def configure(function: Callable, **settings) -> Callable:
+    """
+    Change some settings of the parser of a function. Applied over \
+    ``parse``, it gives a new parsed function; applied to a function not \
+    parsed yet, it gives a wrapper recording the settings for ``parse``. \
+    The decorated function itself is never modified. When a setting is \
+    given twice, the decorator closest to the function wins.
+
+    :param function: (function) the decorated function
+    :param settings: the new value of some fields of Config
+    :return: (function) the function with its new settings
+    """
+    Config(**settings)
+    settings = settings | getattr(function, "lp_settings", {})
+    if hasattr(function, "lp_parsed"):
+        return parsed(*function.lp_parsed, settings)
+
+    @functools.wraps(function)
+    def call_func(*args, **kw):
+        return function(*args, **kw)
+
+    call_func.lp_function = getattr(function, "lp_function", function)
+    call_func.lp_settings = settings
+    return call_func
+
+
+def parse_args(func: Callable, argv: list[str]) -> Mapping[str, Any]:
+    """
+    Parse a command line with the parser of a function decorated with \
+    ``parse``, in the environment set by its other decorators. The \
+    function is not called, sys.argv and the terminal are left untouched \
+    and the errors are raised as LazyparserError.
+
+    :param func: (function) a function decorated with ``parse``
+    :param argv: the arguments of the command line
+    :return: the values of the arguments of func
+    """
+    token = PARSE_ARGV.set(list(argv))
+    try:
+        return func()
+    finally:
+        PARSE_ARGV.reset(token)
+
+
+def batch_argv(line: str, parser: CompiledParser) -> list[str]:
+    """
+    :param line: (string) a line of a batch: a shell-quoted command \
+    line, a JSON list of arguments or a JSON object giving the values \
+    of some parameters
+    :param parser: the parser of the batch
+    :return: (list of string) the arguments of the command line
+    """
+    text = line.strip()
+    if text.startswith("["):
+        return [str(v) for v in json.loads(text)]
+    if not text.startswith("{"):
+        import shlex
+
+        return shlex.split(text)
+    return values_argv(json.loads(text), parser.lp)
+
+
+def batch_line(
+    func: Callable, number: int, line: str, portable: bool = False
+) -> dict[str, Any] | None:
+    """
+    Parse a line of a batch and call the function with its values.
+
+    :param func: (function) a function decorated with ``parse``
+    :param number: (int) the number of the line, from 1
+    :param line: (string) the line
+    :param portable: (bool) True to turn the results that cannot be \
+    pickled into errors, for the lines run in another process
+    :return: (dictionary) the record of the line, with its number, its \
+    arguments and the result of func or the error raised, None for the \
+    blank lines and the comments
+    """
+    if not line.strip() or line.lstrip().startswith("#"):
+        return None
+    parser = compiled_parser(func)
+    record = {"line": number, "argv": None}
+    try:
+        record["argv"] = batch_argv(line, parser)
+        values = parser.parse_args(record["argv"])
+        record["result"] = parser.checked_func(**values)
+    except (Exception, SystemExit) as e:
+        record["error"] = {
+            "type": type(e).__name__,
+            "message": getattr(e, "message", None) or str(e),
+            "param": getattr(e, "param", None),
+        }
+    if portable and "result" in record:
+        import pickle
+
+        try:
+            pickle.dumps(record["result"])
+        except Exception as e:
+            del record["result"]
+            record["error"] = {
+                "type": type(e).__name__,
+                "message": f"unpicklable result: {e}",
+                "param": None,
+            }
+    return record
+
+
+def batch(
+    func: Callable, lines: Iterable[str], workers: int = 1
+) -> Iterable[dict[str, Any]]:
+    """
+    Run a function decorated with ``parse`` on many command lines, with \
+    the parser built once. Each line is a shell-quoted command line, a \
+    JSON list of arguments or a JSON object giving the values of some \
+    parameters. Blank lines and lines starting with # are skipped.
+
+    :param func: (function) a function decorated with ``parse``
+    :param lines: (iterable of string) the lines of the batch
+    :param workers: (int) the number of processes running the lines, \
+    func must then be importable by its name
+    :return: (iterator of dictionaries) the record of each line in the \
+    order of the lines: its number, its arguments and either the result \
+    of func or the type, message and parameter of the error raised
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    token = PARSE_ARGV.set([])
+    try:
+        compiled_parser(func)
+    finally:
+        PARSE_ARGV.reset(token)
+    if workers == 1:
+        records = (batch_line(func, n, v) for n, v in enumerate(lines, 1))
+        return (r for r in records if r is not None)
+    return pool_batch(func, lines, workers)
+
+
+def pool_batch(
+    func: Callable, lines: Iterable[str], workers: int
+) -> Iterable[dict[str, Any]]:
+    """
+    Run the lines of a batch in a pool of processes.
+
+    :param func: (function) a function decorated with ``parse``
+    :param lines: (iterable of string) the lines of the batch
+    :param workers: (int) the number of processes
+    :return: (iterator of dictionaries) the records of the lines, in \
+    their order
+    """
+    import itertools
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    lines = iter(lines)
+    window = deque()  # the chunks sent to the processes, in their order
+    with ProcessPoolExecutor(workers) as pool:
+        first = 1
+        while True:
+            chunk = list(itertools.islice(lines, BATCH_CHUNK))
+            if chunk:
+                window.append(pool.submit(batch_chunk, func, first, chunk))
+                first += len(chunk)
+            if not window:
+                break
+            # the lines are read ahead by at most two chunks per process
+            if not chunk or len(window) > 2 * workers:
+                records = window.popleft().result()
+                yield from (r for r in records if r is not None)
+
+
+def batch_chunk(
+    func: Callable, first: int, lines: list[str]
+) -> list[dict[str, Any] | None]:
+    """
+    :param func: (function) a function decorated with ``parse``
+    :param first: (int) the number of the first line
+    :param lines: (list of string) consecutive lines of a batch
+    :return: (list of dictionaries) the records of the lines, run in \
+    another process
+    """
+    return [batch_line(func, first + i, v, True) for i, v in enumerate(lines)]
+
+
+def run_batch(func: Callable, argv: list[str]) -> int | None:
+    """
+    Run the batch asked by ``--lazyparser-batch FILE|-`` and write the \
+    record of each line on the standard output, as JSON lines.
+
+    :param func: (function) a function decorated with ``parse``
+    :param argv: the arguments following ``--lazyparser-batch``: the \
+    file of the batch (- for the standard input), optionally followed \
+    by ``--lazyparser-workers N``
+    :return: (int) the number of lines that failed if the standalone \
+    mode is disabled
+    """
+    usage = f"usage: {BATCH_OPTION} FILE|- [{WORKERS_OPTION} N]"
+    if len(argv) == 1:
+        workers = "1"
+    elif len(argv) == 3 and argv[1] == WORKERS_OPTION:
+        workers = argv[2]
+    else:
+        return message(usage, None, "e")
+    if not workers.isdigit() or int(workers) < 1:
+        return message(f"{WORKERS_OPTION} must be positive", None, "e")
+    try:
+        f = sys.stdin if argv[0] == "-" else open(argv[0])
+    except OSError as e:
+        return message(f"cannot read the batch {argv[0]}: {e}", None, "e")
+    failed = 0
+    try:
+        for record in batch(func, f, int(workers)):
+            failed += "error" in record
+            print(json.dumps(record, default=repr))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if compiled_parser(func).lp.config.standalone:
+        sys.exit(1 if failed else 0)
+    return failed
+
+
 def docstrings(**env) -> Callable[..., Callable[[], Any]]:
     """
-    Function used to set a value to some parameters when they are called.
+    Function used to set the docstring environment of a parser.
 
     :param env: (dictionary) the named arguments
     :return: (function) wrap
@@ -781,26 +4822,14 @@ def docstrings(**env) -> Callable[..., Callable[[], Any]]:
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
-
-        @functools.wraps(function)
-        def call_func():
-            """
-            Call the function ``self.func`` and return it's result.
-
-            :return: the result of the function ``self.func``
-            """
-            if env:
-                set_env(env)
-            return function()
-
-        return call_func
+        return configure(function, **env_settings(env))
 
     return wrap
 
 
 def version(version: str | None = None) -> Callable[..., Callable[[], Any]]:
     """
-    Function used to set a value to some parameters when they are called.
+    Function used to add a version option to a parser.
 
     :param version: the version of the program where
     the decorated function is called
@@ -814,30 +4843,18 @@ def version(version: str | None = None) -> Callable[..., Callable[[], Any]]:
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
-
-        @functools.wraps(function)
-        def call_func():
-            """
-            Call the function ``self.func`` and return it's result.
-
-            :return: the result of the function ``self.func``
-            """
-            if version is not None:
-                if not isinstance(version, str):
-                    message("version must be a string", None, "e")
-                global PROG_VERSION
-                PROG_VERSION = version.strip()
-                FORBIDDEN.append("version")
-            return function()
-
-        return call_func
+        if version is None:
+            return configure(function)
+        if not isinstance(version, str):
+            message("version must be a string", None, "e")
+        return configure(function, version=version.strip())
 
     return wrap
 
 
 def standalone(mode: bool | None = None) -> Callable[..., Callable[[], Any]]:
     """
-    Function used to set a value to some parameters when they are called.
+    Function used to set the standalone mode of a parser.
 
     :param mode: Standalone mode to set
     :return: (function) wrap
@@ -850,27 +4867,16 @@ def standalone(mode: bool | None = None) -> Callable[..., Callable[[], Any]]:
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
-
-        @functools.wraps(function)
-        def call_func():
-            """
-            Call the function ``self.func`` and return it's result.
-
-            :return: the result of the function ``self.func``
-            """
-            if isinstance(mode, bool):
-                global STD_MODE
-                STD_MODE = mode
-            return function()
-
-        return call_func
+        if isinstance(mode, bool):
+            return configure(function, standalone=mode)
+        return configure(function)
 
     return wrap
 
 
 def groups(**groups) -> Callable[..., Callable[[], Any]]:
     """
-    Function used to set a value to some parameters when they are called.
+    Function used to set the argument groups of a parser.
 
     :param groups: the groups of options to create
     :return: (function) wrap
@@ -883,26 +4889,37 @@ def groups(**groups) -> Callable[..., Callable[[], Any]]:
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
+        return configure(
+            function, groups=tuple((k, tuple(v)) for k, v in groups.items())
+        )
 
-        @functools.wraps(function)
-        def call_func():
-            """
-            Call the function ``self.func`` and return it's result.
+    return wrap
 
-            :return: the result of the function ``self.func``
-            """
-            if groups is not None:
-                set_groups(groups)
-            return function()
 
-        return call_func
+def short_names(**names: str) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to pin the short name of some parameters.
+
+    :param names: the short name of each pinned parameter
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        names_ = short_name_settings(names)
+        return configure(function, short_names=tuple(names_.items()))
 
     return wrap
 
 
 def epilog(epilog: str | None = None) -> Callable[..., Callable[[], Any]]:
     """
-    Function used to set a value to some parameters when they are called.
+    Function used to set the epilog of the help message of a parser.
 
     :param epilog: A string corresponding to the epilog of the help message
     :return: (function) wrap
@@ -915,21 +4932,191 @@ def epilog(epilog: str | None = None) -> Callable[..., Callable[[], Any]]:
         :param function: (function) the function to wrap
         :return: (function) the method calling `` function``.
         """
+        if isinstance(epilog, str):
+            return configure(function, epilog=epilog.strip())
+        elif epilog is not None:
+            message("epilog must be a string", None, "e")
+        return configure(function)
 
-        @functools.wraps(function)
-        def call_func():
-            """
-            Call the function ``self.func`` and return it's result.
+    return wrap
 
-            :return: the result of the function ``self.func``
-            """
-            if isinstance(epilog, str):
-                global EPI
-                EPI = epilog.strip()
-            elif epilog is not None:
-                message("epilog must be a string", None, "e")
-            return function()
 
-        return call_func
+def event_loop(
+    policy: Any = None, uvloop: bool = False
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to choose the event loop running a coroutine function.
+
+    :param policy: an event loop policy creating the loop, the policy \
+    of asyncio is left untouched
+    :param uvloop: True to run the coroutine with uvloop when it is \
+    installed
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        return configure(function, loop_policy=policy, uvloop=uvloop)
+
+    return wrap
+
+
+def cache(
+    directory: str | None = "", size: int | None = None
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to enable the on-disk cache of the parser.
+
+    :param directory: the directory of the cache, the user cache \
+    directory if empty and None to disable the cache
+    :param size: the maximal number of parsers kept in the cache
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        if directory is not None and not isinstance(directory, str):
+            message("directory must be a string", None, "e")
+        if size is not None and (not isinstance(size, int) or size < 1):
+            message("size must be a positive integer", None, "e")
+        settings = {
+            "cache_dir": user_cache_dir() if directory == "" else directory
+        }
+        if size is not None:
+            settings["cache_size"] = size
+        return configure(function, **settings)
+
+    return wrap
+
+
+def config_file(
+    option: str | None = "config", pyproject: str | None = None
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to read the default values of the parameters in files. \
+    The values given on the command line take precedence over those of \
+    the files, which take precedence over the defaults of the function.
+
+    :param option: (string) the name of the option giving a TOML or JSON \
+    file of defaults, None to disable it
+    :param pyproject: (string) the name of the tool whose table \
+    ``[tool.<name>]`` in the pyproject.toml of the current directory \
+    gives defaults, None to ignore pyproject.toml
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        return configure(function, config_option=option, pyproject=pyproject)
+
+    return wrap
+
+
+def stream(
+    *names: str, errors: str = "strict"
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to give some parameters typed ``tuple[type, ...]`` to \
+    the decorated function as lazy iterators (Stream) instead of tuples. \
+    Their values can then be read in files given as ``@path`` (gzip \
+    compressed or not) or on the standard input given as ``-``, one \
+    value per line.
+
+    :param names: (strings) the streamed parameters
+    :param errors: (string) strict to raise a ValueError when a value \
+    cannot be converted, lenient to skip it
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        return configure(function, streams=names, stream_errors=errors)
+
+    return wrap
+
+
+def check_paths(
+    workers: int = 16, deferred: bool = False
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to choose how the parameters typed ``tuple[str, ...]`` \
+    and constrained by a ``click.Path`` are checked. Their paths are all \
+    checked before the function is called, on a pool of threads, and \
+    every invalid path is reported in a single error.
+
+    :param workers: (int) the maximal number of threads checking the paths
+    :param deferred: (bool) True to give the function the paths as a \
+    CheckedPaths sequence, checking each path when it is accessed
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        return configure(
+            function, path_workers=workers, defer_paths=deferred
+        )
+
+    return wrap
+
+
+def sweep(
+    *names: str, workers: int = 1, output: str | None = None
+) -> Callable[..., Callable[[], Any]]:
+    """
+    Function used to run the decorated function on every combination of \
+    the values given to some of its parameters, each of them accepting \
+    several values on the command line.
+
+    :param names: (strings) the parameters that are sweep dimensions
+    :param workers: (int) the number of processes running the \
+    combinations, the function must then be importable by its name
+    :param output: (string) the CSV file (JSON lines if it ends with \
+    .jsonl) where a row is written per run, the standard output if None. \
+    The combinations already written in the file are skipped.
+    :return: (function) wrap
+    """
+
+    def wrap(function):
+        """
+        Wrapper of the function ``function``.
+
+        :param function: (function) the function to wrap
+        :return: (function) the method calling `` function``.
+        """
+        return configure(
+            function, sweep=names, sweep_workers=workers, sweep_output=output
+        )
 
     return wrap
+
+
+trace_from_env()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -7,9 +7,20 @@ Description:
     Make unit test on lazyparser function and method.
 """
 
+import importlib.util
 import inspect
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
 import unittest
+from unittest import mock
 
+import benchmark
 import lazyparser as lp
 
 
@@ -33,9 +44,9 @@ class TestFunction(unittest.TestCase):
         def lol():
             return None
 
-        lol = lp.docstrings(header="Test")(lol)
-        _ = lol()
-        self.assertEqual(lp.HEADER, "Test")
+        lol = lp.docstrings(header=" Test ")(lol)
+        self.assertEqual(lol.lp_settings, {"header": "Test"})
+        self.assertEqual(lp.HEADER, "Keyword")
 
     def test_set_groups(self):
         self.assertRaises(SystemExit, lp.set_groups, {"**": ["b"]})
@@ -50,8 +61,11 @@ class TestFunction(unittest.TestCase):
             return None
 
         lol = lp.groups(**{"lol": ["b"], "yo": ["help"]})(lol)
-        _ = lol()
-        self.assertEqual(lp.GROUPS, {"lol": ["b"], "yo": ["help"]})
+        self.assertEqual(
+            lol.lp_settings,
+            {"groups": (("lol", ("b",)), ("yo", ("help",)))},
+        )
+        self.assertEqual(lp.GROUPS, {})
 
     def test_get_name(self):
         res = ["L", "lo", "LO", "lol", "l"]
@@ -65,6 +79,64 @@ class TestFunction(unittest.TestCase):
         for i in range(len(res)):
             assert res[i] == lp.get_name("lola", list_name[i], size=1)
 
+    def test_allocate_short_names(self):
+        names = ["help", "lola", "lolo", "lulu", "l", "Lima", "x"]
+        self.assertEqual(
+            lp.allocate_short_names(names),
+            {
+                "help": "h",
+                "Lima": "L",
+                "l": "l",
+                "lola": "lo",
+                "lolo": "LO",
+                "lulu": "lu",
+                "x": "x",
+            },
+        )
+        self.assertEqual(
+            lp.allocate_short_names(names, {"lulu": "u", "absent": "a"}),
+            {
+                "help": "h",
+                "lulu": "u",
+                "Lima": "L",
+                "l": "l",
+                "lola": "lo",
+                "lolo": "LO",
+                "x": "x",
+            },
+        )
+
+    def test_allocate_short_names_scaling(self):
+        names = [f"parameter_{i}" for i in range(10000)]
+        res = lp.allocate_short_names(reversed(names))
+        self.assertEqual(len(set(res.values())), 10000)
+        self.assertEqual(res["parameter_0"], "p")
+        self.assertEqual(res["parameter_1"], "P")
+        self.assertEqual(res["parameter_1000"], "par")
+        self.assertEqual(res["parameter_9999"], "parameter_9999")
+
+    def test_short_names(self):
+        @lp.short_names(x="-z")
+        def lol():
+            return 1
+
+        self.assertEqual(lol.lp_settings, {"short_names": (("x", "z"),)})
+        self.assertEqual(lp.SHORT_NAMES, {})
+
+        def func(x: int, xa: int):
+            return x
+
+        parser = lp.Lazyparser(func, {}, lp.Config(short_names=(("x", "z"),)))
+        self.assertEqual(parser.args["x"].short_name, "z")
+        self.assertEqual(parser.args["xa"].short_name, "x")
+        for names in [{"x": "h"}, {"x": "y", "xa": "y"}, {"x": ""}]:
+            with (
+                self.subTest(names=names),
+                mock.patch.object(lp, "message", side_effect=SystemExit),
+            ):
+                self.assertRaises(SystemExit, lp.set_short_names, names)
+        lp.set_short_names()
+
     def test_handled_type(self):
         for o in ["s", "m"]:
             self.assertTrue(lp.handled_type(str, o))
@@ -93,10 +165,9 @@ class TestFunction(unittest.TestCase):
             return None
 
         func = lp.epilog(epilog="Test")(lol)
-        _ = func()
-        self.assertEqual(lp.EPI, "Test")
-        func = lp.epilog(epilog=5)(lol)
-        self.assertRaises(SystemExit, func)
+        self.assertEqual(func.lp_settings, {"epilog": "Test"})
+        self.assertIsNone(lp.EPI)
+        self.assertRaises(SystemExit, lp.epilog(epilog=5), lol)
 
     def test_init_parser(self):
         lp.set_env(dict(tab=17))
@@ -176,6 +247,18 @@ class TestArgument(unittest.TestCase):
         self.assertEqual(arg.set_type(tuple[int, str]), tuple[int, str])
         self.assertRaises(SystemExit, arg.set_type, tuple[list, str])
 
+    def test_slots(self):
+        arg = lp.Argument("lol", 7, int)
+        self.assertFalse(hasattr(arg, "__dict__"))
+        self.assertRaises(AttributeError, setattr, arg, "lol", 1)
+        same = lp.Argument("lol", 7, int)
+        self.assertEqual(arg, same)
+        self.assertEqual(len({arg, same}), 1)
+        same.help = "another help"
+        self.assertNotEqual(arg, same)
+        self.assertNotEqual(arg, "lol")
+        self.assertEqual(lp.Argument.from_spec(arg.to_spec()), arg)
+
     def test_gfn(self):
         arg = lp.Argument("lol", 7, int)
         self.assertEqual(arg.gfn(), "'[bold cyan]--lol[/bold cyan]'")
@@ -277,6 +360,7 @@ class TestLazyparser(unittest.TestCase):
         dic = {"delim1": "", "delim2": ":", "header": "@Keyword", "tab": 12}
         lp.set_env(env=dic)
         desc = """Multiply x by yTake two number and multiply them."""
+        parser = lp.Lazyparser(func, {})
         self.assertEqual(parser.description().replace("\n", ""), desc)
 
     def test_update_param(self):
@@ -319,6 +403,67 @@ class TestLazyparser(unittest.TestCase):
         )
         lp.set_env(dict(delim1="", tb=12))
 
+    def test_google_docstring(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=12))
+
+        def func(x: int, y: float = 1.0):
+            """
+            Multiply x by y.
+
+            Args:
+                x (int): a number x with
+                    a long description
+                y: a number y
+
+            Returns:
+                the product
+            """
+            return x * y
+
+        parser = lp.Lazyparser(func, {})
+        self.assertEqual(parser.help, "Multiply x by y.\n")
+        self.assertEqual(
+            parser.args["x"].help, "a number x with a long description"
+        )
+        self.assertEqual(parser.args["y"].help, "a number y")
+
+    def test_numpy_docstring(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=12))
+
+        def func(x: int, y: float = 1.0, z: float = 2.0):
+            """
+            Multiply x by y.
+
+            Parameters
+            ----------
+            x : int
+                a number x
+            y, z : float
+                a number
+
+            Returns
+            -------
+            float
+                the product
+            """
+            return x * y
+
+        parser = lp.Lazyparser(func, {})
+        self.assertEqual(parser.help, "Multiply x by y.\n")
+        self.assertEqual(parser.args["x"].help, "a number x")
+        self.assertEqual(parser.args["y"].help, "a number")
+        self.assertEqual(parser.args["z"].help, "a number")
+
+    def test_parse_docstring_size(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        doc = "Description\n\n" + "\n".join(
+            f"    :param p{i}: parameter {i}" for i in range(5000)
+        )
+        desc, params = lp.parse_docstring(doc)
+        self.assertEqual(desc, "Description\n")
+        self.assertEqual(len(params), 5000)
+        self.assertEqual(params["p4999"], "parameter 4999")
+
     def test_set_constrain(self):
         lp.set_env(dict(delim1=":param", delim2=":", header="", tab=12))
 
@@ -334,7 +479,6 @@ class TestLazyparser(unittest.TestCase):
         self.assertRaises(SystemExit, parser.set_constrain, {"x": tuple[int]})
 
     def test_set_version(self):
-        @lp.version(0.5)
         @lp.standalone(False)
         @lp.parse()
         def multiply(x: int, y: int):
@@ -347,10 +491,7 @@ class TestLazyparser(unittest.TestCase):
             """
             return x * y
 
-        import sys
-
-        sys.argv = ["xx", "-x", "7", "-y", "8"]
-        self.assertRaises(SystemExit, multiply)
+        self.assertRaises(SystemExit, lp.version(0.5), multiply)
 
     def test_set_version2(self):
         @lp.version("0.5")
@@ -370,7 +511,9 @@ class TestLazyparser(unittest.TestCase):
 
         sys.argv = ["xx", "-x", "7", "-y", "8"]
         _ = multiply()
-        self.assertEqual(lp.PROG_VERSION, "0.5")
+        config = multiply.compiled[lp.env_key()].lp.config
+        self.assertEqual(config.version, "0.5")
+        self.assertIsNone(lp.PROG_VERSION)
 
     def test_parse2(self):
         @lp.version("0.2")
@@ -390,3 +533,1830 @@ class TestLazyparser(unittest.TestCase):
 
         sys.argv = ["xx", "--help"]
         self.assertEqual(multiply(), 0)
+
+    def test_compiled_once(self):
+        @lp.standalone(False)
+        @lp.parse()
+        def multiply(x: int, y: int = 2):
+            """
+            Multiply a by b.
+
+            :param x: a number x
+            :param y: a number y
+            """
+            return x * y
+
+        sys.argv = ["xx", "-x", "7"]
+        self.assertEqual(multiply(), 14)
+        compiled, *others = multiply.compiled.values()
+        self.assertEqual(others, [])
+        cmd = compiled.command
+        nb_params = len(cmd.params)
+        for i in range(10):
+            sys.argv = ["xx", "-x", str(i), "-y", "3"]
+            self.assertEqual(multiply(), i * 3)
+            sys.argv = ["xx", "--x=%s" % i, "-y", "a"]
+            self.assertRaises(lp.click.BadParameter, multiply)
+        self.assertEqual(len(multiply.compiled), 1)
+        self.assertIs(multiply.compiled[lp.env_key()], compiled)
+        self.assertIs(compiled.command, cmd)
+        self.assertEqual(len(cmd.params), nb_params)
+        self.assertFalse(hasattr(multiply.__wrapped__, "__click_params__"))
+
+    def test_compiled_by_env(self):
+        @lp.parse()
+        def multiply(x: int, y: int = 2):
+            return x * y
+
+        multiply = lp.standalone(False)(multiply)
+        sys.argv = ["xx", "-x", "7"]
+        self.assertEqual(multiply(), 14)
+        lp.EPI = "Compiled"
+        self.assertEqual(multiply(), 14)
+        self.assertEqual(len(multiply.compiled), 2)
+        lp.EPI = None
+
+    def test_spec(self):
+        def func(x: int, y: tuple[float, ...] = (1.0, 2), z: bool = False):
+            """
+            Do something.
+
+            :param x: a number x
+            """
+            return x
+
+        parser = lp.Lazyparser(func, {})
+        spec = parser.to_spec()
+        self.assertEqual(lp.Lazyparser.from_spec(func, spec, {}), parser)
+
+        def func2(x: int = lp.Argument):
+            return x
+
+        self.assertRaises(TypeError, lp.Lazyparser(func2, {}).to_spec)
+
+    def test_disk_cache(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=12))
+
+        def func(x: int, y: float = 2.5):
+            """
+            Do something.
+
+            :param x: a number x
+            """
+            return x
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(lp, "CACHE_DIR", tmp),
+        ):
+            click_type = {"x": lp.click.IntRange(0, 10)}
+            parser = lp.cached_parser(func, click_type)
+            path = lp.spec_path(tmp, lp.spec_key(func))
+            self.assertTrue(os.path.isfile(path))
+            self.assertNotIn("<", os.path.basename(path))
+            with (
+                mock.patch.object(lp.Lazyparser, "init_args") as init_args,
+                mock.patch.object(lp.Lazyparser, "update_param") as update,
+                mock.patch.object(lp.Lazyparser, "get_short_name") as short,
+            ):
+                warm = lp.cached_parser(func, click_type)
+            init_args.assert_not_called()
+            update.assert_not_called()
+            short.assert_not_called()
+            self.assertEqual(warm, parser)
+            self.assertEqual(warm.args["x"].help, "a number x")
+            with open(path, "w") as f:
+                f.write("{corrupt")
+            self.assertEqual(lp.cached_parser(func, click_type), parser)
+            self.assertIsNotNone(lp.load_spec(path, lp.spec_key(func)))
+            func.__doc__ = "Do something else."
+            self.assertNotEqual(lp.spec_path(tmp, lp.spec_key(func)), path)
+
+    def test_disk_cache_eviction(self):
+        def func1(x):
+            return x
+
+        def func2(x):
+            return x
+
+        def func3(x):
+            return x
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            mock.patch.object(lp, "CACHE_DIR", tmp),
+            mock.patch.object(lp, "CACHE_SIZE", 2),
+        ):
+            with open(os.path.join(tmp, "user.json"), "w"):
+                pass
+            for i, func in enumerate([func1, func2, func1, func3]):
+                lp.cached_parser(func, {})
+                path = lp.spec_path(tmp, lp.spec_key(func))
+                os.utime(path, ns=(i, i))
+            kept = [lp.spec_path("", lp.spec_key(f)) for f in [func1, func3]]
+            self.assertEqual(
+                sorted(os.listdir(tmp)), sorted(kept + ["user.json"])
+            )
+
+    def test_set_cache(self):
+        def func():
+            return None
+
+        self.assertEqual(
+            lp.cache("/tmp/lazyparser", size=3)(func).lp_settings,
+            {"cache_dir": "/tmp/lazyparser", "cache_size": 3},
+        )
+        self.assertEqual(
+            lp.cache()(func).lp_settings, {"cache_dir": lp.user_cache_dir()}
+        )
+        self.assertEqual(
+            lp.cache(None, 256)(func).lp_settings,
+            {"cache_dir": None, "cache_size": 256},
+        )
+        self.assertIsNone(lp.CACHE_DIR)
+        self.assertRaises(SystemExit, lp.cache(size=0), func)
+
+
+class TestConfig(unittest.TestCase):
+    def test_config(self):
+        import dataclasses
+
+        config = lp.Config(version="1.0", groups=(("Main", ("x", "help")),))
+        self.assertRaises(
+            dataclasses.FrozenInstanceError, setattr, config, "tab", 8
+        )
+        self.assertEqual(config.forbidden, ("help", "h", "version"))
+        self.assertEqual(config.optional_title, "Main")
+        self.assertEqual(config.replace(tab=8).tab, 8)
+        self.assertEqual(config.tab, 4)
+        self.assertEqual(lp.Config().optional_title, "Optional arguments")
+        for bad in [{"delim2": " "}, {"tab": "4"}, {"cache_size": 0}]:
+            with self.subTest(bad=bad):
+                self.assertRaises(SystemExit, lp.Config, **bad)
+
+    def test_decorator_order(self):
+        def func(x: int):
+            """
+            Double x.
+
+            - x -- a number x
+            """
+            return x * 2
+
+        above = lp.docstrings(delim1="-", delim2="--")(
+            lp.standalone(False)(lp.parse(func))
+        )
+        below = lp.parse(
+            lp.docstrings(delim1="-", delim2="--")(lp.standalone(False)(func))
+        )
+        outer = lp.standalone(True)(lp.standalone(False)(lp.parse(func)))
+        for f in [above, below, outer]:
+            with self.subTest(f=f):
+                self.assertEqual(
+                    f.lp_settings,
+                    {"delim1": "-", "delim2": "--", "standalone": False}
+                    if f is not outer
+                    else {"standalone": False},
+                )
+        sys.argv = ["xx", "-x", "4"]
+        self.assertEqual(above(), 8)
+        self.assertEqual(below(), 8)
+        self.assertEqual(
+            above.compiled[lp.env_key()].lp.args["x"].help, "a number x"
+        )
+        self.assertEqual(lp.PD1, ":param")
+
+    def test_concurrent(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        lp.set_groups()
+        defaults = lp.env_key()
+
+        def make(i):
+            namespace = {}
+            exec(
+                textwrap.dedent(
+                    f'''
+                    def func_{i}(value_{i}: int, other: float = {i}.5):
+                        """
+                        Function {i}.
+
+                        @{i} value_{i} = value number {i}
+                        """
+                        return value_{i}
+                    '''
+                ),
+                namespace,
+            )
+            func = lp.parse(namespace[f"func_{i}"])
+            func = lp.docstrings(delim1=f"@{i}", delim2="=")(func)
+            func = lp.short_names(**{f"value_{i}": f"v{i}"})(func)
+            func = lp.epilog(f"Epilog {i}")(func)
+            if i % 2:
+                func = lp.version(f"{i}.0")(func)
+            if i % 3:
+                func = lp.groups(**{f"Group {i}": [f"value_{i}"]})(func)
+            return func
+
+        def run(i):
+            func = make(i)
+            values = lp.parse_args(func, [f"-v{i}", str(i)])
+            parser = func.compiled[lp.env_key()].lp
+            cmd = lp.build_command(parser, parser.func)
+            groups = parser.create_click_group()["*"]
+            return (
+                values,
+                parser.args[f"value_{i}"].help,
+                parser.args[f"value_{i}"].short_name,
+                cmd.epilog,
+                "version" in parser.args,
+                sorted(g["name"] for g in groups),
+            )
+
+        expected = {
+            i: (
+                {f"value_{i}": i, "other": i + 0.5},
+                f"value number {i}",
+                f"v{i}",
+                f"Epilog {i}",
+                bool(i % 2),
+                sorted(
+                    [f"Group {i}" if i % 3 else "Required arguments"]
+                    + ["Optional arguments"]
+                ),
+            )
+            for i in range(300)
+        }
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = dict(zip(range(300), pool.map(run, range(300))))
+        self.assertEqual(results, expected)
+        self.assertEqual(lp.env_key(), defaults)
+
+
+class TestFastParser(unittest.TestCase):
+    @staticmethod
+    def func(
+        name: str,
+        x: int,
+        ratio: float = 0.5,
+        verbose: bool = False,
+        pair: tuple[int, str] = (1, 2),
+        values: tuple[float, ...] = (1, 2),
+        labels: tuple[str, ...] = None,
+        lower: str = 5,
+    ):
+        return dict(locals())
+
+    # command lines handled by the fast path
+    CORPUS = [
+        ["--name", "a", "--x", "1"],
+        ["-n", "a", "-x", "-1"],
+        ["--name=a=b", "--x=2"],
+        ["-n", "", "-x", " 3 ", "-r", "1e3", "-V"],
+        ["-n", "a", "-x", "1", "--verbose", "--verbose"],
+        ["-n", "a", "-x", "1", "-x", "2", "-n", "b"],
+        ["-n", "-x", "-x", "1", "-p", "3", "c"],
+        ["-n", "a", "-x", "1", "-v", "1", "--values", "inf", "-v", "3"],
+        ["-n", "a", "-x", "1", "-l", "u", "-l", "--help"],
+        ["-n", "a", "-x", "1_000", "-L", "--", "-r", "-.5"],
+        ["-n", "a", "-x", "1", "--lower=", "--labels=v"],
+    ]
+    # command lines left to click
+    FALLBACK = [
+        ["-n", "a"],
+        ["-n", "a", "-x", "a"],
+        ["-n", "a", "-x", "1", "extra"],
+        ["-n", "a", "-x", "1", "--unknown", "1"],
+        ["-n", "a", "-x", "1", "-p", "1"],
+        ["-n", "a", "-x", "1", "-p", "a", "b"],
+        ["-n", "a", "-x", "1", "-V=1"],
+        ["-n", "a", "-x", "1", "--verbose=1"],
+        ["-n", "a", "-x1"],
+        ["-n", "a", "-x", "1", "-r"],
+        ["-n", "a", "-x", "1", "--"],
+        ["-h"],
+        ["-n", "a", "-x", "1", "--help"],
+    ]
+
+    def test_supports(self):
+        parser = lp.Lazyparser(self.func, {})
+        self.assertTrue(lp.FastParser.supports(parser))
+        for atype, default in [
+            (tuple[int], (1,)),
+            (tuple, (1, 2)),
+            (int, "a"),
+            (tuple[int, int], (1,)),
+        ]:
+
+            def func(a: atype = default):
+                return a
+
+            parser = lp.Lazyparser(func, {})
+            self.assertFalse(lp.FastParser.supports(parser))
+        parser = lp.Lazyparser(self.func, {"x": lp.click.IntRange(0, 5)})
+        self.assertFalse(lp.FastParser.supports(parser))
+
+    def test_same_results(self):
+        parser = lp.Lazyparser(self.func, {})
+        fast = lp.FastParser(parser)
+        cmd = lp.build_command(parser, self.func)
+        for argv in self.CORPUS:
+            with self.subTest(argv=argv):
+                expected = cmd.main(argv, "xx", standalone_mode=False)
+                self.assertEqual(fast.parse(argv), expected)
+        for argv in self.FALLBACK:
+            with self.subTest(argv=argv):
+                self.assertIsNone(fast.parse(argv))
+
+    def test_fallback(self):
+        @lp.standalone(False)
+        @lp.parse(x=lp.click.IntRange(0, 5))
+        def func(x: int):
+            return x
+
+        sys.argv = ["xx", "-x", "3"]
+        self.assertEqual(func(), 3)
+        self.assertIsNone(func.compiled[lp.env_key()].fast)
+
+        @lp.standalone(True)
+        @lp.parse
+        def func2(x: int):
+            return x
+
+        sys.argv = ["xx", "-x", "3"]
+        with self.assertRaises(SystemExit) as exit_code:
+            func2()
+        self.assertEqual(exit_code.exception.code, 0)
+        self.assertIsNotNone(func2.compiled[lp.env_key()].fast)
+
+
+class TestTracer(unittest.TestCase):
+    def test_disabled(self):
+        self.assertIsNone(lp.TRACER)
+        for owner, attr, _ in lp.Tracer.targets():
+            self.assertFalse(hasattr(getattr(owner, attr), "__wrapped__"))
+
+    def test_trace(self):
+        import tracemalloc
+
+        @lp.standalone(False)
+        @lp.parse
+        def multiply(x: int, y: int = 2):
+            return x * y
+
+        tracing = tracemalloc.is_tracing()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "trace.json")
+            with lp.trace(output) as tracer:
+                self.assertIs(lp.TRACER, tracer)
+                sys.argv = ["xx", "-x", "3"]
+                self.assertEqual(multiply(), 6)
+                sys.argv = ["xx", "-x", "a"]
+                self.assertRaises(lp.click.BadParameter, multiply)
+            with open(output) as f:
+                events = json.load(f)["traceEvents"]
+        phases = {e["name"] for e in events}
+        for phase in [
+            "signature",
+            "init_args",
+            "get_short_name",
+            "fast.parse",
+            "build_command",
+            "click.parse",
+        ]:
+            self.assertIn(phase, phases)
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertIn("fast.parse", tracer.summary())
+        self.assertIsNone(lp.TRACER)
+        self.assertEqual(tracemalloc.is_tracing(), tracing)
+        self.test_disabled()
+
+    def test_trace_from_env(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "trace.json")
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "import lazyparser as lp; lp.Lazyparser(lambda x: x, {})",
+                ],
+                env=os.environ | {"LAZYPARSER_TRACE": output},
+                check=True,
+            )
+            with open(output) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertIn("init_args", [e["name"] for e in events])
+
+
+class TestImport(unittest.TestCase):
+    # maximal cumulative import time of lazyparser in microseconds
+    IMPORT_BUDGET = 150_000
+
+    def importtime(self, code):
+        """Run ``code`` with -X importtime and return the imported modules."""
+        res = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", textwrap.dedent(code)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        modules = {}
+        for line in res.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit():
+                    modules[name.strip()] = int(cumulative)
+        return res.stdout, modules
+
+    def test_import_budget(self):
+        out, modules = self.importtime(
+            """
+            import sys
+            import lazyparser
+            print(sorted({"click", "rich_click", "rich"} & set(sys.modules)))
+            """
+        )
+        self.assertEqual(out.strip(), "[]")
+        self.assertLess(modules["lazyparser"], self.IMPORT_BUDGET)
+        for heavy in ["click", "rich", "pygments", "markdown_it", "tempfile"]:
+            self.assertNotIn(heavy, modules)
+
+    def test_parse_without_rich(self):
+        out, modules = self.importtime(
+            """
+            import sys
+            import lazyparser as lp
+
+            @lp.standalone(False)
+            @lp.parse
+            def multiply(x: int, y: float = 2.0, z: bool = False):
+                return x * y
+
+            sys.argv = ["xx", "-x", "3", "-z"]
+            print(multiply())
+            """
+        )
+        self.assertEqual(out.strip(), "6.0")
+        for heavy in ["click", "rich", "pygments", "markdown_it"]:
+            self.assertNotIn(heavy, modules)
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        self.argv = sys.argv
+        self.addCleanup(setattr, sys, "argv", self.argv)
+
+    def test_result(self):
+        import asyncio
+
+        async def double(x: int, delay: float = 0):
+            """
+            Double x.
+
+            :param x: a number x
+            """
+            await asyncio.sleep(delay)
+            return x * 2
+
+        func = lp.standalone(False)(lp.parse(double))
+        for argv in [["xx", "-x", "3"], ["xx", "-x", "3", "-d", "0.001"]]:
+            with self.subTest(argv=argv):
+                sys.argv = argv
+                self.assertEqual(func(), 6)
+        sys.argv = ["xx", "-x", "3"]
+        with self.assertRaises(SystemExit) as cm:
+            lp.standalone(True)(lp.parse(double))()
+        self.assertEqual(cm.exception.code, 0)
+
+    def test_event_loop(self):
+        import asyncio
+
+        class Policy(asyncio.DefaultEventLoopPolicy):
+            loops = []
+
+            def new_event_loop(self):
+                loop = super().new_event_loop()
+                self.loops.append(loop)
+                return loop
+
+        async def current(x: int):
+            return asyncio.get_running_loop()
+
+        func = lp.standalone(False)(lp.parse(current))
+        sys.argv = ["xx", "-x", "3"]
+        loop = lp.event_loop(Policy())(func)()
+        self.assertEqual(Policy.loops, [loop])
+        self.assertTrue(loop.is_closed())
+        self.assertNotIsInstance(asyncio.get_event_loop_policy(), Policy)
+        # uvloop is used when it is installed, asyncio otherwise
+        loop = lp.event_loop(uvloop=True)(func)()
+        self.assertTrue(loop.is_closed())
+        self.assertNotIn(loop, Policy.loops)
+        self.assertRaises(SystemExit, lp.event_loop(policy=5), func)
+
+    def test_interrupt(self):
+        import asyncio
+        import signal
+
+        cleaned = []
+
+        @lp.standalone(False)
+        @lp.parse
+        async def serve(x: int):
+            try:
+                signal.raise_signal(signal.SIGINT)
+                await asyncio.sleep(10)
+            finally:
+                cleaned.append(x)
+
+        sys.argv = ["xx", "-x", "3"]
+        self.assertRaises(KeyboardInterrupt, serve)
+        self.assertEqual(cleaned, [3])
+
+
+class TestParseArgs(unittest.TestCase):
+    def setUp(self):
+        import click
+
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+
+        @lp.version("1.0")
+        @lp.parse(mode=click.Choice(["fast", "slow"]))
+        def func(x: int, y: float = 1.5, mode: str = "fast"):
+            """
+            :param x: a number x
+            """
+            raise AssertionError("func must not be called")
+
+        self.func = func
+        self.argv = list(sys.argv)
+
+    def test_values(self):
+        self.assertEqual(
+            dict(lp.parse_args(self.func, ["-x", "2"])),
+            {"x": 2, "y": 1.5, "mode": "fast"},
+        )
+        self.assertEqual(
+            dict(lp.parse_args(self.func, ["-x", "2", "--mode", "slow"])),
+            {"x": 2, "y": 1.5, "mode": "slow"},
+        )
+        self.assertEqual(sys.argv, self.argv)
+
+    def test_errors(self):
+        with mock.patch("builtins.print") as mprint:
+            for argv, param in [
+                (["-x", "a"], "x"),
+                ([], "x"),
+                (["-x", "1", "--mode", "medium"], "mode"),
+                (["-x", "1", "--unknown"], None),
+            ]:
+                with self.subTest(argv=argv):
+                    with self.assertRaises(lp.UsageError) as cm:
+                        lp.parse_args(self.func, argv)
+                    self.assertEqual(cm.exception.param, param)
+            for argv in [["-h"], ["-x", "1", "--version"]]:
+                with self.subTest(argv=argv):
+                    self.assertRaises(
+                        lp.HelpRequested, lp.parse_args, self.func, argv
+                    )
+
+            @lp.parse
+            def loud(x: int = 1, verbose: bool = False):
+                return x
+
+            self.assertRaises(lp.HelpRequested, lp.parse_args, loud, ["-vh"])
+            for argv in [["-x1h"], ["-vx", "-h"], ["-x", "-vh"]]:
+                with self.subTest(argv=argv):
+                    self.assertRaises(
+                        lp.UsageError, lp.parse_args, loud, argv
+                    )
+
+            @lp.parse
+            def bad(x: list):
+                return x
+
+            with self.assertRaises(lp.DefinitionError) as cm:
+                lp.parse_args(bad, ["-x", "1"])
+            self.assertEqual(cm.exception.param, "x")
+        mprint.assert_not_called()
+
+    def test_memory(self):
+        import tracemalloc
+
+        @lp.parse
+        def func(x: int, y: float = 1.5):
+            return x * y
+
+        lp.parse_args(func, ["-x", "2"])
+        tracemalloc.start()
+        try:
+            for i in range(5000):
+                lp.parse_args(func, ["-x", str(i)])
+            before = tracemalloc.get_traced_memory()[0]
+            for i in range(5000):
+                lp.parse_args(func, ["-x", str(i)])
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(after - before, 10000)
+
+
+@lp.standalone(False)
+@lp.parse
+def scale(x: int, factor: float = 2.0, tags: tuple[str, ...] = ()):
+    """
+    Scale a number, used by the batches run in several processes that \
+    need a function importable by its name.
+
+    :param x: the number
+    :param factor: the factor
+    :param tags: some tags
+    """
+    if x < 0:
+        raise ValueError("x must be positive")
+    return x * factor, len(tags)
+
+
+class TestBatch(unittest.TestCase):
+    lines = [
+        "-x 1",
+        "",
+        "# a comment",
+        '["-x", "2", "--factor", "0.5"]',
+        '{"x": 3, "tags": ["a", "b"]}',
+        "-x 'one'",
+        "-x -1",
+        "{x}",
+    ]
+
+    def test_records(self):
+        records = list(lp.batch(scale, self.lines))
+        self.assertEqual([r["line"] for r in records], [1, 4, 5, 6, 7, 8])
+        self.assertEqual(
+            [r.get("result") for r in records[:3]],
+            [(2.0, 0), (1.0, 0), (6.0, 2)],
+        )
+        self.assertEqual(
+            records[2]["argv"], ["--x", "3", "--tags", "a", "--tags", "b"]
+        )
+        self.assertEqual(
+            [(r["error"]["type"], r["error"]["param"]) for r in records[3:]],
+            [
+                ("UsageError", "x"),
+                ("ValueError", None),
+                ("JSONDecodeError", None),
+            ],
+        )
+        self.assertEqual(records[4]["error"]["message"], "x must be positive")
+
+    def test_errors(self):
+        @lp.parse
+        def bad(x: list):
+            return x
+
+        self.assertRaises(lp.DefinitionError, lp.batch, bad, ["-x 1"])
+        self.assertRaises(ValueError, lp.batch, scale, ["-x 1"], 0)
+
+    def test_workers(self):
+        lines = [f"-x {i}" if i % 7 else "-x -1" for i in range(200)]
+        expected = list(lp.batch(scale, lines))
+        self.assertEqual(list(lp.batch(scale, lines, workers=3)), expected)
+        self.assertEqual([r["line"] for r in expected], list(range(1, 201)))
+
+    def test_read_ahead(self):
+        read = []
+
+        def lines():
+            for i in itertools.count(1):
+                read.append(i)
+                yield f"-x {i}"
+
+        records = lp.batch(scale, lines(), workers=2)
+        self.assertEqual(next(records)["result"], (2.0, 0))
+        self.assertLessEqual(len(read), (2 * 2 + 2) * lp.BATCH_CHUNK)
+        records.close()
+
+    def test_paths_checked_once(self):
+        import click
+
+        @lp.check_paths(deferred=True)
+        @lp.parse(paths=click.Path(exists=True))
+        def func(paths: tuple[str, ...] = ()):
+            return paths
+
+        (record,) = lp.batch(func, ["-p . -p missing"])
+        self.assertEqual(record["result"].paths, (".", "missing"))
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            script = os.path.join(tmp, "double.py")
+            with open(script, "w") as f:
+                f.write(
+                    textwrap.dedent(
+                        f"""
+                        import sys
+                        sys.path.insert(0, {os.getcwd()!r})
+                        import lazyparser as lp
+
+                        @lp.parse
+                        def double(x: int):
+                            return 2 * x
+
+                        double()
+                        """
+                    )
+                )
+            for args in [[], ["--lazyparser-workers", "2"]]:
+                with self.subTest(args=args):
+                    res = subprocess.run(
+                        [sys.executable, script, "--lazyparser-batch", "-"]
+                        + args,
+                        input="-x 1\n-x a\n-x 3\n",
+                        capture_output=True,
+                        text=True,
+                    )
+                    self.assertEqual(res.returncode, 1)
+                    records = [json.loads(v) for v in res.stdout.splitlines()]
+                    self.assertEqual(records[0]["result"], 2)
+                    self.assertEqual(records[1]["error"]["param"], "x")
+                    self.assertEqual(records[2]["result"], 6)
+
+
+class TestSweep(unittest.TestCase):
+    argv = ["-x", "1", "-x", "-1", "--factor", "2", "--factor", "3"]
+
+    def run_sweep(self, func, argv):
+        with mock.patch.object(sys, "argv", ["prog"] + argv):
+            return func()
+
+    def test_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "sweep.csv")
+            func = lp.sweep("x", "factor", output=output)(scale)
+            rows = self.run_sweep(func, self.argv + ["--tags", "a"])
+            self.assertEqual(
+                [(r["x"], r["factor"], r["result"]) for r in rows],
+                [(1, 2.0, (2.0, 1)), (1, 3.0, (3.0, 1)), (-1, 2.0, None)]
+                + [(-1, 3.0, None)],
+            )
+            self.assertEqual(
+                rows[2]["error"], "ValueError: x must be positive"
+            )
+            self.assertTrue(all(r["wall_time"] >= 0 for r in rows))
+            self.assertEqual(rows[0]["tags"], ("a",))
+            argv = self.argv + ["-x", "2", "--tags", "a"]
+            rows = self.run_sweep(func, argv)
+            self.assertEqual(
+                [(r["x"], r["factor"]) for r in rows],
+                [(-1, 2.0), (-1, 3.0), (2, 2.0), (2, 3.0)],
+            )
+            rows = self.run_sweep(func, argv[:-1] + ["b"])
+            self.assertEqual(len(rows), 6)
+            with open(output) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[0], "x,factor,tags,wall_time,result,error")
+            self.assertEqual(len(lines), 15)
+
+    def test_workers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "sweep.jsonl")
+            func = lp.sweep("x", "factor", workers=2, output=output)(scale)
+            rows = self.run_sweep(func, self.argv)
+            with mock.patch("sys.stdout"):
+                expected = self.run_sweep(
+                    lp.sweep("x", "factor")(scale), self.argv
+                )
+            self.assertEqual(
+                [(r["x"], r["factor"], r["error"]) for r in rows],
+                [(r["x"], r["factor"], r["error"]) for r in expected],
+            )
+            with open(output) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual(len(records), 4)
+            rows = self.run_sweep(func, self.argv)
+            self.assertEqual(
+                [(r["x"], r["factor"]) for r in rows], [(-1, 2.0), (-1, 3.0)]
+            )
+
+    def test_lazy_values(self):
+        kept = []
+
+        @lp.standalone(False)
+        @lp.sweep("x")
+        @lp.parse(src=lp.File())
+        def head(x: int, src: str):
+            kept.append(src)
+            src.seek(0)
+            return src.read(x)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.txt")
+            with open(path, "w") as f:
+                f.write("abc")
+            with mock.patch("sys.stdout"):
+                rows = self.run_sweep(head, ["-x", "1", "-x", "2", "-s", path])
+        self.assertEqual([r["result"] for r in rows], ["a", "ab"])
+        self.assertIs(kept[0], kept[1])
+        self.assertTrue(kept[0]._file.closed)
+
+    def test_paths(self):
+        import click
+
+        @lp.standalone(False)
+        @lp.sweep("x")
+        @lp.parse(paths=click.Path(exists=True))
+        def func(x: int, paths: tuple[str, ...] = ()):
+            return x, paths
+
+        argv = ["-x", "1", "-x", "2", "-p", ".", "-p", __file__]
+        with mock.patch.object(lp, "bulk_paths", wraps=lp.bulk_paths) as bulk:
+            with mock.patch("sys.stdout"):
+                rows = self.run_sweep(func, argv)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(bulk.call_count, 1)
+
+    def test_errors(self):
+        with mock.patch("builtins.print"):
+            self.assertRaises(
+                lp.DefinitionError, lp.parse_args, lp.sweep("y")(scale), []
+            )
+            self.assertRaises(SystemExit, lp.sweep("x", workers=0), scale)
+
+
+class TestConfigFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        lp.DEFAULTS.clear()
+
+        @lp.config_file(pyproject="prog")
+        @lp.parse
+        def func(
+            x: int = 1,
+            name: str = "a",
+            tags: tuple[str, ...] = (),
+            verbose: bool = False,
+        ):
+            return x
+
+        self.func = func
+        with open("pyproject.toml", "w") as f:
+            f.write('[tool.prog]\nx = 4\nname = "toml"\n')
+        with open("defaults.json", "w") as f:
+            json.dump({"name": "json", "tags": ["u", "v"], "verbose": True}, f)
+
+    def test_precedence(self):
+        for argv, expected in [
+            ([], (4, "toml", (), False)),
+            (["--config", "defaults.json"], (4, "json", ("u", "v"), True)),
+            (
+                ["--config=defaults.json", "-x", "2", "--tags", "w"],
+                (2, "json", ("w",), True),
+            ),
+            (
+                ["--tags", "-n", "--config", "defaults.json", "-vx3"],
+                (3, "json", ("-n",), True),
+            ),
+        ]:
+            with self.subTest(argv=argv):
+                values = lp.parse_args(self.func, argv)
+                self.assertEqual(
+                    tuple(values[k] for k in ["x", "name", "tags", "verbose"]),
+                    expected,
+                )
+        with open("defaults.json", "w") as f:
+            json.dump({"x": "four"}, f)
+        with self.assertRaises(lp.UsageError) as cm:
+            lp.parse_args(self.func, ["--config", "defaults.json"])
+        self.assertEqual(cm.exception.param, "x")
+        self.assertRaises(
+            lp.DefinitionError,
+            lp.parse_args,
+            self.func,
+            ["--config", "missing.json"],
+        )
+
+    def test_cache(self):
+        import tomllib
+
+        config = lp.Config(cache_dir=os.path.join(self.tmp.name, "cache"))
+        section = ("tool", "prog")
+        values = lp.load_defaults("pyproject.toml", config, section)
+        self.assertEqual(values, {"x": 4, "name": "toml"})
+        lp.DEFAULTS.clear()
+        with mock.patch.object(tomllib, "load") as load:
+            self.assertEqual(
+                lp.load_defaults("pyproject.toml", config, section), values
+            )
+            self.assertEqual(
+                lp.load_defaults("pyproject.toml", config, section), values
+            )
+            load.assert_not_called()
+        with open("pyproject.toml", "a") as f:
+            f.write("verbose = true\n")
+        self.assertEqual(
+            lp.load_defaults("pyproject.toml", config, section),
+            {"x": 4, "name": "toml", "verbose": True},
+        )
+
+    def test_forbidden(self):
+        @lp.config_file()
+        @lp.parse
+        def func(config: str = ""):
+            return config
+
+        with self.assertRaises(lp.DefinitionError):
+            lp.parse_args(func, [])
+
+
+class FilesTestCase(unittest.TestCase):
+    """
+    Base of the tests calling parsed functions with a command line and \
+    reading files of a temporary directory.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name=""):
+        return os.path.join(self.tmp.name, name)
+
+    def call(self, func, *argv):
+        with mock.patch.object(sys, "argv", ["prog", *argv]):
+            return func()
+
+
+class TestStream(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file = self.path("ids.txt")
+        with open(self.file, "w") as f:
+            f.write("".join(f"{i}\n" for i in range(1, 300001)))
+        self.total = 300000 * 300001 // 2
+
+        @lp.standalone(False)
+        @lp.stream("ids")
+        @lp.parse
+        def func(ids: tuple[int, ...] = (), names: tuple[str, ...] = ()):
+            return ids, names
+
+        self.func = func
+
+    def test_sources(self):
+        import gzip
+
+        ids, names = self.call(self.func, "-i", "3", "-n", "a")
+        self.assertIsInstance(ids, lp.Stream)
+        self.assertEqual((list(ids), names), ([3], ("a",)))
+        ids, _ = self.call(self.func, "-i", "0", "-i", f"@{self.file}")
+        self.assertEqual(sum(ids), self.total)
+        with gzip.open(f"{self.file}.gz", "wt") as f:
+            f.write("4\n\n5\n")
+        ids, _ = self.call(self.func, "-i", f"@{self.file}.gz")
+        self.assertEqual(list(ids), [4, 5])
+        with mock.patch("sys.stdin", io.StringIO("6\n7\n")):
+            ids, _ = self.call(self.func, "-i", "-")
+            self.assertEqual(list(ids), [6, 7])
+
+    def test_errors(self):
+        with open(self.file, "a") as f:
+            f.write("x\n8\n")
+        ids, _ = self.call(self.func, "-i", f"@{self.file}")
+        with self.assertRaises(ValueError) as cm:
+            sum(ids)
+        self.assertIn("'x'", str(cm.exception))
+        @lp.standalone(False)
+        @lp.stream("ids", errors="lenient")
+        @lp.parse
+        def lenient(ids: tuple[int, ...] = ()):
+            return ids, None
+
+        ids, _ = self.call(lenient, "-i", f"@{self.file}")
+        self.assertEqual(sum(ids), self.total + 8)
+        self.assertEqual(ids.skipped, 1)
+        with mock.patch("builtins.print"):
+            self.assertRaises(
+                SystemExit, self.call, self.func, "-i", "@missing"
+            )
+            for names in [("x",), ("y",)]:
+                self.assertRaises(
+                    lp.DefinitionError,
+                    lp.parse_args,
+                    lp.stream(*names)(lp.parse(lambda x=1: x)),
+                    [],
+                )
+
+    def test_close(self):
+        import gc
+        import gzip
+        import warnings
+
+        with gzip.open(f"{self.file}.gz", "wt") as f:
+            f.write("1\n2\n")
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            ids = lp.Stream("ids", [f"@{self.file}.gz"], int)
+            self.assertEqual(next(ids), 1)
+            ids.close()
+            self.assertEqual(list(ids), [])
+            self.assertEqual(lp.Array().convert(f"@{self.file}.gz")[1], 2)
+            gc.collect()
+        self.assertEqual(caught, [])
+
+    def test_memory(self):
+        import tracemalloc
+
+        ids, _ = self.call(self.func, "-i", f"@{self.file}")
+        tracemalloc.start()
+        try:
+            total = sum(ids)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(total, self.total)
+        self.assertLess(peak, 4_000_000)
+
+
+class TestHelpCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        env = mock.patch.dict(os.environ, {"LAZYPARSER_RENDERER": "rich"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def parsed(self, doc, size=256):
+        def func(x: int = 1):
+            return x
+
+        func.__doc__ = doc
+        cache = lp.cache(self.tmp.name, size=size)
+        return cache(lp.standalone(False)(lp.parse(func)))
+
+    def help(self, func, argv=("-h",)):
+        out = io.StringIO()
+        with mock.patch.object(sys, "argv", ["prog", *argv]):
+            with mock.patch("sys.stdout", out):
+                rv = func()
+        if argv == ("-h",):
+            self.assertEqual(rv, 0)
+        return out.getvalue()
+
+    def helps(self):
+        return [n for n in os.listdir(self.tmp.name) if n.endswith(".lphelp")]
+
+    def test_hit(self):
+        func = self.parsed("Some help.\n\n:param x: a number")
+        text = self.help(func)
+        self.assertIn("Some help.", text)
+        self.assertEqual(len(self.helps()), 1)
+        unused = property(lambda parser: self.fail("help rendered again"))
+        with mock.patch.object(lp.CompiledParser, "command", unused):
+            self.assertEqual(self.help(self.parsed(func.__doc__)), text)
+            self.assertEqual(self.help(func, ["-x", "2"]), "")
+        with mock.patch.dict(os.environ, {"COLUMNS": "50"}):
+            self.assertNotEqual(self.help(func), text)
+        self.assertEqual(len(self.helps()), 2)
+
+    def test_click_type(self):
+        import click
+
+        def parsed(exists):
+            def func(x: int = 1, out: str = "."):
+                return x
+
+            func.__doc__ = "Some help.\n\n:param out: a path"
+            func = lp.parse(func, out=click.Path(exists=exists))
+            return lp.cache(self.tmp.name)(lp.standalone(False)(func))
+
+        text = self.help(parsed(True))
+        unused = property(lambda parser: self.fail("help rendered again"))
+        with mock.patch.object(lp.CompiledParser, "command", unused):
+            self.assertEqual(self.help(parsed(True)), text)
+        self.help(parsed(False))
+        self.assertEqual(len(self.helps()), 2)
+
+    def test_invalidation(self):
+        text = self.help(self.parsed("Some help."))
+        other = self.help(self.parsed("Another help."))
+        self.assertIn("Another help.", other)
+        self.assertNotEqual(text, other)
+        self.assertEqual(len(self.helps()), 2)
+
+    def test_eviction(self):
+        with open(os.path.join(self.tmp.name, "notes.help"), "w"):
+            pass
+        self.help(self.parsed("Some help.", size=1))
+        self.help(self.parsed("Another help.", size=1))
+        self.assertEqual(len(self.helps()), 1)
+        self.assertIn("notes.help", os.listdir(self.tmp.name))
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        @lp.standalone(True)
+        @lp.groups(Main=["x"], Other=["help", "name"])
+        @lp.parse
+        def func(x: int, name: str = "a", flag: bool = False):
+            """
+            Do something.
+
+            :param x: a number
+            :param name: a name
+            """
+            return x
+
+        self.func = func
+
+    def render(self, backend, argv):
+        out, err = io.StringIO(), io.StringIO()
+        env = {"LAZYPARSER_RENDERER": backend}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch.object(sys, "argv", ["prog", *argv]):
+                with mock.patch("sys.stdout", out):
+                    with mock.patch("sys.stderr", err):
+                        try:
+                            self.func()
+                        except SystemExit:
+                            pass
+        return out.getvalue(), err.getvalue()
+
+    def test_choice(self):
+        with mock.patch.dict(os.environ, {"LAZYPARSER_RENDERER": ""}):
+            with mock.patch("sys.stdout", io.StringIO()):
+                self.assertEqual(lp.renderer(), "plain")
+            with mock.patch("sys.stdout") as stdout:
+                stdout.isatty.return_value = True
+                self.assertEqual(lp.renderer(), "rich")
+        with mock.patch.dict(os.environ, {"LAZYPARSER_RENDERER": "RICH"}):
+            self.assertEqual(lp.renderer(), "rich")
+
+    def test_help(self):
+        out, _ = self.render("plain", ["-h"])
+        self.assertTrue(
+            out.startswith("Usage: ")
+            and out.splitlines()[0].endswith(
+                "prog --x INTEGER [--flag] [--name TEXT]"
+            )
+        )
+        self.assertEqual(
+            out.splitlines()[1:],
+            [
+                "",
+                "  Do something.",
+                "",
+                "Main:",
+                "  -x, --x INTEGER  a number  [required]",
+                "",
+                "Other:",
+                "  -h, --help       Show this message and exit.",
+                "  -n, --name TEXT  a name  [default: a]",
+                "  -f, --flag       param flag",
+            ],
+        )
+        rich, _ = self.render("rich", ["-h"])
+        self.assertIn("─", rich)
+        self.assertNotIn("─", out)
+
+    def test_errors(self):
+        _, err = self.render("plain", ["-x", "a"])
+        self.assertIn("Error: Invalid value for '--x' / '-x'", err)
+        self.assertNotIn("─", err)
+        arg = lp.Argument("x", 1, int)
+        arg.short_name = "x"
+        with mock.patch.dict(os.environ, {"LAZYPARSER_RENDERER": "plain"}):
+            with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                lp.message("Default value changed", arg, "w")
+                self.assertRaises(SystemExit, lp.message, "Bad", None, "e")
+        self.assertEqual(
+            stderr.getvalue(),
+            "Warning: '--x' / '-x' Default value changed\nError: Bad\n",
+        )
+
+    def test_without_rich(self):
+        script = f"""
+            import sys
+            sys.path.insert(0, {os.getcwd()!r})
+            import lazyparser as lp
+
+            @lp.parse
+            def func(x: int = 1):
+                return x
+
+            sys.argv = ["prog", "-h"]
+            func()
+            """
+        res = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                textwrap.dedent(script),
+            ],
+            capture_output=True,
+            text=True,
+            env=os.environ | {"LAZYPARSER_RENDERER": "plain"},
+        )
+        self.assertIn("Usage: ", res.stdout)
+        self.assertNotRegex(res.stderr, r"\| +rich")
+
+
+class TestArray(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.file = self.path("values.txt")
+        with open(self.file, "w") as f:
+            f.write("".join(f"{i}, {i + 0.5}\n" for i in range(1000)))
+
+        @lp.standalone(False)
+        @lp.parse(x=lp.Array(low=0), n=lp.Array("i", high=9))
+        def func(x: str, n: str = "1 2"):
+            return x, n
+
+        self.func = func
+
+    def test_sources(self):
+        import array
+        import gzip
+
+        x, n = self.call(self.func, "-x", "1,2.5  3")
+        self.assertEqual(x, array.array("d", [1, 2.5, 3]))
+        self.assertEqual(n, array.array("i", [1, 2]))
+        self.assertIsNot(self.call(self.func, "-x", "1")[1], n)
+        self.assertIsNotNone(lp.compiled_parser(self.func).fast)
+        with mock.patch.object(lp, "STREAM_CHUNK", 7):
+            x, _ = self.call(self.func, "-x", f"@{self.file}")
+        self.assertEqual((len(x), sum(x)), (2000, 999500.0))
+        with gzip.open(f"{self.file}.gz", "wt") as f:
+            f.write("4\n5,6")
+        with mock.patch("sys.stdin", io.StringIO("7 8\n")):
+            x, n = self.call(
+                self.func, "-x", f"@{self.file}.gz", "-n", "-"
+            )
+        self.assertEqual((list(x), list(n)), ([4, 5, 6], [7, 8]))
+
+    def test_errors(self):
+        for argv, error in [
+            (["-x", "1,-2,-3"], "2 values are lower than 0"),
+            (["-x", "1", "-n", "10 1 12"], "2 values are greater than 9"),
+            (["-x", "1,a"], "invalid number"),
+            (["-x", "1", "-n", "1.5"], "invalid number"),
+            (["-x", "@missing"], "cannot read missing"),
+            (["-x", "1", "-n", str(1 << 40)], "for type code 'i'"),
+        ]:
+            with self.subTest(argv=argv):
+                with self.assertRaises(lp.UsageError) as cm:
+                    lp.parse_args(self.func, argv)
+                self.assertIn(error, str(cm.exception))
+        with mock.patch("builtins.print"):
+            self.assertRaises(SystemExit, lp.Array, "x")
+
+    def test_stdin_read_once(self):
+        called = []
+
+        @lp.standalone(True)
+        @lp.parse(x=lp.Array(low=0))
+        def func(x: str, n: int = 0):
+            called.append(x)
+
+        with mock.patch("sys.stdin", io.StringIO("1 2 -3\n")):
+            with mock.patch.dict(os.environ, {"LAZYPARSER_RENDERER": "plain"}):
+                with mock.patch("sys.stderr", io.StringIO()) as stderr:
+                    with self.assertRaises(SystemExit) as cm:
+                        self.call(func, "-x", "-", "-n", "1")
+        self.assertEqual((cm.exception.code, called), (2, []))
+        self.assertIn("1 values are lower than 0", stderr.getvalue())
+        with mock.patch("sys.stdin", io.StringIO("1 -2\n")):
+            with self.assertRaises(lp.UsageError) as cm:
+                lp.parse_args(func, ["-x", "-"])
+        self.assertIn("1 values are lower than 0", str(cm.exception))
+        self.assertIsNone(lp.LAZY_VALUES.get())
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("numpy"), "numpy is not installed"
+    )
+    def test_numpy(self):
+        import numpy
+
+        @lp.parse(x=lp.Array("l", numpy=True))
+        def func(x: str):
+            return x
+
+        x = lp.parse_args(func, ["-x", "1,2,3"])["x"]
+        self.assertIsInstance(x, numpy.ndarray)
+        self.assertEqual(x.tolist(), [1, 2, 3])
+
+
+class TestMappedFile(FilesTestCase):
+    def setUp(self):
+        import struct
+
+        super().setUp()
+        self.file = self.path("matrix.bin")
+        with open(self.file, "wb") as f:
+            f.write(b"head" + struct.pack("6d", *range(6)))
+
+    def test_view(self):
+        kept = []
+
+        @lp.standalone(False)
+        @lp.parse(m=lp.MappedFile("d", (2, 3), offset=4))
+        def func(m: str):
+            kept.extend([m, m.obj])
+            return m[1, 2], m.readonly, m.obj.closed
+
+        self.assertEqual(
+            self.call(func, "-m", self.file), (5.0, True, False)
+        )
+        self.assertRaises(ValueError, kept[0].tolist)
+        self.assertTrue(kept[1].closed)
+        func = lp.parse(lambda m: m, m=lp.MappedFile())
+        view = lp.parse_args(func, ["-m", self.file])["m"]
+        self.assertEqual(bytes(view[:4]), b"head")
+        lp.MappedFile().close(view)
+
+    def test_errors(self):
+        for mapped, path, error in [
+            (lp.MappedFile(), "missing", "missing is not a file"),
+            (lp.MappedFile(), self.tmp.name, "is not a file"),
+            (lp.MappedFile("d"), self.file, "52 bytes"),
+            (lp.MappedFile("d", (2, 2), 4), self.file, "shape (2, 2)"),
+        ]:
+            with self.subTest(error=error):
+                func = lp.parse(lambda m: m, m=mapped)
+                with self.assertRaises(lp.UsageError) as cm:
+                    lp.parse_args(func, ["-m", path])
+                self.assertIn(error, str(cm.exception))
+        with mock.patch("builtins.print"):
+            self.assertRaises(SystemExit, lp.MappedFile, "float64")
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("numpy"), "numpy is not installed"
+    )
+    def test_numpy(self):
+        import numpy
+
+        mapped = lp.MappedFile("float64", (2, 3), 4, numpy=True)
+        func = lp.parse(lambda m: m, m=mapped)
+        m = lp.parse_args(func, ["-m", self.file])["m"]
+        self.assertIsInstance(m, numpy.memmap)
+        self.assertEqual(m[1, 2], 5.0)
+        mapped.close(m)
+
+
+class TestFile(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.kept = []
+
+        @lp.standalone(False)
+        @lp.parse(src=lp.File(), dst=lp.File("w"), log=lp.File("a"))
+        def copy(src: str, dst: str = "-", log: str = "-", use: bool = False):
+            self.kept += [src, dst, log]
+            if use:
+                dst.writelines(line.upper() for line in src)
+            return src.opened, dst.opened
+
+        self.copy = copy
+
+    def test_lazy(self):
+        with open(self.path("a.txt"), "w") as f:
+            f.write("a\nb\n")
+        self.assertEqual(
+            self.call(self.copy, "-s", self.path("a.txt")), (False, False)
+        )
+        self.assertIsInstance(self.kept[0], lp.LazyFile)
+        with mock.patch("sys.stdout", io.StringIO()) as stdout:
+            self.call(self.copy, "-s", self.path("a.txt"), "-u")
+        self.assertEqual(stdout.getvalue(), "A\nB\n")
+        self.assertTrue(self.kept[3]._file.closed)
+        with mock.patch("sys.stdin", io.StringIO("c\n")):
+            self.call(self.copy, "-s", "-", "-d", self.path("b.txt"), "-u")
+        with open(self.path("b.txt")) as f:
+            self.assertEqual(f.read(), "C\n")
+
+    def test_compression(self):
+        with open(self.path("a.txt"), "w") as f:
+            f.write("x\n" * 1000)
+        for ext in (".gz", ".bz2", ".xz"):
+            with self.subTest(ext=ext):
+                dst = self.path(f"a{ext}")
+                self.call(
+                    self.copy, "-s", self.path("a.txt"), "-d", dst, "-u"
+                )
+                self.assertIsNotNone(self.kept[-2].compression)
+                os.replace(dst, self.path("copy"))
+                src = lp.File("rb").convert(self.path("copy"))
+                with src:
+                    self.assertEqual(src.read(), b"X\n" * 1000)
+                self.assertEqual(src.compression, self.kept[-2].compression)
+
+    def test_errors(self):
+        for argv, error in [
+            (["-s", self.path("missing")], "missing is not a file"),
+            (["-s", "-", "-d", self.path("x/y")], "does not exist"),
+        ]:
+            with self.subTest(argv=argv):
+                with self.assertRaises(lp.UsageError) as cm:
+                    lp.parse_args(self.copy, argv)
+                self.assertIn(error, str(cm.exception))
+        with mock.patch("builtins.print"):
+            self.assertRaises(SystemExit, lp.File, "rw")
+
+
+class TestCheckPaths(FilesTestCase):
+    def setUp(self):
+        import click
+
+        super().setUp()
+        self.files = []
+        for i in range(50):
+            self.files.append(self.path(f"{i}.txt"))
+            with open(self.files[-1], "w"):
+                pass
+        self.ptype = click.Path(exists=True, dir_okay=False)
+
+        @lp.standalone(False)
+        @lp.parse(paths=self.ptype)
+        def func(paths: tuple[str, ...] = ()):
+            return paths
+
+        self.func = func
+
+    def test_bulk(self):
+        argv = [a for f in self.files for a in ("-p", f)]
+        self.assertEqual(
+            lp.parse_args(self.func, argv), {"paths": tuple(self.files)}
+        )
+        self.assertEqual(self.call(self.func, *argv), tuple(self.files))
+        argv += ["-p", "missing", "-p", self.tmp.name, "-p", "other"]
+        with self.assertRaises(lp.UsageError) as cm:
+            lp.parse_args(self.func, argv)
+        self.assertEqual(cm.exception.param, "paths")
+        self.assertEqual(
+            cm.exception.message.splitlines(),
+            [
+                "3 invalid paths:",
+                "'missing' does not exist",
+                f"{self.tmp.name!r} is a directory",
+                "'other' does not exist",
+            ],
+        )
+        errors = lp.stat_paths(argv[1::2], self.ptype, 1)
+        self.assertEqual(len(errors), 3)
+
+    def test_deferred(self):
+        import click
+
+        @lp.check_paths(workers=4, deferred=True)
+        @lp.parse(paths=click.Path(exists=True, resolve_path=True))
+        def func(paths: tuple[str, ...] = ()):
+            return paths
+
+        with mock.patch("os.stat", side_effect=os.stat) as stat:
+            paths = lp.parse_args(func, ["-p", ".", "-p", "missing"])
+            self.assertEqual(stat.call_count, 0)
+        paths = paths["paths"]
+        self.assertIsInstance(paths, lp.CheckedPaths)
+        self.assertEqual((len(paths), paths[0]), (2, os.getcwd()))
+        with self.assertRaises(ValueError) as cm:
+            list(paths)
+        self.assertIn("'missing' does not exist", str(cm.exception))
+        index = lp.completion_index(lp.compiled_parser(func).lp)
+        self.assertEqual(index["options"][1]["path"], "file")
+
+
+class TestGlob(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in [
+            "x.csv",
+            "a/y.csv",
+            "a/b/z.csv",
+            "a/b/notes.txt",
+            "skip/s.csv",
+            ".hidden/h.csv",
+        ]:
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w"):
+                pass
+
+    def walk(self, patterns, **kw):
+        walk = lp.Glob(**kw).convert(patterns)
+        return [os.path.relpath(p, self.tmp.name) for p in walk]
+
+    def test_patterns(self):
+        expected = ["x.csv", "a/y.csv", "a/b/z.csv", "skip/s.csv"]
+        self.assertEqual(self.walk(self.path("**/*.csv"), sort=True), expected)
+        self.assertEqual(
+            self.walk(self.path("**/*.csv"), sort=True, workers=4), expected
+        )
+        self.assertEqual(
+            sorted(self.walk(self.path("**/*.csv"))), sorted(expected)
+        )
+        patterns = f"{self.path('*/*.csv')},{self.path('x.csv')}"
+        self.assertEqual(
+            self.walk(patterns, sort=True), ["a/y.csv", "skip/s.csv", "x.csv"]
+        )
+        self.assertEqual(
+            self.walk(self.path(), sort=True, exclude=("skip", "*.txt")),
+            ["x.csv", "a/y.csv", "a/b/z.csv"],
+        )
+        self.assertEqual(
+            self.walk(self.path("a"), include=("*.txt",)), ["a/b/notes.txt"]
+        )
+        self.assertIn(".hidden/h.csv", self.walk(self.path(), hidden=True))
+
+    def test_prefetch(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        for i in range(20):
+            os.makedirs(self.path(f"many/d{i:02}"))
+        with open(self.path("many/d00/f.csv"), "w"):
+            pass
+        walk = lp.Glob(sort=True, workers=2).convert(self.path("many"))
+        submit = ThreadPoolExecutor.submit
+        with mock.patch.object(
+            ThreadPoolExecutor, "submit", autospec=True, side_effect=submit
+        ) as spy:
+            iterator = iter(walk)
+            self.assertEqual(next(iterator), self.path("many/d00/f.csv"))
+            self.assertLessEqual(spy.call_count, 1 + 2 * 2)
+            self.assertEqual(list(iterator), [])
+            walk.close()
+        self.assertEqual(spy.call_count, 21)
+
+    def test_lazy(self):
+        kept = []
+
+        @lp.standalone(False)
+        @lp.parse(files=lp.Glob())
+        def func(files: str):
+            kept.append(iter(files))
+            return next(kept[0])
+
+        listed = []
+
+        def entries(*args):
+            for entry in [("first", None), ("second", None)]:
+                listed.append(entry[0])
+                yield entry
+
+        with mock.patch.object(lp.Glob, "entries", entries):
+            self.assertEqual(self.call(func, "-f", self.path("**")), "first")
+        self.assertEqual(listed, ["first"])
+        self.assertRaises(StopIteration, next, kept[0])
+        for pattern, error in [
+            ("missing/*", "missing is not a directory"),
+            ("missing.csv", "missing.csv does not exist"),
+            (",", "no pattern given"),
+        ]:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(lp.UsageError) as cm:
+                    lp.parse_args(func, ["-f", pattern])
+                self.assertIn(error, str(cm.exception))
+
+
+class TestSubcommands(unittest.TestCase):
+    def setUp(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        with open(os.path.join(self.dir.name, "lp_subtool.py"), "w") as f:
+            f.write(
+                textwrap.dedent(
+                    '''
+                    def double(x: int):
+                        """
+                        Double a number.
+
+                        :param x: a number
+                        """
+                        return x * 2
+                    '''
+                )
+            )
+        package = os.path.join(self.dir.name, "lp_heavy")
+        os.mkdir(package)
+        with open(os.path.join(package, "__init__.py"), "w") as f:
+            f.write("import sys\nsys.lp_heavy_imported = True\n")
+        with open(os.path.join(package, "cmd.py"), "w") as f:
+            f.write('def run():\n    """\n    Run heavily.\n    """\n')
+        sys.path.insert(0, self.dir.name)
+        self.addCleanup(sys.path.remove, self.dir.name)
+        self.addCleanup(sys.modules.pop, "lp_subtool", None)
+        self.argv = sys.argv
+        self.addCleanup(setattr, sys, "argv", self.argv)
+
+    def test_lazy_import(self):
+        tool = lp.Subcommands(
+            "A tool",
+            {"double": "lp_subtool:double"},
+            standalone=False,
+            cache_dir=self.dir.name,
+        )
+
+        @tool.command
+        def triple(x: int):
+            """
+            Triple a number.
+
+            :param x: a number
+            """
+            return x * 3
+
+        tool.add("half", "lp_subtool:missing", help="Halve a number.")
+        self.assertEqual(
+            tool.manifest(),
+            {
+                "double": "Double a number.",
+                "triple": "Triple a number.",
+                "half": "Halve a number.",
+            },
+        )
+        self.assertNotIn("lp_subtool", sys.modules)
+        self.assertEqual(tool(["triple", "-x", "2"]), 6)
+        self.assertNotIn("lp_subtool", sys.modules)
+        self.assertEqual(tool(["double", "-x", "4"]), 8)
+        self.assertIn("lp_subtool", sys.modules)
+        self.assertEqual(sys.argv, self.argv)
+
+    def test_help(self):
+        tool = lp.Subcommands(
+            "A tool",
+            {"double": "lp_subtool:double", "heavy": "lp_heavy.cmd:run"},
+            standalone=False,
+            cache_dir=self.dir.name,
+        )
+        with mock.patch("builtins.print") as mprint:
+            self.assertIsNone(tool(["--help"]))
+        text = mprint.call_args[0][0]
+        self.assertIn("A tool", text)
+        self.assertIn("double  Double a number.", text)
+        self.assertIn("heavy   Run heavily.", text)
+        self.assertNotIn("lp_subtool", sys.modules)
+        self.assertNotIn("lp_heavy", sys.modules)
+        self.assertFalse(hasattr(sys, "lp_heavy_imported"))
+        with mock.patch("builtins.print"):
+            with self.assertRaises(SystemExit) as cm:
+                lp.Subcommands()([])
+        self.assertEqual(cm.exception.code, 2)
+        with mock.patch.object(lp, "message", side_effect=SystemExit):
+            self.assertRaises(SystemExit, tool, ["unknown"])
+
+
+    def test_manifest(self):
+        tool = lp.Subcommands(
+            commands={"double": "lp_subtool:double"},
+            cache_dir=self.dir.name,
+        )
+        self.assertEqual(tool.manifest(), {"double": "Double a number."})
+        self.assertTrue(os.path.isfile(tool.manifest_path()))
+        with mock.patch.object(lp, "target_help", side_effect=AssertionError):
+            self.assertEqual(tool.manifest(), {"double": "Double a number."})
+        source = os.path.join(self.dir.name, "lp_subtool.py")
+        with open(source, "a") as f:
+            f.write("\n\ndef half(x: int):\n    return x // 2\n")
+        tool.add("half", "lp_subtool:half")
+        with mock.patch.object(lp, "target_help", wraps=lp.target_help) as th:
+            self.assertEqual(
+                tool.manifest(), {"double": "Double a number.", "half": ""}
+            )
+        self.assertEqual(th.call_count, 2)
+
+
+class TestCompletion(unittest.TestCase):
+    def setUp(self):
+        import click
+
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        patcher = mock.patch.object(lp, "PROG_VERSION", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def func(
+            mode: str = "fast",
+            out: str = ".",
+            size: tuple[int, int] = (1, 2),
+            values: tuple[int, ...] = (),
+            verbose: bool = False,
+        ):
+            return mode
+
+        self.click_types = {
+            "mode": click.Choice(["fast", "slow"]),
+            "out": click.Path(file_okay=False),
+        }
+        self.parser = lp.Lazyparser(func, self.click_types)
+        self.index = lp.completion_index(self.parser)
+
+    def test_complete(self):
+        cases = [
+            (["xx", ""], ["--help", "--mode", "--out", "--size", "--values"]),
+            (["xx", "-v"], ["-v"]),
+            (["xx", "--mode", "s"], ["slow"]),
+            (["xx", "--size", "1", ""], []),
+            (["xx", "--mode", "fast", "--m"], []),
+            (["xx", "--values", "1", "--va"], ["--values"]),
+        ]
+        for words, expected in cases:
+            with self.subTest(words=words):
+                res = lp.complete(self.index, words, len(words) - 1)
+                self.assertEqual(res[0], "plain")
+                self.assertEqual(
+                    [x for x in res[1:] if x != "--verbose"], expected
+                )
+        self.assertEqual(
+            lp.complete(self.index, ["xx", "--out", ""], 2), ["dir"]
+        )
+
+    def test_index_hook(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            parser = lp.Lazyparser(
+                self.parser.func, self.click_types, lp.Config(cache_dir=tmp)
+            )
+            with (
+                mock.patch.dict(os.environ, {"LAZYPARSER_COMPLETION": "bash"}),
+                mock.patch.object(sys, "argv", ["my-tool"]),
+                mock.patch("builtins.print") as mprint,
+                self.assertRaises(SystemExit),
+            ):
+                lp.CompiledParser(parser, parser.func)()
+            index = os.path.join(tmp, "my-tool.completion")
+            self.assertIn(f'"{index}"', mprint.call_args[0][0])
+            self.assertIn("complete -o default -F", mprint.call_args[0][0])
+            script = textwrap.dedent(
+                """
+                import sys
+                import lazyparser
+                sys.exit(lazyparser.main(sys.argv[1:]))
+                """
+            )
+            res = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", script]
+                + ["complete", index, "2", "my-tool", "--mode", ""],
+                capture_output=True,
+                text=True,
+                cwd=os.path.dirname(os.path.abspath(lp.__file__)),
+            )
+            self.assertEqual(res.stdout.split(), ["plain", "fast", "slow"])
+            self.assertNotRegex(res.stderr, r"\| (rich|click)\b")
+
+    def test_read_only_script_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            script = os.path.join(tmp, "bin", "my-tool")
+            os.mkdir(os.path.dirname(script))
+            with mock.patch.object(sys, "argv", [script]):
+                self.assertEqual(
+                    lp.completion_path("my-tool"),
+                    os.path.join(tmp, "bin", ".my-tool.completion"),
+                )
+                with (
+                    mock.patch.dict(os.environ, {"XDG_CACHE_HOME": tmp}),
+                    mock.patch.object(os, "access", return_value=False),
+                ):
+                    self.assertEqual(
+                        lp.completion_path("my-tool"),
+                        os.path.join(tmp, "lazyparser", "my-tool.completion"),
+                    )
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic(self):
+        lp.set_env(dict(delim1=":param", delim2=":", header="", tab=4))
+        func = benchmark.synthetic(12)
+        parser = lp.Lazyparser(func, {})
+        self.assertEqual(len([a for a in parser.args if a[0] == "p"]), 12)
+        self.assertEqual(parser.args["p7"].help, "parameter number 7")
+        fast = lp.FastParser(parser)
+        cmd = lp.build_command(parser, func)
+        for argv in [benchmark.typical_argv(12), benchmark.worst_argv(12)]:
+            self.assertIsNotNone(fast.parse(argv))
+            self.assertIsNone(cmd.main(argv, "xx", standalone_mode=False))
+            self.assertEqual(
+                benchmark.click_baseline(12).main(
+                    argv, "xx", standalone_mode=False
+                ),
+                None,
+            )
+            benchmark.argparse_baseline(12).parse_args(argv)
+
+    def test_messages(self):
+        self.assertEqual(
+            set(benchmark.bench_messages(1)), {"message.rich", "message.plain"}
+        )
+        self.assertNotIn("LAZYPARSER_RENDERER", os.environ)
+
+    def test_compare(self):
+        baseline = {"a": 1.0, "b": 2.0, "c": 0.0}
+        results = {"a": 1.1, "b": 3.0, "c": 1.0, "d": 5.0}
+        self.assertEqual(benchmark.compare(results, baseline, 0.25), ["b"])